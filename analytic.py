@@ -0,0 +1,211 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from discrete import (
+    RISK_COMPONENTS,
+    TARIFF_ESCALATION_LEVELS,
+    carry_cost,
+    create_params_from_dict,
+    expedited_shipping_cost,
+    opportunity_cost,
+)
+from params import COST_DRIVERS, lognormal_params
+from structs import DiscreteRisksParams
+
+# Closed-form mean and variance of the engine.py cost model, with no sampling.
+# Lost units are treated as the exact severity sum (the simulation truncates
+# each trial to whole units), so means agree to within one unit's cost.
+
+
+@dataclass
+class Moments:
+    mean: float
+    variance: float
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def __add__(self, other: "Moments") -> "Moments":
+        # independent components
+        return Moments(self.mean + other.mean, self.variance + other.variance)
+
+
+def cost_per_unit(fed_funds_rate: float | None = None) -> float:
+    """Cost of one delayed unit; total_cost is this times units plus carry cost"""
+    return opportunity_cost(1, fed_funds_rate) + expedited_shipping_cost(1)
+
+
+def compound_moments(
+    event_lambda: float,
+    min_impact: float,
+    max_impact: float,
+    days_delayed: float,
+    fed_funds_rate: float | None = None,
+) -> Moments:
+    """
+    Poisson(lambda) events with Uniform(min, max) severity. The carry cost is
+    paid only when at least one event happens, so it is a Bernoulli term that
+    covaries with the lost units.
+    """
+    k, carry = cost_per_unit(fed_funds_rate), carry_cost(days_delayed)
+    severity_mean = (min_impact + max_impact) / 2
+    severity_sq = (min_impact**2 + min_impact * max_impact + max_impact**2) / 3
+    units_mean = event_lambda * severity_mean
+    units_var = event_lambda * severity_sq
+    any_event = 1 - np.exp(-event_lambda)
+    # lost units are zero whenever no event happens, so
+    # Cov(units, any_event) = E[units] * (1 - P(any event))
+    covariance = units_mean * (1 - any_event)
+    return Moments(
+        mean=k * units_mean + carry * any_event,
+        variance=k**2 * units_var
+        + carry**2 * any_event * (1 - any_event)
+        + 2 * k * carry * covariance,
+    )
+
+
+def binomial_moments(
+    trials: int,
+    probability: float,
+    days_delayed: float,
+    units_per_success: int = 1,
+    fed_funds_rate: float | None = None,
+) -> Moments:
+    """Binomial losses; the carry cost is paid on every order"""
+    k = cost_per_unit(fed_funds_rate) * units_per_success
+    return Moments(
+        mean=k * trials * probability + carry_cost(days_delayed),
+        variance=k**2 * trials * probability * (1 - probability),
+    )
+
+
+def discrete_risk_moments(
+    params: DiscreteRisksParams, fed_funds_rate: float | None = None
+) -> dict[str, Moments]:
+    """
+    Exact mean and variance of each discrete risk's cost, by component.
+    `fed_funds_rate` defaults to config.FED_FUNDS_RATE.
+    """
+    return dict(
+        zip(
+            RISK_COMPONENTS,
+            (
+                compound_moments(
+                    params.disruption_lambda,
+                    params.disruption_min,
+                    params.disruption_max,
+                    params.disruption_days_delayed,
+                    fed_funds_rate,
+                ),
+                compound_moments(
+                    params.border_delay_lambda,
+                    params.border_delay_min,
+                    params.border_delay_max,
+                    params.border_delay_days_delayed,
+                    fed_funds_rate,
+                ),
+                binomial_moments(
+                    params.order_size,
+                    params.damage_probability,
+                    params.quality_days_delayed,
+                    fed_funds_rate=fed_funds_rate,
+                ),
+                binomial_moments(
+                    params.order_size,
+                    params.defective_probability,
+                    params.quality_days_delayed,
+                    fed_funds_rate=fed_funds_rate,
+                ),
+                binomial_moments(
+                    1,
+                    params.cancellation_probability,
+                    params.cancellation_days_delayed,
+                    units_per_success=params.order_size,
+                    fed_funds_rate=fed_funds_rate,
+                ),
+            ),
+        )
+    )
+
+
+def driver_moments(spec: dict) -> Moments:
+    dist = spec["dist"]
+    if dist == "normal":
+        return Moments(spec["mean"], spec["std"] ** 2)
+    if dist == "lognormal":
+        mu, sigma = lognormal_params(spec)
+        mean = np.exp(mu + sigma**2 / 2)
+        return Moments(mean, (np.exp(sigma**2) - 1) * mean**2)
+    if dist == "gamma":
+        return Moments(
+            spec["shape"] * spec["scale"], spec["shape"] * spec["scale"] ** 2
+        )
+    if dist == "triangular":
+        a, c, b = spec["min"], spec["mode"], spec["max"]
+        return Moments(
+            (a + b + c) / 3, (a**2 + b**2 + c**2 - a * b - a * c - b * c) / 18
+        )
+    if dist == "beta":
+        a, b = spec["a"], spec["b"]
+        return Moments(a / (a + b), a * b / ((a + b) ** 2 * (a + b + 1)))
+    raise ValueError(f"Unknown distribution '{dist}'")
+
+
+def inverse_yield_moments(spec: dict) -> tuple[float, float]:
+    """E[1/Y] and E[1/Y^2] for a Beta(a, b) yield"""
+    if spec["dist"] != "beta":
+        raise ValueError("Analytic yield moments need a beta yield distribution")
+    a, b = spec["a"], spec["b"]
+    if a <= 2:
+        raise ValueError("E[1/Y^2] is infinite for a beta yield with a <= 2")
+    return (a + b - 1) / (a - 1), (a + b - 1) * (a + b - 2) / ((a - 1) * (a - 2))
+
+
+def country_moments(
+    params: dict, order_size: int, fed_funds_rate: float | None = None
+) -> dict:
+    """
+    Exact mean and variance of one supplier's cost. The per-lamp cost is a
+    product of independent factors: drivers / yield * (1 + tariff +
+    escalation) * currency. Its first two moments are therefore products of
+    each factor's moments. The order total adds the independent discrete
+    risks. `fed_funds_rate` defaults to config.FED_FUNDS_RATE, which waits for
+    the rate to be resolved.
+    """
+    drivers = Moments(0.0, 0.0)
+    for driver in COST_DRIVERS:
+        drivers = drivers + driver_moments(params[driver])
+    inv_yield, inv_yield_sq = inverse_yield_moments(params["yield_params"])
+
+    levels = np.array(TARIFF_ESCALATION_LEVELS, dtype=float)
+    escalation_p = params["tariff_escal"]
+    tariff = 1 + params["tariff"]["fixed"]
+    tariff_mean = tariff + escalation_p * levels.mean()
+    tariff_sq = (
+        tariff**2
+        + 2 * tariff * escalation_p * levels.mean()
+        + escalation_p * (levels**2).mean()
+    )
+    currency_sq = 1 + params["currency_std"] ** 2
+
+    per_lamp_mean = drivers.mean * inv_yield * tariff_mean
+    per_lamp_sq = (
+        (drivers.variance + drivers.mean**2) * inv_yield_sq * tariff_sq * currency_sq
+    )
+    per_lamp = Moments(per_lamp_mean, per_lamp_sq - per_lamp_mean**2)
+
+    discrete = discrete_risk_moments(
+        create_params_from_dict(params, order_size), fed_funds_rate
+    )
+    discrete_total = Moments(0.0, 0.0)
+    for moments in discrete.values():
+        discrete_total = discrete_total + moments
+
+    total = Moments(order_size * per_lamp.mean, order_size**2 * per_lamp.variance)
+    return {
+        "per_lamp": per_lamp,
+        "discrete": discrete,
+        "total": total + discrete_total,
+    }
@@ -1,4 +1,4 @@
-import copy
+import json
 
 import numpy as np
 import pandas as pd
@@ -6,12 +6,37 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 
-from config import COUNTRIES
-from simulation import run_monte_carlo
-from utils import optimize_without_yield
+import profiling
+from analytic import country_moments
+from config import (
+    COUNTRIES,
+    JOINT_SIMULATION,
+    ORDER_SIZE_MAX,
+    ORDER_SIZE_MIN,
+    ORDER_SIZE_STEP,
+    SIMULATION_SEED,
+)
+from executor import cached_run_countries, cached_simulate_suppliers
+from histogram import bin_countries
+from live_data import peek_fed_funds_rate, prefetch_fed_funds_rate
+from metrics import exceedance_probability, weighted_mean
+from portfolio import (
+    PortfolioScenarios,
+    PortfolioStats,
+    optimize_portfolio,
+    optimize_portfolio_cvar,
+)
+from profiling import span
+from sensitivity import cached_run_sensitivity_analysis
+from streams import make_rng
+from surface import load_surface, lookup, surface_key
+
+RISK_MEASURES = ("Std Dev", "CVaR")
 
 # --- Streamlit App ---
 st.set_page_config(layout="wide")
+# resolve the FRED rate in the background while the page renders
+prefetch_fed_funds_rate()
 st.title("Tesla Headlamp Supplier Evaluation")
 st.write(
     "Assuming we need to deliver a number of headlamps, what is the optimal procurement strategy across US, Mexico, and China?"
@@ -44,10 +69,10 @@ with left_col:
     # Renamed from 'target_order_size' to 'target_order_size' for clarity
     target_order_size = st.slider(
         "Anticipated Order Size",
-        min_value=1_000,
-        max_value=50_000,
+        min_value=ORDER_SIZE_MIN,
+        max_value=ORDER_SIZE_MAX,
         value=8_000,
-        step=500,
+        step=ORDER_SIZE_STEP,
         help="The target number of usable headlamps you want to receive.",
     )
 
@@ -60,40 +85,163 @@ with left_col:
         help="A higher value means you prioritize a more predictable (less risky) cost over the absolute lowest cost.",
     )
 
+    risk_measure = st.radio(
+        "Risk Measure",
+        RISK_MEASURES,
+        horizontal=True,
+        help="Standard deviation penalizes all spread; CVaR penalizes the average cost of the worst 5% of trials, where the discrete shocks live.",
+    )
+
+    # closed-form expected cost, cheap enough to refresh on every slider move;
+    # it never waits on FRED (cached or default rate until the fetch lands)
+    fed_funds_rate = peek_fed_funds_rate()
+    preview_moments = {
+        country: country_moments(params, target_order_size, fed_funds_rate)
+        for country, params in COUNTRIES.items()
+    }
+    expected_per_lamp = {
+        country: moments["total"].mean / target_order_size
+        for country, moments in preview_moments.items()
+    }
+    st.caption(
+        "Analytic preview, expected cost / headlamp: "
+        + " · ".join(f"{c} ${cost:,.2f}" for c, cost in expected_per_lamp.items())
+    )
+    # tail preview from the precomputed order-size surface (python surface.py),
+    # unless it was built from other parameters or another rate
+    surface = load_surface(key=surface_key(fed_funds_rate=fed_funds_rate))
+    if surface is not None:
+        p95_per_lamp = {
+            country: lookup(surface, country, target_order_size)["p95"]
+            / target_order_size
+            for country in COUNTRIES.keys()
+        }
+        st.caption(
+            "P95 cost / headlamp: "
+            + " · ".join(f"{c} ${cost:,.2f}" for c, cost in p95_per_lamp.items())
+        )
+
     run_button = st.button("Run", type="primary", use_container_width=True)
 
+    # span timings for this session only, shown at the bottom of the page
+    show_diagnostics = st.checkbox(
+        "Diagnostics",
+        help="Record wall time, call counts and peak memory per stage.",
+    )
+    if show_diagnostics:
+        if "profile" not in st.session_state:
+            st.session_state.profile = profiling.Collector(track_memory=True)
+    else:
+        st.session_state.pop("profile", None)
+    profiling.collect(st.session_state.get("profile"))
+
 # --- PROCESSING LOGIC ---
-if run_button:
-    with st.spinner("Running simulations for all countries..."):
-        # 1. run monte carlo simulation
-        all_results = {
-            country: run_monte_carlo(country, params, target_order_size)
-            for country, params in COUNTRIES.items()
-        }
-        all_costs = {
-            country: results["total_cost"] for country, results in all_results.items()
-        }
-        all_lost_units = {
-            country: results["lost_units"] for country, results in all_results.items()
-        }
-        # create the per-unit cost dictionary specifically for the optimizer
-        all_costs_per_lamp = {
-            country: total_costs / target_order_size
-            for country, total_costs in all_costs.items()
-        }
+# simulations are cached, so when only the risk aversion or risk measure moved
+# since the last run we can re-optimize straight away without clicking Run
+previous_results = st.session_state.optimization_results
+risk_only_changed = (
+    previous_results is not None
+    and previous_results["order_size"] == target_order_size
+    and (
+        previous_results["risk_tolerance"] != risk_tolerance
+        or previous_results.get("risk_measure") != risk_measure
+    )
+)
+
+if run_button or risk_only_changed:
+    with span("app.run"), st.spinner("Running simulations for all countries..."):
+        # 1. run monte carlo simulation (served from cache when inputs are unchanged)
+        if JOINT_SIMULATION:
+            # every supplier in one correlated pass, as a trials x suppliers matrix
+            joint = cached_simulate_suppliers(
+                COUNTRIES, target_order_size, SIMULATION_SEED
+            )
+            suppliers = joint["suppliers"]
+            # importance-sampled passes carry one likelihood ratio per trial,
+            # shared by every supplier's column (None otherwise)
+            cost_matrix, trial_weights = joint["total_cost"], joint.get("weights")
+            all_costs = dict(zip(suppliers, cost_matrix.T))
+            all_lost_units = dict(zip(suppliers, joint["lost_units"].T))
+            all_weights = dict.fromkeys(suppliers, trial_weights)
+            trials_used = {}
+            # per-lamp costs for the optimizer; weighted trials count by
+            # their likelihood ratio
+            cost_matrix = cost_matrix / target_order_size
+        else:
+            all_results = cached_run_countries(
+                COUNTRIES, target_order_size, SIMULATION_SEED
+            )
+            all_costs = {
+                country: results["total_cost"]
+                for country, results in all_results.items()
+            }
+            all_lost_units = {
+                country: results["lost_units"]
+                for country, results in all_results.items()
+            }
+            # importance-sampled runs carry per-trial likelihood ratios (None otherwise)
+            all_weights = {
+                country: results.get("weights")
+                for country, results in all_results.items()
+            }
+            # adaptive runs (ADAPTIVE_TRIALS) report their own trial counts
+            trials_used = {
+                country: results["trials"]
+                for country, results in all_results.items()
+                if "trials" in results
+            }
+            suppliers = tuple(all_costs)
+            # independent runs, each used whole even when their trial counts
+            # differ (adaptive runs)
+            per_lamp_costs = {
+                country: costs / target_order_size
+                for country, costs in all_costs.items()
+            }
+            cost_matrix = None
 
         # 2. run the optimization
-        result = optimize_without_yield(all_costs_per_lamp, risk_tolerance, None)
+        if risk_measure == "CVaR":
+            # scenario LP over a reduced set of trials, reduced on a fixed
+            # seed so reruns give the same allocation
+            if cost_matrix is not None:
+                scenarios = PortfolioScenarios.from_matrix(
+                    suppliers, cost_matrix, trial_weights
+                )
+            else:
+                scenarios = PortfolioScenarios.from_scenarios(
+                    per_lamp_costs, all_weights, rng=make_rng(SIMULATION_SEED)
+                )
+            scenarios = scenarios.reduce(rng=make_rng(SIMULATION_SEED))
+            result = optimize_portfolio_cvar(scenarios, risk_tolerance)
+        else:
+            if cost_matrix is not None:
+                stats = PortfolioStats.from_matrix(
+                    suppliers, cost_matrix, trial_weights
+                )
+            else:
+                stats = PortfolioStats.from_scenarios(per_lamp_costs, all_weights)
+            # warm-started from the previous allocation when only the risk
+            # aversion moved
+            result = optimize_portfolio(
+                stats,
+                risk_tolerance,
+                warm_start=(
+                    previous_results.get("allocations") if risk_only_changed else None
+                ),
+            )
 
         if result:
             # 3. calculate portfolio-level metrics
             allocations = result["allocations"]
 
-            # calculate weighted average of expected lost units
-            portfolio_expected_lost_units = sum(
-                np.mean(all_results[country]["lost_units"]) * allocations[country]
-                for country in COUNTRIES.keys()
+            # weighted average of expected lost units
+            expected_lost_units = np.array(
+                [
+                    weighted_mean(all_lost_units[country], all_weights[country])
+                    for country in suppliers
+                ]
             )
+            portfolio_expected_lost_units = expected_lost_units @ result["shares"]
 
             # calculate portfolio's overall yield rate (units received) / (units ordered)
             portfolio_yield_rate = (
@@ -106,6 +254,16 @@ if run_button:
             else:  # GUARD: division by 0
                 recommended_orders = float("inf")
 
+            # weighted chance that a supplier alone would cost more than the blend
+            exceedance = {
+                country: exceedance_probability(
+                    all_costs[country],
+                    result["expected_cost"] * target_order_size,
+                    all_weights[country],
+                )
+                for country in suppliers
+            }
+
             # prepare allocation data for the pie chart
             alloc_df = pd.DataFrame(
                 [
@@ -119,7 +277,14 @@ if run_button:
                 "blended_cost": result["expected_cost"],
                 "recommended_orders": recommended_orders,
                 "alloc_df": alloc_df,
-                "all_costs": all_costs,
+                # pre-binned on shared edges; the raw trials stay server-side
+                "histograms": bin_countries(all_costs, all_weights),
+                "trials_used": trials_used,
+                "exceedance": exceedance,
+                "allocations": allocations,
+                "order_size": target_order_size,
+                "risk_tolerance": risk_tolerance,
+                "risk_measure": risk_measure,
             }
         else:
             st.error("Optimization failed. Please check parameters and try again.")
@@ -127,7 +292,7 @@ if run_button:
 
 
 # --- RIGHT COLUMN: OUTPUTS ---
-with right_col:
+with right_col, span("app.render"):
     # Display results if they exist in the session state
     if st.session_state.optimization_results:
         results = st.session_state.optimization_results
@@ -149,6 +314,15 @@ with right_col:
                 help=f"To meet your target of {target_order_size:,} usable units, you should place a total order of this size.",
             )
 
+        if results.get("trials_used"):
+            st.caption(
+                "Trials used: "
+                + ", ".join(
+                    f"{country} {trials:,}"
+                    for country, trials in results["trials_used"].items()
+                )
+            )
+
         # Create tabs for different visualizations
         tab1, tab2 = st.tabs(["Supplier Allocation", "Monte Carlo Cost Distribution"])
 
@@ -178,9 +352,9 @@ with right_col:
             st.plotly_chart(fig_pie, use_container_width=True)
 
         with tab2:
-            # Histogram overlay - using the logic from histogram.py
-            all_costs = results.get("all_costs", {})
-            if all_costs:
+            # Histogram overlay, drawn from the pre-binned counts
+            histograms = results.get("histograms", {})
+            if histograms:
                 fig_h = go.Figure()
 
                 # Define country colors
@@ -190,24 +364,48 @@ with right_col:
                     "China": "lightcoral",
                 }
 
-                for country, costs in all_costs.items():
+                for country, histogram in histograms.items():
                     color = country_colors.get(country, "gray")
                     fig_h.add_trace(
-                        go.Histogram(
-                            x=costs,
+                        go.Bar(
+                            x=histogram.centers,
+                            y=histogram.counts,
+                            width=histogram.widths,
                             name=country,
                             opacity=0.55,
-                            nbinsx=60,
                             marker_color=color,
                         )
                     )
                 fig_h.update_layout(
                     barmode="overlay",
+                    bargap=0,
                     title="Monte Carlo Simulation Results",
                     xaxis_title="Total Cost",
                     yaxis_title="Frequency",
                 )
                 st.plotly_chart(fig_h, use_container_width=True)
+
+                summary_df = pd.DataFrame(
+                    {
+                        country: histogram.summary()
+                        for country, histogram in histograms.items()
+                    }
+                ).T
+                money_columns = list(summary_df.columns)
+                summary_df["P(> Blend)"] = pd.Series(results.get("exceedance", {}))
+                st.dataframe(
+                    summary_df.style.format(
+                        {
+                            **dict.fromkeys(money_columns, "${:,.0f}"),
+                            "P(> Blend)": "{:.1%}",
+                        }
+                    ),
+                    use_container_width=True,
+                )
+                st.caption(
+                    "P(> Blend): chance that ordering from one supplier alone "
+                    "costs more than the optimized blend's expected cost."
+                )
             else:
                 st.info("Run the simulation to see cost distribution histograms.")
 
@@ -226,70 +424,6 @@ st.write(
 )
 
 
-def run_sensitivity_analysis(
-    country, base_params, factors_to_test, order_size, swing=0.20
-):
-    """
-    Runs a one-at-a-time sensitivity analysis for a given set of factors.
-    Returns a dataframe with the results and the baseline mean cost.
-    """
-    results = []
-
-    # Calculate baseline mean cost
-    base_results = run_monte_carlo(country, base_params, order_size)
-    baseline_mean = np.mean(base_results["total_cost"])
-
-    for factor_name, param_path in factors_to_test:
-        params_low = copy.deepcopy(base_params)
-        params_high = copy.deepcopy(base_params)
-
-        # Get the base value using the path
-        base_value = base_params
-        for key in param_path:
-            base_value = base_value[key]
-
-        # Skip parameters that are 0 (can't do ±20% of 0)
-        if base_value == 0:
-            continue
-
-        low_value = base_value * (1 - swing)
-        high_value = base_value * (1 + swing)
-
-        # Set the low and high values in the copied params
-        temp_low = params_low
-        temp_high = params_high
-        for i, key in enumerate(param_path):
-            if i == len(param_path) - 1:
-                temp_low[key] = low_value
-                temp_high[key] = high_value
-            else:
-                temp_low = temp_low[key]
-                temp_high = temp_high[key]
-
-        try:
-            # Simulate with low and high values
-            low_results = run_monte_carlo(country, params_low, order_size)
-            high_results = run_monte_carlo(country, params_high, order_size)
-
-            mean_low = np.mean(low_results["total_cost"])
-            mean_high = np.mean(high_results["total_cost"])
-
-            results.append(
-                {
-                    "Factor": factor_name,
-                    "Low Cost": mean_low,
-                    "High Cost": mean_high,
-                    "Impact": mean_high - mean_low,
-                }
-            )
-        except Exception as e:
-            # Skip factors that cause errors (e.g., invalid parameter combinations)
-            st.warning(f"Skipping {factor_name}: {str(e)}")
-            continue
-
-    return pd.DataFrame(results), baseline_mean
-
-
 sa_col1, sa_col2 = st.columns([1, 3])
 
 with sa_col1:
@@ -298,16 +432,18 @@ with sa_col1:
     )
     sa_order_size = st.number_input(
         "Order Size for Analysis",
-        min_value=1_000,
-        max_value=50_000,
+        min_value=ORDER_SIZE_MIN,
+        max_value=ORDER_SIZE_MAX,
         value=8_000,
-        step=500,
+        step=ORDER_SIZE_STEP,
         key="sa_order_size",
     )
     run_sa = st.button("Run Sensitivity Analysis")
 
 if run_sa:
-    with st.spinner(f"Running sensitivity analysis for {sa_country}..."):
+    with span("app.sensitivity"), st.spinner(
+        f"Running sensitivity analysis for {sa_country}..."
+    ):
         base_params = COUNTRIES[sa_country]
 
         # Define factors to test for each country
@@ -393,8 +529,12 @@ if run_sa:
         }
 
         factors_to_test = factors[sa_country]
-        sa_results, baseline_mean = run_sensitivity_analysis(
-            sa_country, base_params, factors_to_test, sa_order_size
+        sa_results, baseline_mean = cached_run_sensitivity_analysis(
+            sa_country,
+            base_params,
+            factors_to_test,
+            sa_order_size,
+            on_error=lambda factor, e: st.warning(f"Skipping {factor}: {str(e)}"),
         )
 
         sa_results = sa_results.sort_values(by="Impact", ascending=True)
@@ -434,3 +574,26 @@ if run_sa:
 
         with sa_col2:
             st.plotly_chart(fig, use_container_width=True)
+
+# --- DIAGNOSTICS ---
+if show_diagnostics:
+    with st.expander("Diagnostics", expanded=True):
+        st.dataframe(
+            profiling.summary(st.session_state.profile),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                column: st.column_config.NumberColumn(format="%.2f")
+                for column in ("Total ms", "Mean ms", "Max ms", "Peak MB")
+            },
+        )
+        trace_col, reset_col = st.columns(2)
+        trace_col.download_button(
+            "Download Chrome trace",
+            json.dumps(profiling.chrome_trace(st.session_state.profile)),
+            file_name="trace.json",
+            mime="application/json",
+            help="Open in chrome://tracing or ui.perfetto.dev",
+        )
+        if reset_col.button("Clear recorded spans"):
+            profiling.reset(st.session_state.profile)
@@ -0,0 +1,298 @@
+"""
+Headless scenario grid runner for scheduled procurement jobs.
+
+Every combination of order size and parameter override is simulated once,
+jointly across the suppliers, and then optimized at every risk tolerance.
+Simulations run in parallel on the configured executor. Each finished
+scenario is appended to the Parquet file as its own row group, so memory
+does not grow with the size of the grid.
+
+A grid is a JSON file (every key is optional):
+    {
+        "countries": ["US", "Mexico", "China"],
+        "order_sizes": [4000, 8000, 16000],
+        "risk_tolerances": [0, 1, 2.5, 5],
+        "overrides": {"China.tariff.fixed": [0.25, 0.5]}
+    }
+
+Run from the repository root:
+    python batch.py --grid grid.json --output scenarios.parquet
+    python batch.py --order-sizes 4000 8000 --override China.tariff.fixed=0.25,0.5
+"""
+
+import argparse
+import itertools
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import (
+    COUNTRIES,
+    DRIVER_CORRELATION,
+    EXECUTOR,
+    JOINT_SIMULATION,
+    MONTE_CARLO_SIMULATIONS,
+    PRECISION,
+)
+from discrete import PRECISIONS
+from engine import simulate_suppliers
+from executor import imap_seeded
+from params import get_param, override_param
+from portfolio import (
+    PortfolioScenarios,
+    PortfolioStats,
+    optimize_portfolio,
+    optimize_portfolio_cvar,
+)
+
+RISK_MEASURES = ("std", "cvar")
+RESULT_COLUMNS = (
+    "expected_cost",
+    "std",
+    "cvar",
+    "expected_lost_units",
+    "recommended_orders",
+)
+
+
+def parse_override(text: str) -> tuple[str, list]:
+    """Parses PATH=VALUE[,VALUE...], e.g. China.tariff.fixed=0.25,0.5"""
+    path, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(
+            f"Expected PATH=VALUE[,VALUE...], got '{text}'"
+        )
+    return path, [json.loads(value) for value in values.split(",")]
+
+
+def validate_overrides(countries: dict, overrides: dict[str, list]):
+    """Raises ValueError for override paths the selected countries do not have"""
+    for path in overrides:
+        keys = tuple(path.split("."))
+        if keys[0] not in countries:
+            raise ValueError(
+                f"Override '{path}' is for {keys[0]}, which is not among the "
+                f"selected countries ({', '.join(countries)})"
+            )
+        try:
+            value = get_param(countries, keys)
+        except (KeyError, TypeError):
+            raise ValueError(f"Override '{path}' is not a parameter of {keys[0]}")
+        if isinstance(value, dict):
+            # e.g. US.raw: replacing the whole spec would drop its other keys
+            raise ValueError(
+                f"Override '{path}' is a group of parameters, not one; "
+                f"use one of {', '.join(f'{path}.{key}' for key in value)}"
+            )
+
+
+def _override_type(values: list) -> pa.DataType:
+    # numeric sweeps are stored as float so 38 and 42.5 share one column
+    if all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in values
+    ):
+        return pa.float64()
+    return pa.array(values).type
+
+
+def grid_schema(suppliers, overrides: dict[str, list]) -> pa.Schema:
+    """The output schema, fixed before the first scenario is written"""
+    return pa.schema(
+        [
+            ("order_size", pa.int64()),
+            *[
+                (f"override:{path}", _override_type(values))
+                for path, values in overrides.items()
+            ],
+            ("risk_tolerance", pa.float64()),
+            ("risk_measure", pa.string()),
+            ("trials", pa.int64()),
+            ("success", pa.bool_()),
+            *[(column, pa.float64()) for column in RESULT_COLUMNS],
+            *[(f"share:{s}", pa.float64()) for s in suppliers],
+            *[(f"mean:{s}", pa.float64()) for s in suppliers],
+        ]
+    )
+
+
+def scenario_grid(
+    order_sizes: list[int], overrides: dict[str, list]
+) -> list[tuple[int, dict]]:
+    """(order_size, {path: value}) for every combination"""
+    paths = list(overrides)
+    return [
+        (order_size, dict(zip(paths, values)))
+        for order_size in order_sizes
+        for values in itertools.product(*overrides.values())
+    ]
+
+
+def evaluate_scenario(
+    countries: dict,
+    order_size: int,
+    overrides: dict,
+    risk_tolerances: list[float],
+    risk_measure: str,
+    n: int,
+    precision: str,
+) -> list[dict]:
+    """One joint simulation, optimized at every risk tolerance; one row each"""
+    for path, value in overrides.items():
+        countries = override_param(countries, tuple(path.split(".")), value)
+    joint = simulate_suppliers(
+        countries,
+        order_size,
+        n,
+        correlation=DRIVER_CORRELATION if JOINT_SIMULATION else {},
+        precision=precision,
+    )
+    suppliers = joint["suppliers"]
+    cost_matrix = joint["total_cost"] / order_size
+    expected_lost_units = joint["lost_units"].mean(axis=0, dtype=float)
+    mean_costs = cost_matrix.mean(axis=0, dtype=float)
+
+    if risk_measure == "cvar":
+        scenarios = PortfolioScenarios.from_matrix(suppliers, cost_matrix).reduce()
+        results = [optimize_portfolio_cvar(scenarios, lam) for lam in risk_tolerances]
+    else:
+        # warm-start each risk tolerance from the previous solution
+        stats = PortfolioStats.from_matrix(suppliers, cost_matrix)
+        results, shares = [], None
+        for lam in risk_tolerances:
+            results.append(optimize_portfolio(stats, lam, warm_start=shares))
+            shares = results[-1]["shares"] if results[-1] else shares
+
+    rows = []
+    for lam, result in zip(risk_tolerances, results):
+        # failed solves keep their row, with NaN results
+        shares = result["shares"] if result else np.full(len(suppliers), np.nan)
+        lost_units = float(expected_lost_units @ shares)
+        yield_rate = (order_size - lost_units) / order_size
+        rows.append(
+            {
+                "order_size": order_size,
+                **{f"override:{path}": value for path, value in overrides.items()},
+                "risk_tolerance": lam,
+                "risk_measure": risk_measure,
+                "trials": n,
+                "success": result is not None,
+                "expected_cost": result["expected_cost"] if result else np.nan,
+                "std": result["std"] if result else np.nan,
+                "cvar": result.get("cvar", np.nan) if result else np.nan,
+                "expected_lost_units": lost_units,
+                "recommended_orders": (
+                    order_size / yield_rate if yield_rate > 0 else np.nan
+                ),
+                **{f"share:{s}": w for s, w in zip(suppliers, shares)},
+                **{f"mean:{s}": m for s, m in zip(suppliers, mean_costs)},
+            }
+        )
+    return rows
+
+
+def run_grid(
+    output: str,
+    countries: dict = COUNTRIES,
+    order_sizes: list[int] = (8_000,),
+    risk_tolerances: list[float] = (0.0, 1.0, 5.0),
+    overrides: dict[str, list] | None = None,
+    risk_measure: str = "std",
+    n: int = MONTE_CARLO_SIMULATIONS,
+    seed: int | None = 0,
+    kind: str = EXECUTOR,
+    precision: str = PRECISION,
+) -> int:
+    """
+    Evaluates the grid and writes one Parquet row per (scenario, risk
+    tolerance) to `output`. Every scenario shares `seed` (common random
+    numbers), so rows differ only through their inputs. Returns the rows
+    written.
+    """
+    if risk_measure not in RISK_MEASURES:
+        raise ValueError(
+            f"Unknown risk measure '{risk_measure}', expected one of {RISK_MEASURES}"
+        )
+    overrides = overrides or {}
+    validate_overrides(countries, overrides)
+    risk_tolerances = [float(lam) for lam in risk_tolerances]
+    tasks = [
+        (
+            countries,
+            order_size,
+            scenario_overrides,
+            risk_tolerances,
+            risk_measure,
+            n,
+            precision,
+        )
+        for order_size, scenario_overrides in scenario_grid(
+            list(order_sizes), overrides
+        )
+    ]
+
+    schema = grid_schema(tuple(countries), overrides)
+    written = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for rows in imap_seeded(evaluate_scenario, tasks, seed, kind, common=True):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            written += len(rows)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", help="JSON grid file; flags below override it")
+    parser.add_argument("--output", default="scenarios.parquet")
+    parser.add_argument("--countries", nargs="+", choices=list(COUNTRIES))
+    parser.add_argument("--order-sizes", nargs="+", type=int)
+    parser.add_argument("--risk-tolerances", nargs="+", type=float)
+    parser.add_argument(
+        "--override",
+        action="append",
+        type=parse_override,
+        default=[],
+        metavar="PATH=VALUE[,VALUE...]",
+        help="dotted parameter path and the values to sweep, e.g. US.raw.mean=38,42",
+    )
+    parser.add_argument("--risk-measure", choices=RISK_MEASURES, default="std")
+    parser.add_argument("--trials", type=int, default=MONTE_CARLO_SIMULATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--executor", default=EXECUTOR)
+    parser.add_argument(
+        "--precision",
+        choices=list(PRECISIONS),
+        default=PRECISION,
+        help="single stores trials as float32 / int32, halving memory",
+    )
+    args = parser.parse_args()
+
+    grid = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    country_names = args.countries or grid.get("countries") or list(COUNTRIES)
+    overrides = {**grid.get("overrides", {}), **dict(args.override)}
+
+    countries = {country: COUNTRIES[country] for country in country_names}
+    try:
+        validate_overrides(countries, overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    written = run_grid(
+        args.output,
+        countries=countries,
+        order_sizes=args.order_sizes or grid.get("order_sizes", [8_000]),
+        risk_tolerances=args.risk_tolerances
+        or grid.get("risk_tolerances", [0.0, 1.0, 5.0]),
+        overrides=overrides,
+        risk_measure=args.risk_measure,
+        n=args.trials,
+        seed=args.seed,
+        kind=args.executor,
+        precision=args.precision,
+    )
+    print(f"Wrote {written} rows to {args.output}")
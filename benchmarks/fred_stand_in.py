@@ -0,0 +1,73 @@
+"""
+Local stand-in for the FRED observations endpoint, so benchmarks run offline.
+
+Serves a fixed monthly series for any series_id and honours the
+observation_start, sort_order and limit parameters the client sends. Every
+request's query can be logged, and a non-200 status simulates an outage.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+FED_FUNDS_RATE = 4.33
+
+
+def observations(months: int = 36) -> list[dict]:
+    """Monthly observations up to the current month"""
+    end = pd.Timestamp.today().normalize()
+    dates = pd.date_range(end=end, periods=months, freq="MS")
+    return [
+        {"date": date.strftime("%Y-%m-%d"), "value": f"{FED_FUNDS_RATE:.2f}"}
+        for date in dates
+    ]
+
+
+class FredHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        if self.server.queries is not None:
+            self.server.queries.append(query)
+        if self.server.status != 200:
+            self.send_error(self.server.status)
+            return
+        rows = observations()
+        if "observation_start" in query:
+            rows = [row for row in rows if row["date"] >= query["observation_start"]]
+        if query.get("sort_order") == "desc":
+            rows = rows[::-1]
+        if "limit" in query:
+            rows = rows[: int(query["limit"])]
+
+        body = json.dumps({"observations": rows}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def fred_stand_in(queries: list | None = None, status: int = 200):
+    """
+    Serves on a free local port for the duration; yields the endpoint URL.
+    Each request's query parameters are appended to `queries` when given,
+    and every request is answered with `status` when it is not 200.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FredHandler)
+    server.queries = queries
+    server.status = status
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/fred/series/observations"
+    finally:
+        server.shutdown()
+        server.server_close()
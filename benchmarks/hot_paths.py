@@ -0,0 +1,284 @@
+"""
+Throughput, peak memory and latency of the simulation hot paths.
+
+Each case is timed `repeat` times and the best run is kept; peak memory is
+measured in a separate traced run. Results are written as JSON. When a
+baseline exists, any case more than `threshold` slower (or larger in peak
+memory) than in the baseline is reported, and the exit status is 1. FRED is
+served by a local stand-in, so the suite runs offline.
+
+Run from the repository root:
+    python -m benchmarks.hot_paths --trials 10000 50000 --order-sizes 8000
+    python -m benchmarks.hot_paths --save-baseline
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import live_data
+from config import COUNTRIES, MONTE_CARLO_SIMULATIONS
+from discrete import simulate_discrete_risks
+from engine import simulate_country, simulate_suppliers
+from executor import run_countries
+from histogram import bin_countries
+from kernels import simulate_costs
+from params import compile_params
+from portfolio import (
+    PortfolioScenarios,
+    PortfolioStats,
+    optimize_portfolio,
+    optimize_portfolio_cvar,
+)
+from sensitivity import run_sensitivity_analysis
+from streams import make_rng
+
+from benchmarks.fred_stand_in import fred_stand_in
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+# The app's default factors for a China sensitivity run
+SENSITIVITY_FACTORS = [
+    ("Raw Material Mean", ("raw", "mean")),
+    ("Labor Mean", ("labor", "mean")),
+    ("Disruption Lambda", ("disruption_lambda",)),
+    ("Damage Probability", ("damage_probability",)),
+    ("Cancellation Probability", ("cancellation_probability",)),
+]
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()  # warm-up: imports, pools, scipy caches
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(seconds), "peak_mb": peak / 2**20}
+
+
+# The Run button takes one of two paths, chosen by config.JOINT_SIMULATION
+# (off by default); both are timed, under stable names
+
+
+def run_click_joint(order_size: int, n: int):
+    """The Run button with JOINT_SIMULATION on, without Streamlit or caches"""
+    joint = simulate_suppliers(COUNTRIES, order_size, n, make_rng(0))
+    stats = PortfolioStats.from_matrix(
+        joint["suppliers"], joint["total_cost"] / order_size
+    )
+    optimize_portfolio(stats, 5.0)
+    bin_countries(dict(zip(joint["suppliers"], joint["total_cost"].T)))
+
+
+def run_click_countries(order_size: int, executor: str):
+    """The Run button with JOINT_SIMULATION off, without Streamlit or caches"""
+    runs = run_countries(COUNTRIES, order_size, 0, executor)
+    costs = {country: run["total_cost"] for country, run in runs.items()}
+    weights = {country: run.get("weights") for country, run in runs.items()}
+    stats = PortfolioStats.from_scenarios(
+        {country: x / order_size for country, x in costs.items()}, weights
+    )
+    optimize_portfolio(stats, 5.0)
+    bin_countries(costs, weights)
+
+
+def benchmark_cases(trials: list[int], order_sizes: list[int], executor: str):
+    """(name, fn, trials per call or None) for every case"""
+    cases = []
+    for n in trials:
+        for order_size in order_sizes:
+            axes = f"n={n},order={order_size}"
+            for country, params in COUNTRIES.items():
+                compiled = compile_params(params)
+                discrete_params = compiled.discrete_params(order_size)
+                cases.append(
+                    (
+                        f"simulate_country[{country},{axes}]",
+                        lambda p=compiled, o=order_size, n=n: simulate_country(
+                            p, o, n, make_rng(0)
+                        ),
+                        n,
+                    )
+                )
+                cases.append(
+                    (
+                        f"simulate_costs[{country},{axes}]",
+                        lambda p=compiled, o=order_size, n=n: simulate_costs(
+                            p, o, n, make_rng(0)
+                        ),
+                        n,
+                    )
+                )
+                cases.append(
+                    (
+                        f"discrete_risks[{country},{axes}]",
+                        lambda d=discrete_params, n=n: simulate_discrete_risks(
+                            d, n, make_rng(0)
+                        ),
+                        n,
+                    )
+                )
+            cases.append(
+                (
+                    f"run_click[joint,{axes}]",
+                    lambda o=order_size, n=n: run_click_joint(o, n),
+                    n * len(COUNTRIES),
+                )
+            )
+
+        joint = simulate_suppliers(COUNTRIES, order_sizes[0], n, make_rng(0))
+        costs = joint["total_cost"] / order_sizes[0]
+        stats = PortfolioStats.from_matrix(joint["suppliers"], costs)
+        scenarios = PortfolioScenarios.from_matrix(joint["suppliers"], costs)
+        cases.append(
+            (
+                f"optimize_portfolio[n={n}]",
+                lambda s=stats: optimize_portfolio(s, 5.0),
+                None,
+            )
+        )
+        cases.append(
+            (
+                f"optimize_portfolio_cvar[n={n}]",
+                lambda s=scenarios: optimize_portfolio_cvar(
+                    s.reduce(rng=make_rng(0)), 5.0
+                ),
+                None,
+            )
+        )
+
+    # run_monte_carlo draws its own MONTE_CARLO_SIMULATIONS trials, so these
+    # cases have no trial-count axis; the sensitivity's discrete draws match it
+    for order_size in order_sizes:
+        cases.append(
+            (
+                f"run_click[countries,order={order_size}]",
+                lambda o=order_size: run_click_countries(o, executor),
+                MONTE_CARLO_SIMULATIONS * len(COUNTRIES),
+            )
+        )
+        cases.append(
+            (
+                f"sensitivity[China,order={order_size}]",
+                lambda o=order_size: run_sensitivity_analysis(
+                    "China",
+                    COUNTRIES["China"],
+                    SENSITIVITY_FACTORS,
+                    o,
+                    executor=executor,
+                ),
+                None,
+            )
+        )
+    return cases
+
+
+def use_fred_stand_in(endpoint: str, cache_dir: str):
+    live_data.url = endpoint
+    live_data.api_key = "benchmark"
+    live_data.CACHE_DIR = Path(cache_dir)
+    live_data._fed_funds_rate = None
+
+
+def run_suite(
+    trials: list[int], order_sizes: list[int], repeat: int, executor: str
+) -> dict:
+    results = {}
+    with fred_stand_in() as endpoint, tempfile.TemporaryDirectory() as cache_dir:
+        use_fred_stand_in(endpoint, cache_dir)
+
+        def resolve_cold():
+            live_data._fed_funds_rate = None
+            for path in Path(cache_dir).glob("*"):
+                path.unlink()
+            live_data.resolve_fed_funds_rate()
+
+        results["fred_resolve_cold"] = measure(resolve_cold, repeat)
+        live_data.resolve_fed_funds_rate()
+
+        for name, fn, n in benchmark_cases(trials, order_sizes, executor):
+            result = measure(fn, repeat)
+            if n is not None:
+                result["trials_per_sec"] = n / result["seconds"]
+            results[name] = result
+            print(f"{name:55s} {result['seconds'] * 1000:9.1f} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "executor": executor,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> pd.DataFrame:
+    """One row per case in both runs; `regressed` when a ratio exceeds 1 + threshold"""
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        time_ratio = result["seconds"] / base["seconds"]
+        memory_ratio = result["peak_mb"] / max(base["peak_mb"], 1e-9)
+        rows.append(
+            {
+                "case": name,
+                "ms": result["seconds"] * 1000,
+                "baseline ms": base["seconds"] * 1000,
+                "time ratio": time_ratio,
+                "memory ratio": memory_ratio,
+                "regressed": max(time_ratio, memory_ratio) > 1 + threshold,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trials", nargs="+", type=int, default=[10_000, 50_000])
+    parser.add_argument("--order-sizes", nargs="+", type=int, default=[8_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--executor", default="serial")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="write the results as the baseline"
+    )
+    args = parser.parse_args()
+
+    current = run_suite(args.trials, args.order_sizes, args.repeat, args.executor)
+    Path(args.output).write_text(json.dumps(current, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+        sys.exit(0)
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        sys.exit(0)
+
+    report = compare(current, json.loads(args.baseline.read_text()), args.threshold)
+    print(report.to_string(index=False, float_format="{:,.2f}".format))
+    regressions = report[report["regressed"]]
+    if len(regressions):
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
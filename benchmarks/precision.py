@@ -0,0 +1,99 @@
+"""
+Decision outputs and memory of single- versus double-precision simulation.
+
+Both runs use the same seed, so they share every random draw and differ
+only by float32 / int32 rounding of the stored trials. For each supplier the
+report compares the mean cost and P95 per lamp, and for each risk tolerance
+the optimal allocation; the last column is the largest relative (or, for
+shares, absolute) difference.
+
+Run from the repository root:
+    python -m benchmarks.precision --trials 50000 --order-size 8000
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import COUNTRIES
+from engine import simulate_suppliers
+from metrics import weighted_mean, weighted_quantile
+from portfolio import PortfolioStats, optimize_portfolio
+from streams import make_rng
+
+
+def decision_outputs(joint: dict, order_size: int, risk_tolerances) -> dict:
+    suppliers = joint["suppliers"]
+    costs = joint["total_cost"] / order_size
+    stats = PortfolioStats.from_matrix(suppliers, costs)
+    outputs = {}
+    for j, supplier in enumerate(suppliers):
+        outputs[f"mean[{supplier}]"] = weighted_mean(costs[:, j])
+        outputs[f"p95[{supplier}]"] = weighted_quantile(costs[:, j], 0.95)
+    for lam in risk_tolerances:
+        shares = optimize_portfolio(stats, lam)["shares"]
+        for supplier, share in zip(suppliers, shares):
+            outputs[f"share[{supplier},lambda={lam:g}]"] = share
+    return outputs
+
+
+def precision_report(
+    countries=COUNTRIES,
+    order_size=8_000,
+    trials=50_000,
+    risk_tolerances=(0.0, 1.0, 5.0),
+    seed=0,
+) -> tuple[pd.DataFrame, dict]:
+    runs = {
+        precision: simulate_suppliers(
+            countries, order_size, trials, make_rng(seed), precision=precision
+        )
+        for precision in ("double", "single")
+    }
+    outputs = {
+        precision: decision_outputs(joint, order_size, risk_tolerances)
+        for precision, joint in runs.items()
+    }
+    rows = []
+    for name, double in outputs["double"].items():
+        single = outputs["single"][name]
+        difference = abs(single - double)
+        rows.append(
+            {
+                "Output": name,
+                "Double": double,
+                "Single": single,
+                "Difference": (
+                    difference if name.startswith("share") else difference / abs(double)
+                ),
+            }
+        )
+    memory = {
+        precision: (joint["total_cost"].nbytes + joint["lost_units"].nbytes) / 2**20
+        for precision, joint in runs.items()
+    }
+    return pd.DataFrame(rows), memory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--order-size", type=int, default=8_000)
+    parser.add_argument("--trials", type=int, default=50_000)
+    parser.add_argument(
+        "--risk-tolerances", nargs="+", type=float, default=[0.0, 1.0, 5.0]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    report, memory = precision_report(
+        order_size=args.order_size,
+        trials=args.trials,
+        risk_tolerances=args.risk_tolerances,
+        seed=args.seed,
+    )
+    print(report.to_string(index=False, float_format="{:,.6g}".format))
+    print(
+        "Trial storage: "
+        + ", ".join(f"{precision} {mb:,.2f} MB" for precision, mb in memory.items())
+    )
+    print(f"Largest difference: {np.max(report['Difference']):.2e}")
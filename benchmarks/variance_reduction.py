@@ -0,0 +1,71 @@
+"""
+Variance-reduction factor of each sampling strategy, per country.
+
+The expected cost per lamp is estimated `replications` times with `trials`
+trials each. The factor is var(plain estimates) / var(strategy estimates),
+so a factor of 5 means plain sampling needs about 5x the trials for the same
+confidence interval.
+
+Run from the repository root:
+    python -m benchmarks.variance_reduction --trials 5000 --replications 50
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import COUNTRIES
+from discrete import create_params_from_dict
+from engine import SAMPLING_STRATEGIES, simulate_country
+from streams import make_rng, spawn_seeds
+
+
+def estimate_means(params, order_size, trials, replications, sampling, seed):
+    discrete_params = create_params_from_dict(params, order_size)
+    means = []
+    for child in spawn_seeds(seed, replications):
+        run = simulate_country(
+            params, order_size, trials, make_rng(child), discrete_params, sampling
+        )
+        means.append(run["total_cost"].mean() / order_size)
+    return np.array(means)
+
+
+def variance_reduction_report(
+    countries=COUNTRIES, order_size=8_000, trials=5_000, replications=50, seed=0
+) -> pd.DataFrame:
+    rows = []
+    for country, params in countries.items():
+        variances = {
+            sampling: estimate_means(
+                params, order_size, trials, replications, sampling, seed
+            ).var(ddof=1)
+            for sampling in SAMPLING_STRATEGIES
+        }
+        for sampling, variance in variances.items():
+            rows.append(
+                {
+                    "Country": country,
+                    "Sampling": sampling,
+                    "Std Error": np.sqrt(variance),
+                    "Variance Reduction": variances["plain"] / variance,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--order-size", type=int, default=8_000)
+    parser.add_argument("--trials", type=int, default=5_000)
+    parser.add_argument("--replications", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    report = variance_reduction_report(
+        order_size=args.order_size,
+        trials=args.trials,
+        replications=args.replications,
+        seed=args.seed,
+    )
+    print(report.to_string(index=False))
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from config import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+
+
+def _jsonable(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return repr(value)
+
+
+def stable_hash(*parts) -> str:
+    """
+    Hash of any nesting of dicts, lists and scalars that is stable across
+    processes and dict insertion order (unlike hash()).
+    """
+    payload = json.dumps(parts, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def memoize(key, max_entries: int = CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+    """
+    Caches fn's results under stable_hash(key(*args, **kwargs)). `key` picks
+    out the arguments that determine the result, so callbacks and other
+    incidental arguments do not split the cache.
+    """
+
+    def decorator(fn):
+        cache = TTLCache(max_entries, ttl)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache_key = stable_hash(fn.__qualname__, key(*args, **kwargs))
+            result = cache.get(cache_key)
+            if result is None:
+                result = fn(*args, **kwargs)
+                cache.put(cache_key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
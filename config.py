@@ -1,13 +1,109 @@
-from live_data import get_most_recent_fed_funds_rate
+import os
+from pathlib import Path
+
+from live_data import resolve_fed_funds_rate
 
 MONTE_CARLO_SIMULATIONS = 50000
+# Order-size slider range, also the grid of the precomputed response surface
+ORDER_SIZE_MIN = 1_000
+ORDER_SIZE_MAX = 50_000
+ORDER_SIZE_STEP = 500
+SURFACE_TRIALS = 20_000
+SURFACE_PATH = "order_size_surface.npz"
+# Streaming runs: trials simulated per chunk (memory stays bounded by this
+# whatever the trial count) and the quantile sketch's relative accuracy
+STREAMING_CHUNK_SIZE = 100_000
+DDSKETCH_RELATIVE_ACCURACY = 0.005
+# Fused per-trial cost kernel: "numba" compiles it when numba is installed,
+# "numpy" forces the in-place NumPy fallback. Totals-only runs simulate this
+# many trials at a time into the preallocated outputs.
+COST_KERNEL = "numba"
+KERNEL_CHUNK_SIZE = 65_536
+# Per-trial storage: "double" (float64 costs, int64 units) or "single" (float32
+# costs, int32 units, half the memory). Sums and means accumulate in float64
+# either way.
+PRECISION = "double"
+# Bins in the cost distribution chart, shared by every country
+HISTOGRAM_BINS = 60
+# Seed for the Run button (None draws fresh entropy on every run, and such runs
+# are never written to the result store)
+SIMULATION_SEED = 20250101
+# Baseline, low and high sensitivity runs share this seed (common random numbers)
+SENSITIVITY_SEED = 20250101
+# Where countries, sensitivity factors and trial chunks run: process, thread or serial
+EXECUTOR = "process"
+MAX_WORKERS = None  # None uses every available core
+# In-memory cache for simulation and sensitivity results
+CACHE_MAX_ENTRIES = 32
+CACHE_TTL_SECONDS = 60 * 60
+# On-disk result store shared by every session and process: seeded simulation
+# results are kept as .npy files, keyed by their inputs and the code version,
+# and evicted least recently used first beyond the size limit. An empty
+# RESULT_STORE_DIR disables it.
+RESULT_STORE_DIR = os.getenv(
+    "RESULT_STORE_DIR", str(Path.home() / ".cache" / "teslacase" / "results")
+)
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", 2 * 2**30))
+# Adaptive mode: simulate in batches until the mean cost's standard error is
+# within ADAPTIVE_TARGET_REL_SE of the mean. With ADAPTIVE_TRIALS on, the
+# default Run path simulates each supplier this way (engine.py's
+# run_monte_carlo_adaptive) instead of a fixed MONTE_CARLO_SIMULATIONS trials,
+# and the app reports the trials each supplier used.
+ADAPTIVE_TRIALS = False
+ADAPTIVE_TARGET_REL_SE = 0.001
+ADAPTIVE_BATCH_SIZE = 2_000
+ADAPTIVE_MIN_TRIALS = 2_000
+ADAPTIVE_MAX_TRIALS = 500_000
+# Continuous-driver sampling: plain, antithetic, lhs (Latin hypercube) or sobol.
+# Used by engine.py (simulate_country, the joint Run path and batch.py); the
+# default Run path's simulation.run_monte_carlo always samples plainly.
+SAMPLING = "plain"
+# Importance sampling: rare disruptions, border delays and cancellations are
+# drawn at least this often and reweighted by their likelihood ratio. The
+# joint Run path (JOINT_SIMULATION) samples this way when IMPORTANCE_SAMPLING
+# is on.
+IMPORTANCE_SAMPLING = False
+IMPORTANCE_DISRUPTION_LAMBDA = 0.05
+IMPORTANCE_BORDER_DELAY_LAMBDA = 0.05
+IMPORTANCE_CANCELLATION_PROBABILITY = 0.05
+# Bounds on each supplier's share of the order in the portfolio optimizer
+MIN_SUPPLIER_SHARE = 0.0
+MAX_SUPPLIER_SHARE = 1.0
+# CVaR objective: tail level, and how many scenarios the LP keeps after
+# reduction ("sample", weight-proportional subsampling, or "kmeans" clustering)
+CVAR_ALPHA = 0.95
+CVAR_SCENARIOS = 5_000
+SCENARIO_REDUCTION = "sample"
+# Joint simulation: the Run button draws every supplier in one pass through
+# engine.py's cost model, with the drivers below tied together across
+# suppliers by a Gaussian copula. Off by default, so the Run button uses
+# simulation.run_monte_carlo per country: the model the sensitivity analysis
+# also runs, so the headline cost and the tornado baseline always agree.
+# batch.py always uses engine.py, and takes the correlations only when this
+# is on. Each value is one correlation shared by every pair of suppliers, or
+# a full correlation matrix in COUNTRIES order. Drivers left out are drawn
+# independently per supplier.
+JOINT_SIMULATION = False
+DRIVER_CORRELATION = {
+    "raw": 0.6,  # resin prices follow the same plastics PPI everywhere
+    "currency": 0.4,  # USD strength moves MXN and CNY together
+}
 MODEL_Y_PRICE = 41630
 MODEL_Y_MANUFACTURING_COST = 38000
 MODEL_Y_PROFIT = MODEL_Y_PRICE - MODEL_Y_MANUFACTURING_COST
 WACC = 0.0877
 EXPEDITED_SHIPPING_COST_PER_HEADLAMP = 50.71
-# Fetch Fed Funds Rate from FRED API (falls back to default if unavailable)
-FED_FUNDS_RATE = get_most_recent_fed_funds_rate()
+
+
+def __getattr__(name):
+    # FED_FUNDS_RATE is resolved on first access (from the FRED cache or API,
+    # falling back to a default) so importing config never waits on the network
+    if name == "FED_FUNDS_RATE":
+        rate = resolve_fed_funds_rate()
+        globals()["FED_FUNDS_RATE"] = rate
+        return rate
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 COUNTRIES = {
     "China": {
@@ -16,6 +112,7 @@ COUNTRIES = {
             "dist": "lognormal",
             "mean": 1.379,
             "std": 0.120,
+            "log_params": True,  # mean/std are mu/sigma of log(labor)
         },  # mean ~4, std ~0.5
         "indirect": {"dist": "gamma", "shape": 16.0, "scale": 0.25},  # mean 4, std 1
         "logistics": {
@@ -68,7 +165,12 @@ COUNTRIES = {
     "US": {
         # Continuous variables: these are the parameters for each plant
         "raw": {"dist": "normal", "mean": 40, "std": 4},
-        "labor": {"dist": "lognormal", "mean": 2.48, "std": 0.15},  # mean ~12, std ~2
+        "labor": {
+            "dist": "lognormal",
+            "mean": 2.48,
+            "std": 0.15,
+            "log_params": True,
+        },  # mean ~12, std ~2
         "indirect": {"dist": "gamma", "shape": 25.0, "scale": 0.40},  # mean 10, std 2
         "logistics": {"dist": "normal", "mean": 9, "std": 0},
         "electricity": {"dist": "triangular", "min": 3.5, "mode": 4.0, "max": 4.5},
@@ -121,6 +223,7 @@ COUNTRIES = {
             "dist": "lognormal",
             "mean": 2.0635,
             "std": 0.1786,
+            "log_params": True,
         },  # mean ~8, std ~1.5
         "indirect": {
             "dist": "gamma",
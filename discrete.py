@@ -1,20 +1,47 @@
-from numpy import sum
-from numpy.random import binomial, choice, poisson, uniform
+from dataclasses import dataclass
 
+from numpy import (
+    arange,
+    array,
+    bincount,
+    empty,
+    exp,
+    float32,
+    float64,
+    int32,
+    int64,
+    maximum,
+    minimum,
+    ndarray,
+    ones,
+    repeat,
+    where,
+)
+from numpy.random import Generator
+from scipy.stats import binom, poisson
+
+import config
 from config import (
     EXPEDITED_SHIPPING_COST_PER_HEADLAMP,
-    FED_FUNDS_RATE,
+    IMPORTANCE_BORDER_DELAY_LAMBDA,
+    IMPORTANCE_CANCELLATION_PROBABILITY,
+    IMPORTANCE_DISRUPTION_LAMBDA,
     MODEL_Y_MANUFACTURING_COST,
     MODEL_Y_PROFIT,
+    PRECISION,
     WACC,
 )
+from profiling import profiled
+from streams import get_rng
 from structs import DiscreteRiskSimulation, DiscreteRisksParams
 
 # --- Model Functions ---
 
 
-def opportunity_cost(delayed_units: int):
-    return MODEL_Y_PROFIT * delayed_units * ((1 + FED_FUNDS_RATE) / 365)
+def opportunity_cost(delayed_units: int, fed_funds_rate: float | None = None):
+    if fed_funds_rate is None:
+        fed_funds_rate = config.FED_FUNDS_RATE
+    return MODEL_Y_PROFIT * delayed_units * ((1 + fed_funds_rate) / 365)
 
 
 def expedited_shipping_cost(delayed_units: int):
@@ -33,34 +60,247 @@ def total_cost(delayed_units: int, days_delayed: int):
     )
 
 
-# --- Distribution Generators ---
-def generate_tariff_escalation(tariff_escalation_probability: float) -> float:
-    tariff_escalation = binomial(1, tariff_escalation_probability, 1)
+# --- Columnar Results ---
+RISK_COMPONENTS = ("disruption", "border", "damage", "defective", "cancellation")
 
-    if tariff_escalation == 0:
-        return 0
-    else:
-        return choice([0.25, 0.50, 1], 1)[0]
+# (cost dtype, unit dtype) per storage precision
+PRECISIONS = {"double": (float64, int64), "single": (float32, int32)}
 
 
-def generate_disruption_risk(
+def precision_dtypes(precision: str = PRECISION) -> tuple[type, type]:
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision '{precision}', expected one of {tuple(PRECISIONS)}"
+        )
+    return PRECISIONS[precision]
+
+
+@dataclass
+class DiscreteRiskBatch:
+    """
+    Struct-of-arrays result for n trials of every discrete risk. Row i of
+    `lost_units` and `cost` holds component RISK_COMPONENTS[i]; each row is a
+    contiguous, zero-copy view. Both are int64 / float64, or int32 / float32
+    in single precision, where the totals still accumulate in 64 bits.
+    `weights` holds per-trial likelihood ratios under importance sampling
+    and is None for plain draws.
+    """
+
+    lost_units: ndarray
+    cost: ndarray
+    tariff_escalation: ndarray
+    weights: ndarray | None = None
+
+    @classmethod
+    def empty(cls, n: int, precision: str = PRECISION) -> "DiscreteRiskBatch":
+        cost_dtype, unit_dtype = precision_dtypes(precision)
+        return cls(
+            lost_units=empty((len(RISK_COMPONENTS), n), dtype=unit_dtype),
+            cost=empty((len(RISK_COMPONENTS), n), dtype=cost_dtype),
+            tariff_escalation=empty(n, dtype=cost_dtype),
+        )
+
+    @property
+    def n(self) -> int:
+        return self.cost.shape[1]
+
+    def component_lost_units(self, component: str) -> ndarray:
+        return self.lost_units[RISK_COMPONENTS.index(component)]
+
+    def component_cost(self, component: str) -> ndarray:
+        return self.cost[RISK_COMPONENTS.index(component)]
+
+    @property
+    def total_lost_units(self) -> ndarray:
+        return self.lost_units.sum(axis=0, dtype=int64)
+
+    @property
+    def total_cost(self) -> ndarray:
+        return self.cost.sum(axis=0, dtype=float64)
+
+    def cost_breakdown(self) -> dict:
+        """Mean cost per trial for each risk component"""
+        if self.weights is None:
+            means = self.cost.mean(axis=1, dtype=float64)
+        else:
+            means = self.cost @ self.weights / self.weights.sum()
+        return dict(zip(RISK_COMPONENTS, means.tolist()))
+
+
+@dataclass
+class ImportanceSampling:
+    """
+    Proposal floors for the rare, expensive branches. A risk whose rate is
+    positive but below its floor is drawn at the floor instead, and each
+    trial is reweighted by its likelihood ratio, so tail estimates rest on
+    many more tail samples.
+    """
+
+    disruption_lambda: float = IMPORTANCE_DISRUPTION_LAMBDA
+    border_delay_lambda: float = IMPORTANCE_BORDER_DELAY_LAMBDA
+    cancellation_probability: float = IMPORTANCE_CANCELLATION_PROBABILITY
+
+    @staticmethod
+    def proposal(rate: float, floor: float) -> float:
+        return floor if 0 < rate < floor else rate
+
+
+# --- Batch Distribution Generators ---
+# Each batch generator draws all `n` trials at once and returns a pair of
+# NumPy arrays: (lost_units, cost). The scalar generators below are thin
+# wrappers around these with n=1.
+
+TARIFF_ESCALATION_LEVELS = [0.25, 0.50, 1]
+
+
+def compound_uniform_severity(
+    event_lambda: float,
+    min_impact: int,
+    max_impact: int,
+    n: int,
+    rng: Generator | None = None,
+) -> tuple[ndarray, ndarray]:
+    """
+    Draws a Poisson number of events per trial and sums a uniform severity
+    for every event. All severities are drawn in one flat array and summed
+    back into their trials, so there is no Python loop over trials.
+    Returns (event_counts, total_severity).
+    """
+    rng = get_rng(rng)
+    events = rng.poisson(event_lambda, size=n)
+    return events, sum_uniform_severity(events, min_impact, max_impact, rng)
+
+
+def sum_uniform_severity(
+    events: ndarray, min_impact: int, max_impact: int, rng: Generator
+) -> ndarray:
+    """Sum of one uniform severity per event, for each trial's event count"""
+    severity = rng.uniform(low=min_impact, high=max_impact, size=events.sum())
+    trial_index = repeat(arange(len(events)), events)
+    return bincount(trial_index, weights=severity, minlength=len(events))
+
+
+def compound_risk_batch(
+    event_lambda: float,
+    min_impact: int,
+    max_impact: int,
+    days_delayed: int,
+    n: int,
+    rng: Generator | None = None,
+) -> tuple[ndarray, ndarray, ndarray]:
+    """Returns (event_counts, lost_units, cost); no events means no cost"""
+    events, severity = compound_uniform_severity(
+        event_lambda, min_impact, max_impact, n, rng
+    )
+    total_lost = severity.astype(int64)
+    cost = where(events == 0, 0.0, total_cost(total_lost, days_delayed))
+    return events, total_lost, cost
+
+
+@profiled()
+def generate_tariff_escalation_batch(
+    tariff_escalation_probability: float, n: int, rng: Generator | None = None
+) -> ndarray:
+    rng = get_rng(rng)
+    escalated = rng.binomial(1, tariff_escalation_probability, size=n)
+    levels = rng.choice(TARIFF_ESCALATION_LEVELS, size=n)
+    return where(escalated == 0, 0.0, levels)
+
+
+@profiled()
+def generate_disruption_risk_batch(
     disruption_lambda: float,
     min_impact: int,
     max_impact: int,
     disruption_days_delayed: int,
-) -> DiscreteRiskSimulation:
+    n: int,
+    rng: Generator | None = None,
+) -> tuple[ndarray, ndarray]:
     """Based on the total number of disruptions, estimate the # impacted units"""
-    disruptions = poisson(disruption_lambda)
+    _, total_lost, cost = compound_risk_batch(
+        disruption_lambda, min_impact, max_impact, disruption_days_delayed, n, rng
+    )
+    return total_lost, cost
+
+
+@profiled()
+def generate_border_delay_risk_batch(
+    border_delay_lambda: float,
+    min_impact: int,
+    max_impact: int,
+    border_delay_days_delayed: int,
+    n: int,
+    rng: Generator | None = None,
+) -> tuple[ndarray, ndarray]:
+    """Total number of border delays"""
+    _, total_lost, cost = compound_risk_batch(
+        border_delay_lambda, min_impact, max_impact, border_delay_days_delayed, n, rng
+    )
+    return total_lost, cost
+
+
+@profiled()
+def generate_damaged_risk_batch(
+    order_size: int,
+    damage_probability: float,
+    damage_days_delayed: int,
+    n: int,
+    rng: Generator | None = None,
+) -> tuple[ndarray, ndarray]:
+    """Total number of damaged units"""
+    rng = get_rng(rng)
+    damaged_units = rng.binomial(order_size, damage_probability, size=n)
+    return damaged_units, total_cost(damaged_units, damage_days_delayed)
+
+
+@profiled()
+def generate_defective_risk_batch(
+    order_size: int,
+    defective_probability: float,
+    defective_days_delayed: int,
+    n: int,
+    rng: Generator | None = None,
+) -> tuple[ndarray, ndarray]:
+    """Total number of defective units"""
+    rng = get_rng(rng)
+    defective_units = rng.binomial(order_size, defective_probability, size=n)
+    return defective_units, total_cost(defective_units, defective_days_delayed)
+
+
+@profiled()
+def generate_last_minute_cancellation_risk_batch(
+    cancellation_probability: float,
+    order_size: int,
+    cancellation_days_delayed: int,
+    n: int,
+    rng: Generator | None = None,
+) -> tuple[ndarray, ndarray]:
+    """They either cancel or they don't"""
+    rng = get_rng(rng)
+    # since they cancel the entire order, we need to multiply by the order size
+    cancelled_units = rng.binomial(1, cancellation_probability, size=n) * order_size
+    return cancelled_units, total_cost(cancelled_units, cancellation_days_delayed)
+
 
-    if disruptions == 0:
-        return DiscreteRiskSimulation(0, 0)
+# --- Distribution Generators ---
+def generate_tariff_escalation(
+    tariff_escalation_probability: float, rng: Generator | None = None
+) -> float:
+    return generate_tariff_escalation_batch(tariff_escalation_probability, 1, rng)[0]
 
-    severity = uniform(low=min_impact, high=max_impact, size=disruptions)
-    total_lost = int(sum(severity))
 
-    return DiscreteRiskSimulation(
-        total_lost, total_cost(total_lost, disruption_days_delayed)
+def generate_disruption_risk(
+    disruption_lambda: float,
+    min_impact: int,
+    max_impact: int,
+    disruption_days_delayed: int,
+    rng: Generator | None = None,
+) -> DiscreteRiskSimulation:
+    """Based on the total number of disruptions, estimate the # impacted units"""
+    lost, cost = generate_disruption_risk_batch(
+        disruption_lambda, min_impact, max_impact, disruption_days_delayed, 1, rng
     )
+    return DiscreteRiskSimulation(int(lost[0]), cost[0])
 
 
 def generate_border_delay_risk(
@@ -68,49 +308,205 @@ def generate_border_delay_risk(
     min_impact: int,
     max_impact: int,
     border_delay_days_delayed: int,
+    rng: Generator | None = None,
 ) -> DiscreteRiskSimulation:
     """Total number of border delays"""
-    border_delays = poisson(border_delay_lambda)
-    if border_delays == 0:
-        return DiscreteRiskSimulation(0, 0)
-
-    severity = uniform(low=min_impact, high=max_impact, size=border_delays)
-    total_lost = int(sum(severity))
-    return DiscreteRiskSimulation(
-        total_lost, total_cost(total_lost, border_delay_days_delayed)
+    lost, cost = generate_border_delay_risk_batch(
+        border_delay_lambda, min_impact, max_impact, border_delay_days_delayed, 1, rng
     )
+    return DiscreteRiskSimulation(int(lost[0]), cost[0])
 
 
 def generate_damaged_risk(
-    order_size: int, damage_probability: float, damage_days_delayed: int
+    order_size: int,
+    damage_probability: float,
+    damage_days_delayed: int,
+    rng: Generator | None = None,
 ) -> DiscreteRiskSimulation:
     """Total number of damaged units"""
-    damaged_units = binomial(order_size, damage_probability)
-    return DiscreteRiskSimulation(
-        damaged_units, total_cost(damaged_units, damage_days_delayed)
+    lost, cost = generate_damaged_risk_batch(
+        order_size, damage_probability, damage_days_delayed, 1, rng
     )
+    return DiscreteRiskSimulation(int(lost[0]), cost[0])
 
 
 def generate_defective_risk(
-    order_size: int, defective_probability: float, defective_days_delayed: int
+    order_size: int,
+    defective_probability: float,
+    defective_days_delayed: int,
+    rng: Generator | None = None,
 ) -> DiscreteRiskSimulation:
     """Total number of defective units"""
-    defective_units = binomial(order_size, defective_probability)
-    return DiscreteRiskSimulation(
-        defective_units, total_cost(defective_units, defective_days_delayed)
+    lost, cost = generate_defective_risk_batch(
+        order_size, defective_probability, defective_days_delayed, 1, rng
     )
+    return DiscreteRiskSimulation(int(lost[0]), cost[0])
 
 
 def generate_last_minute_cancellation_risk(
-    cancellation_probability: float, order_size: int, cancellation_days_delayed: int
+    cancellation_probability: float,
+    order_size: int,
+    cancellation_days_delayed: int,
+    rng: Generator | None = None,
 ) -> DiscreteRiskSimulation:
     """They either cancel or they don't"""
-    cancelled = binomial(1, cancellation_probability)
-    return DiscreteRiskSimulation(
-        # since they cancel the entire order, we need to multiply by the order size
-        cancelled * order_size,
-        total_cost(cancelled * order_size, cancellation_days_delayed),
+    lost, cost = generate_last_minute_cancellation_risk_batch(
+        cancellation_probability, order_size, cancellation_days_delayed, 1, rng
+    )
+    return DiscreteRiskSimulation(int(lost[0]), cost[0])
+
+
+@profiled()
+def simulate_discrete_risks(
+    params: DiscreteRisksParams,
+    n: int,
+    rng: Generator | None = None,
+    importance: ImportanceSampling | None = None,
+    precision: str = PRECISION,
+) -> DiscreteRiskBatch:
+    """
+    Runs every discrete risk for n trials into one columnar result, stored at
+    `precision`. With `importance`, rare disruptions, border delays and
+    cancellations are oversampled and the batch carries the per-trial
+    likelihood ratios.
+    """
+    rng = get_rng(rng)
+    batch = DiscreteRiskBatch.empty(n, precision)
+    weights = ones(n) if importance is not None else None
+
+    compound_risks = (
+        (
+            params.disruption_lambda,
+            params.disruption_min,
+            params.disruption_max,
+            params.disruption_days_delayed,
+            importance and importance.disruption_lambda,
+        ),
+        (
+            params.border_delay_lambda,
+            params.border_delay_min,
+            params.border_delay_max,
+            params.border_delay_days_delayed,
+            importance and importance.border_delay_lambda,
+        ),
+    )
+    for i, (event_lambda, min_impact, max_impact, days_delayed, floor) in enumerate(
+        compound_risks
+    ):
+        proposal = event_lambda
+        if importance is not None:
+            proposal = ImportanceSampling.proposal(event_lambda, floor)
+        events, batch.lost_units[i], batch.cost[i] = compound_risk_batch(
+            proposal, min_impact, max_impact, days_delayed, n, rng
+        )
+        if proposal != event_lambda:
+            # Poisson likelihood ratio: exp(mu - lambda) * (lambda / mu) ** k
+            weights *= (
+                exp(proposal - event_lambda) * (event_lambda / proposal) ** events
+            )
+
+    batch.lost_units[2], batch.cost[2] = generate_damaged_risk_batch(
+        params.order_size,
+        params.damage_probability,
+        params.quality_days_delayed,
+        n,
+        rng,
+    )
+    batch.lost_units[3], batch.cost[3] = generate_defective_risk_batch(
+        params.order_size,
+        params.defective_probability,
+        params.quality_days_delayed,
+        n,
+        rng,
+    )
+
+    cancellation_probability = params.cancellation_probability
+    if importance is not None:
+        cancellation_probability = ImportanceSampling.proposal(
+            params.cancellation_probability, importance.cancellation_probability
+        )
+    batch.lost_units[4], batch.cost[4] = generate_last_minute_cancellation_risk_batch(
+        cancellation_probability,
+        params.order_size,
+        params.cancellation_days_delayed,
+        n,
+        rng,
+    )
+    if cancellation_probability != params.cancellation_probability:
+        p, q = params.cancellation_probability, cancellation_probability
+        weights *= where(batch.lost_units[4] > 0, p / q, (1 - p) / (1 - q))
+
+    batch.tariff_escalation[:] = generate_tariff_escalation_batch(
+        params.tariff_escalation, n, rng
+    )
+    batch.weights = weights
+    return batch
+
+
+# Rows of uniforms consumed by simulate_discrete_risks_from_uniforms: disruption
+# count, border delay count, damage, defects, cancellation, and the tariff
+# escalation's occurrence and level
+DISCRETE_UNIFORM_DIMS = 7
+
+
+@profiled()
+def simulate_discrete_risks_from_uniforms(
+    params: DiscreteRisksParams,
+    u: ndarray,
+    rng: Generator | None = None,
+    precision: str = PRECISION,
+) -> DiscreteRiskBatch:
+    """
+    Same risks as simulate_discrete_risks, but event counts, unit losses,
+    cancellations and escalations come from inverse CDFs at the given
+    (DISCRETE_UNIFORM_DIMS, n) uniforms. Stratified or quasi-random layouts
+    of u therefore carry over to the discrete risks. The severity of each
+    event is still drawn from rng.
+    """
+    rng = get_rng(rng)
+    n = u.shape[1]
+    batch = DiscreteRiskBatch.empty(n, precision)
+    compound_risks = (
+        (
+            params.disruption_lambda,
+            params.disruption_min,
+            params.disruption_max,
+            params.disruption_days_delayed,
+        ),
+        (
+            params.border_delay_lambda,
+            params.border_delay_min,
+            params.border_delay_max,
+            params.border_delay_days_delayed,
+        ),
+    )
+    for i, (event_lambda, min_impact, max_impact, days_delayed) in enumerate(
+        compound_risks
+    ):
+        events = maximum(poisson.ppf(u[i], event_lambda), 0).astype(int64)
+        lost = sum_uniform_severity(events, min_impact, max_impact, rng).astype(int64)
+        batch.lost_units[i] = lost
+        batch.cost[i] = where(events == 0, 0.0, total_cost(lost, days_delayed))
+
+    quality_risks = (
+        (2, params.damage_probability),
+        (3, params.defective_probability),
+    )
+    for i, probability in quality_risks:
+        lost = maximum(binom.ppf(u[i], params.order_size, probability), 0)
+        batch.lost_units[i] = lost
+        batch.cost[i] = total_cost(lost, params.quality_days_delayed)
+
+    cancelled_units = (u[4] < params.cancellation_probability) * params.order_size
+    batch.lost_units[4] = cancelled_units
+    batch.cost[4] = total_cost(cancelled_units, params.cancellation_days_delayed)
+
+    levels = array(TARIFF_ESCALATION_LEVELS, dtype=float64)
+    level_index = minimum((u[6] * len(levels)).astype(int64), len(levels) - 1)
+    batch.tariff_escalation[:] = where(
+        u[5] < params.tariff_escalation, levels[level_index], 0.0
     )
+    return batch
 
 
 def create_params_from_dict(country_dict: dict, order_size: int) -> DiscreteRisksParams:
@@ -118,7 +514,6 @@ def create_params_from_dict(country_dict: dict, order_size: int) -> DiscreteRisk
     Reads a dictionary of parameters for a country and creates a
     structured DiscreteRisksParams object.
     """
-    print(country_dict)
     return DiscreteRisksParams(
         order_size=order_size,
         disruption_lambda=country_dict["disruption_lambda"],
@@ -0,0 +1,374 @@
+import warnings
+
+import numpy as np
+from numpy import ndarray
+from numpy.random import Generator
+from scipy import stats
+from scipy.special import ndtr, ndtri
+
+from config import (
+    ADAPTIVE_BATCH_SIZE,
+    ADAPTIVE_MAX_TRIALS,
+    ADAPTIVE_MIN_TRIALS,
+    ADAPTIVE_TARGET_REL_SE,
+    DRIVER_CORRELATION,
+    PRECISION,
+    SAMPLING,
+)
+from discrete import (
+    DISCRETE_UNIFORM_DIMS,
+    ImportanceSampling,
+    precision_dtypes,
+    simulate_discrete_risks,
+    simulate_discrete_risks_from_uniforms,
+)
+from kernels import fused_costs
+from params import (
+    COST_DRIVERS,
+    CountryParams,
+    DriverSpec,
+    as_driver,
+    compile_params,
+)
+from profiling import profiled
+from streaming import Welford
+from streams import get_rng, make_rng
+from structs import DiscreteRisksParams
+
+
+def sample_driver(spec: "dict | DriverSpec", n: int, rng: Generator) -> ndarray:
+    return as_driver(spec).sample(n, rng)
+
+
+# --- Sampling strategies ---
+# Every strategy except "plain" lays out one uniform per dimension (the
+# continuous drivers, the yield, the currency factor and the discrete risk
+# occurrences) and maps it through that dimension's inverse CDF.
+SAMPLING_STRATEGIES = ("plain", "antithetic", "lhs", "sobol")
+CONTINUOUS_DIMS = len(COST_DRIVERS) + 2
+
+
+def driver_ppf(spec: "dict | DriverSpec", u: ndarray) -> ndarray:
+    """Inverse CDF of a {"dist": ...} spec evaluated at uniforms u"""
+    return as_driver(spec).ppf(u)
+
+
+def sample_uniforms(n: int, d: int, rng: Generator, sampling: str) -> ndarray:
+    """(d, n) uniforms on (0, 1) laid out by the chosen strategy"""
+    if sampling == "antithetic":
+        half = rng.random((d, (n + 1) // 2))
+        return np.concatenate([half, 1 - half], axis=1)[:, :n]
+    if sampling == "lhs":
+        return stats.qmc.LatinHypercube(d, seed=rng).random(n).T
+    if sampling == "sobol":
+        with warnings.catch_warnings():
+            # balance properties are best at powers of two, but any n is valid
+            warnings.simplefilter("ignore", UserWarning)
+            u = stats.qmc.Sobol(d, scramble=True, seed=rng).random(n).T
+        # keep the inverse CDFs finite
+        return np.clip(u, np.finfo(float).tiny, 1 - np.finfo(float).eps)
+    raise ValueError(
+        f"Unknown sampling strategy '{sampling}', expected one of {SAMPLING_STRATEGIES}"
+    )
+
+
+@profiled()
+def sample_continuous(
+    params: "dict | CountryParams", n: int, rng: Generator
+) -> tuple[ndarray, ndarray, ndarray]:
+    """Returns (sum of cost drivers, yield, currency factor) per trial"""
+    params = compile_params(params)
+    base = params.drivers[0].sample(n, rng)
+    for spec in params.drivers[1:]:
+        base += spec.sample(n, rng)
+    yield_ = params.yield_spec.sample(n, rng)
+    currency = 1 + rng.normal(0, params.currency_std, n)
+    return base, yield_, currency
+
+
+@profiled()
+def continuous_from_uniforms(
+    params: "dict | CountryParams", u: ndarray
+) -> tuple[ndarray, ndarray, ndarray]:
+    """sample_continuous, driven by (CONTINUOUS_DIMS, n) uniforms"""
+    params = compile_params(params)
+    base = params.drivers[0].ppf(u[0])
+    for i, spec in enumerate(params.drivers[1:], start=1):
+        base += spec.ppf(u[i])
+    yield_ = params.yield_spec.ppf(u[-2])
+    currency = 1 + params.currency_std * ndtri(u[-1])
+    return base, yield_, currency
+
+
+@profiled()
+def simulate_country(
+    params: "dict | CountryParams",
+    order_size: int,
+    n: int,
+    rng: Generator | None = None,
+    discrete_params: DiscreteRisksParams | None = None,
+    sampling: str = SAMPLING,
+    importance: ImportanceSampling | None = None,
+    precision: str = PRECISION,
+) -> dict:
+    """
+    Simulates n trials of one supplier in a single vectorized pass.
+
+    Per lamp, the continuous drivers are summed and divided by the
+    manufacturing yield. The result is scaled by (1 + tariff + escalation)
+    and by the currency factor (1 + N(0, currency_std)). The order total
+    adds the discrete-risk costs. `sampling` picks how the random draws are
+    laid out (see SAMPLING_STRATEGIES). With `importance`, rare discrete
+    branches are oversampled and `weights` holds each trial's likelihood
+    ratio (None otherwise). Returns the same total_cost / lost_units keys as
+    run_monte_carlo, plus the weights and the columnar discrete results, all
+    stored at `precision` (see PRECISIONS).
+    """
+    rng = get_rng(rng)
+    params = compile_params(params)
+    cost_dtype, unit_dtype = precision_dtypes(precision)
+    if discrete_params is None:
+        discrete_params = params.discrete_params(order_size)
+
+    if sampling == "plain":
+        per_lamp, yield_, currency = sample_continuous(params, n, rng)
+        discrete = simulate_discrete_risks(
+            discrete_params, n, rng, importance, precision
+        )
+    elif importance is not None:
+        raise ValueError("Importance sampling is only supported with plain sampling")
+    else:
+        u = sample_uniforms(n, CONTINUOUS_DIMS + DISCRETE_UNIFORM_DIMS, rng, sampling)
+        per_lamp, yield_, currency = continuous_from_uniforms(
+            params, u[:CONTINUOUS_DIMS]
+        )
+        discrete = simulate_discrete_risks_from_uniforms(
+            discrete_params, u[CONTINUOUS_DIMS:], rng, precision
+        )
+    per_lamp /= yield_
+    per_lamp *= currency
+    per_lamp *= np.add(1 + params.fixed_tariff, discrete.tariff_escalation, dtype=float)
+    per_lamp *= order_size
+    per_lamp += discrete.total_cost
+
+    return {
+        "total_cost": per_lamp.astype(cost_dtype, copy=False),
+        "lost_units": discrete.total_lost_units.astype(unit_dtype, copy=False),
+        "weights": discrete.weights,
+        "discrete": discrete,
+    }
+
+
+# --- Joint simulation across suppliers ---
+
+
+def correlation_matrix(correlation, k: int) -> ndarray:
+    """(k, k) matrix from one pairwise correlation or a full matrix"""
+    if np.ndim(correlation) == 0:
+        return np.full((k, k), float(correlation)) + (1 - correlation) * np.eye(k)
+    correlation = np.asarray(correlation, dtype=float)
+    if correlation.shape != (k, k):
+        raise ValueError(f"Expected a {k}x{k} correlation matrix")
+    return correlation
+
+
+def correlated_normals(correlation, k: int, n: int, rng: Generator) -> ndarray:
+    """(k, n) standard normals with the given correlation across the k rows"""
+    try:
+        factor = np.linalg.cholesky(correlation_matrix(correlation, k))
+    except np.linalg.LinAlgError:
+        raise ValueError("Driver correlation matrix is not positive definite")
+    return factor @ rng.standard_normal((k, n))
+
+
+@profiled()
+def simulate_suppliers(
+    countries: dict,
+    order_size: int,
+    n: int,
+    rng: Generator | None = None,
+    correlation: dict = DRIVER_CORRELATION,
+    precision: str = PRECISION,
+    importance: ImportanceSampling | None = None,
+    sampling: str = SAMPLING,
+) -> dict:
+    """
+    Simulates n trials of every supplier in one pass, with the drivers in
+    `correlation` tied across suppliers by a Gaussian copula: correlated
+    normals are mapped to uniforms and through each supplier's own inverse
+    CDF, so every marginal is unchanged. "currency" correlates the currency
+    shocks. Everything else, including the discrete risks, stays independent.
+    Returns the suppliers and trials x suppliers total_cost and lost_units,
+    stored at `precision`. With `importance`, every supplier's rare discrete
+    branches are oversampled, and `weights` holds each trial's likelihood
+    ratio: the product of the suppliers' ratios, as their discrete risks are
+    independent (None otherwise). `sampling` lays out each supplier's
+    uncorrelated draws as in simulate_country; the correlated drivers
+    always come from the copula.
+    """
+    if importance is not None and sampling != "plain":
+        raise ValueError("Importance sampling is only supported with plain sampling")
+    rng = get_rng(rng)
+    suppliers = tuple(countries)
+    k = len(suppliers)
+    shared = {
+        driver: correlated_normals(rho, k, n, rng)
+        for driver, rho in correlation.items()
+    }
+
+    cost_dtype, unit_dtype = precision_dtypes(precision)
+    total_cost = np.empty((n, k), dtype=cost_dtype)
+    lost_units = np.empty((n, k), dtype=unit_dtype)
+    weights = np.ones(n) if importance is not None else None
+    for j, supplier in enumerate(suppliers):
+        params = compile_params(countries[supplier])
+        discrete_params = params.discrete_params(order_size)
+        if sampling != "plain":
+            # this supplier's uniforms, in simulate_country's dimension order
+            u = sample_uniforms(
+                n, CONTINUOUS_DIMS + DISCRETE_UNIFORM_DIMS, rng, sampling
+            )
+        per_lamp = np.zeros(n)
+        for i, (driver, spec) in enumerate(
+            zip(
+                COST_DRIVERS + ("yield_params",),
+                params.drivers + (params.yield_spec,),
+            )
+        ):
+            if driver in shared:
+                draws = spec.ppf(ndtr(shared[driver][j]))
+            elif sampling == "plain":
+                draws = spec.sample(n, rng)
+            else:
+                draws = spec.ppf(u[i])
+            if driver == "yield_params":
+                yield_ = draws
+            else:
+                per_lamp += draws
+        if "currency" in shared:
+            currency_shock = params.currency_std * shared["currency"][j]
+        elif sampling == "plain":
+            currency_shock = rng.normal(0, params.currency_std, n)
+        else:
+            currency_shock = params.currency_std * ndtri(u[CONTINUOUS_DIMS - 1])
+
+        if sampling == "plain":
+            discrete = simulate_discrete_risks(
+                discrete_params, n, rng, importance, precision
+            )
+        else:
+            discrete = simulate_discrete_risks_from_uniforms(
+                discrete_params, u[CONTINUOUS_DIMS:], rng, precision
+            )
+        if weights is not None:
+            weights *= discrete.weights
+        # one pass straight into this supplier's column
+        fused_costs(
+            per_lamp,
+            yield_,
+            currency_shock,
+            discrete.tariff_escalation,
+            discrete.cost,
+            discrete.lost_units,
+            params.fixed_tariff,
+            order_size,
+            total_cost[:, j],
+            lost_units[:, j],
+        )
+
+    return {
+        "suppliers": suppliers,
+        "total_cost": total_cost,
+        "lost_units": lost_units,
+        "weights": weights,
+    }
+
+
+# --- Adaptive trial count ---
+# Minimum growth in trials between two quantile convergence checks
+QUANTILE_CHECK_GROWTH = 1.25
+
+
+def quantile_rel_halfwidth(sorted_costs: ndarray, q: float, z: float = 1.96) -> float:
+    """
+    Distribution-free confidence half-width of the q-quantile (from the
+    binomial order-statistic interval), relative to the quantile itself.
+    """
+    n = len(sorted_costs)
+    spread = z * np.sqrt(n * q * (1 - q))
+    lower = sorted_costs[max(int(np.floor(n * q - spread)), 0)]
+    upper = sorted_costs[min(int(np.ceil(n * q + spread)), n - 1)]
+    estimate = sorted_costs[min(int(n * q), n - 1)]
+    return (upper - lower) / 2 / abs(estimate) if estimate else np.inf
+
+
+@profiled()
+def run_monte_carlo_adaptive(
+    country: str,
+    params: "dict | CountryParams",
+    order_size: int,
+    target_rel_se: float | None = ADAPTIVE_TARGET_REL_SE,
+    quantile: float | None = None,
+    quantile_rel_precision: float = 0.01,
+    batch_size: int = ADAPTIVE_BATCH_SIZE,
+    min_trials: int = ADAPTIVE_MIN_TRIALS,
+    max_trials: int = ADAPTIVE_MAX_TRIALS,
+    seed=None,
+    sampling: str = SAMPLING,
+) -> dict:
+    """
+    Simulates in batches until the standard error of the mean cost is within
+    target_rel_se of the mean and, if `quantile` is given (e.g. 0.95), the
+    quantile's confidence half-width is within quantile_rel_precision of it.
+    Stops at max_trials regardless. `trials` reports how many were used.
+    Without a seed, draws come from this thread's default stream.
+    """
+    rng = get_rng() if seed is None else make_rng(seed)
+    params = compile_params(params)
+    discrete_params = params.discrete_params(order_size)
+    total_cost, lost_units = [], []
+    # running mean / variance, so each batch's check is O(batch)
+    moments = Welford()
+    trials = 0
+    quantile_checked = 0
+    converged = False
+
+    while trials < max_trials:
+        n = min(batch_size, max_trials - trials)
+        batch = simulate_country(params, order_size, n, rng, discrete_params, sampling)
+        total_cost.append(batch["total_cost"])
+        lost_units.append(batch["lost_units"])
+        moments.add(batch["total_cost"].astype(float, copy=False))
+        trials += n
+        if trials < min_trials:
+            continue
+
+        converged = target_rel_se is None or moments.stderr <= target_rel_se * abs(
+            moments.mean
+        )
+        if converged and quantile is not None:
+            # the quantile check sorts every trial so far, so it only runs
+            # once the trials have grown by QUANTILE_CHECK_GROWTH since the
+            # last one (amortized O(n log n) over the whole run)
+            if (
+                trials < quantile_checked * QUANTILE_CHECK_GROWTH
+                and trials < max_trials
+            ):
+                converged = False
+                continue
+            quantile_checked = trials
+            costs = np.concatenate(total_cost)
+            total_cost = [costs]
+            precision = quantile_rel_halfwidth(np.sort(costs), quantile)
+            converged = precision <= quantile_rel_precision
+        if converged:
+            break
+
+    return {
+        "country": country,
+        "total_cost": np.concatenate(total_cost),
+        "lost_units": np.concatenate(lost_units),
+        "trials": trials,
+        "stderr": moments.stderr,
+        "converged": converged,
+    }
@@ -0,0 +1,246 @@
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, reduce
+
+import numpy as np
+from numpy.random import SeedSequence
+
+from cache import memoize
+from config import (
+    ADAPTIVE_TRIALS,
+    DRIVER_CORRELATION,
+    EXECUTOR,
+    IMPORTANCE_SAMPLING,
+    MAX_WORKERS,
+    MONTE_CARLO_SIMULATIONS,
+    PRECISION,
+    SAMPLING,
+    STREAMING_CHUNK_SIZE,
+)
+from discrete import ImportanceSampling
+from engine import run_monte_carlo_adaptive, simulate_suppliers
+from kernels import simulate_costs
+import profiling
+from profiling import profiled
+from simulation import run_monte_carlo
+from store import persist
+from streaming import StreamingSummary, moment_edges
+from streams import common_random_numbers, make_rng, spawn_seeds
+
+EXECUTOR_KINDS = ("process", "thread", "serial")
+
+
+class SerialExecutor(Executor):
+    """Runs every task inline; used for debugging and single-core hosts"""
+
+    def map(self, fn, *iterables, timeout=None, chunksize=1):
+        return map(fn, *iterables)
+
+
+@lru_cache(maxsize=None)
+def get_executor(kind: str = EXECUTOR, max_workers: int | None = MAX_WORKERS):
+    """
+    Worker pools are created once per (kind, max_workers) and reused. Process
+    workers are spawned, not forked: a fork copies whatever threads and locks
+    the parent holds (e.g. the app server's), which can deadlock the child.
+    """
+    if kind == "process":
+        return ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if kind == "serial":
+        return SerialExecutor()
+    raise ValueError(f"Unknown executor '{kind}', expected one of {EXECUTOR_KINDS}")
+
+
+def _run_seeded(fn, seed: SeedSequence, args: tuple, tracking: bool | None = None):
+    with common_random_numbers(seed):
+        if tracking is None:
+            return fn(*args)
+        return profiling.run_collected(tracking, fn, *args)
+
+
+def _merge_spans(results):
+    # spans recorded on workers join the submitting context's recording
+    for result, events in results:
+        profiling.merge_events(events)
+        yield result
+
+
+def imap_seeded(
+    fn,
+    tasks: list[tuple],
+    seed: int | SeedSequence | None = None,
+    kind: str = EXECUTOR,
+    max_workers: int | None = MAX_WORKERS,
+    common: bool = False,
+):
+    """
+    Calls fn(*task) for every task on the chosen executor and yields the
+    results in task order as they become available. Each task runs on its
+    own child of `seed`, or on `seed` itself when `common` is set (common
+    random numbers), so the output does not depend on the executor or the
+    number of workers. Default streams are per thread, but numpy's legacy
+    global state is not: fns that draw from numpy.random directly only
+    replay on the serial and process executors. While the caller's context
+    is profiling, spans recorded on the workers are merged into it.
+    """
+    if common:
+        seeds = [SeedSequence(seed) if not isinstance(seed, SeedSequence) else seed]
+        seeds = seeds * len(tasks)
+    else:
+        seeds = spawn_seeds(seed, len(tasks))
+    executor = get_executor(kind, max_workers)
+    # serial tasks run in this context and record into it directly
+    tracking = profiling.worker_tracking() if kind != "serial" else None
+    results = executor.map(
+        _run_seeded, [fn] * len(tasks), seeds, tasks, [tracking] * len(tasks)
+    )
+    return results if tracking is None else _merge_spans(results)
+
+
+def map_seeded(
+    fn,
+    tasks: list[tuple],
+    seed: int | SeedSequence | None = None,
+    kind: str = EXECUTOR,
+    max_workers: int | None = MAX_WORKERS,
+    common: bool = False,
+) -> list:
+    """imap_seeded, collected into a list"""
+    return list(imap_seeded(fn, tasks, seed, kind, max_workers, common))
+
+
+@profiled()
+def run_countries(
+    countries: dict,
+    order_size: int,
+    seed: int | SeedSequence | None = None,
+    kind: str = EXECUTOR,
+) -> dict:
+    """
+    run_monte_carlo for every country, fanned out across workers. With
+    ADAPTIVE_TRIALS, run_monte_carlo_adaptive instead, and each result's
+    `trials` is how many that country used.
+    """
+    if kind == "thread":
+        # run_monte_carlo may draw from numpy's shared legacy state
+        raise ValueError("run_countries is not reproducible on the thread executor")
+    tasks = [(country, params, order_size) for country, params in countries.items()]
+    fn = run_monte_carlo_adaptive if ADAPTIVE_TRIALS else run_monte_carlo
+    results = map_seeded(fn, tasks, seed, kind)
+    return dict(zip(countries.keys(), results))
+
+
+@memoize(
+    key=lambda countries, order_size, seed=None, kind=EXECUTOR: (
+        countries,
+        order_size,
+        MONTE_CARLO_SIMULATIONS,
+        seed,
+        ADAPTIVE_TRIALS,
+    )
+)
+@persist(
+    key=lambda countries, order_size, seed=None, kind=EXECUTOR: (
+        None
+        if seed is None
+        else (countries, order_size, MONTE_CARLO_SIMULATIONS, seed, ADAPTIVE_TRIALS)
+    )
+)
+def cached_run_countries(
+    countries: dict,
+    order_size: int,
+    seed: int | SeedSequence | None = None,
+    kind: str = EXECUTOR,
+) -> dict:
+    """
+    run_countries, memoized on the parameters, order size, trial count and
+    seed, and kept in the on-disk result store when seeded
+    """
+    return run_countries(countries, order_size, seed, kind)
+
+
+@memoize(
+    key=lambda countries, order_size, seed=None: (
+        countries,
+        order_size,
+        MONTE_CARLO_SIMULATIONS,
+        seed,
+        DRIVER_CORRELATION,
+        IMPORTANCE_SAMPLING,
+        SAMPLING,
+    )
+)
+@persist(
+    key=lambda countries, order_size, seed=None: (
+        None
+        if seed is None
+        else (
+            countries,
+            order_size,
+            MONTE_CARLO_SIMULATIONS,
+            seed,
+            DRIVER_CORRELATION,
+            PRECISION,
+            IMPORTANCE_SAMPLING,
+            SAMPLING,
+        )
+    )
+)
+def cached_simulate_suppliers(
+    countries: dict, order_size: int, seed: int | SeedSequence | None = None
+) -> dict:
+    """
+    simulate_suppliers in one correlated pass, memoized like run_countries.
+    One pass over every supplier needs no worker pool. Draws are laid out
+    by SAMPLING, and importance-sampled when IMPORTANCE_SAMPLING is on.
+    """
+    return simulate_suppliers(
+        countries,
+        order_size,
+        MONTE_CARLO_SIMULATIONS,
+        make_rng(seed),
+        importance=ImportanceSampling() if IMPORTANCE_SAMPLING else None,
+        sampling=SAMPLING,
+    )
+
+
+def _summarize_chunk(
+    params: dict, order_size: int, n: int, seed: SeedSequence, edges: np.ndarray
+) -> StreamingSummary:
+    trials = simulate_costs(params, order_size, n, make_rng(seed))
+    summary = StreamingSummary.empty(edges)
+    summary.add(trials["total_cost"], trials["lost_units"], trials["weights"])
+    return summary
+
+
+@profiled()
+def run_monte_carlo_streaming(
+    country: str,
+    params: dict,
+    order_size: int,
+    n: int,
+    chunk_size: int = STREAMING_CHUNK_SIZE,
+    seed: int | SeedSequence | None = None,
+    edges: np.ndarray | None = None,
+    kind: str = EXECUTOR,
+) -> StreamingSummary:
+    """
+    Streaming counterpart of run_monte_carlo for very large n. Chunks of
+    chunk_size trials run on the executor with their own child seeds, and
+    each is reduced to a StreamingSummary before it is returned. Only the
+    summaries are merged, so memory does not depend on n. `edges` fixes the
+    cost histogram's bins (by default from the analytic moments).
+    """
+    if edges is None:
+        edges = moment_edges(params, order_size)
+    sizes = [min(chunk_size, n - start) for start in range(0, n, chunk_size)]
+    seeds = spawn_seeds(seed, len(sizes))
+    k = len(sizes)
+    summaries = get_executor(kind).map(
+        _summarize_chunk, [params] * k, [order_size] * k, sizes, seeds, [edges] * k
+    )
+    return reduce(StreamingSummary.merge, summaries, StreamingSummary.empty(edges))
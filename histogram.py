@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+
+import numpy as np
+from numpy import ndarray
+
+from config import HISTOGRAM_BINS
+from profiling import profiled
+
+# Pre-binned cost distributions. Histograms on the same edges merge by adding
+# counts, so chunks and workers can be binned separately, and the chart and
+# summary quantiles need only a few hundred numbers whatever the trial count.
+
+SUMMARY_QUANTILES = (0.05, 0.25, 0.50, 0.75, 0.95)
+
+
+@dataclass
+class Histogram:
+    edges: ndarray  # (bins + 1,)
+    counts: ndarray  # (bins,) summed trial weight per bin
+    underflow: float = 0.0
+    overflow: float = 0.0
+    total: float = 0.0  # sum of weights, including under/overflow
+    weighted_sum: float = 0.0  # sum of weight * value, for the exact mean
+    min: float = np.inf
+    max: float = -np.inf
+
+    @classmethod
+    def empty(cls, edges: ndarray) -> "Histogram":
+        return cls(np.asarray(edges, dtype=float), np.zeros(len(edges) - 1))
+
+    @classmethod
+    def from_samples(
+        cls, x: ndarray, edges: ndarray, weights: ndarray | None = None
+    ) -> "Histogram":
+        histogram = cls.empty(edges)
+        histogram.add(x, weights)
+        return histogram
+
+    def add(self, x: ndarray, weights: ndarray | None = None):
+        """Bins a batch of trials in place"""
+        if len(x) == 0:
+            return
+        if weights is None:
+            weights = np.ones(len(x))
+        counts, _ = np.histogram(x, self.edges, weights=weights)
+        self.counts += counts
+        self.underflow += float(weights[x < self.edges[0]].sum())
+        self.overflow += float(weights[x > self.edges[-1]].sum())
+        self.total += float(weights.sum())
+        self.weighted_sum += float(np.dot(x, weights))
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Only histograms with the same bin edges can be merged")
+        return Histogram(
+            self.edges,
+            self.counts + other.counts,
+            self.underflow + other.underflow,
+            self.overflow + other.overflow,
+            self.total + other.total,
+            self.weighted_sum + other.weighted_sum,
+            min(self.min, other.min),
+            max(self.max, other.max),
+        )
+
+    __add__ = merge
+
+    @property
+    def centers(self) -> ndarray:
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    @property
+    def widths(self) -> ndarray:
+        return np.diff(self.edges)
+
+    @property
+    def mean(self) -> float:
+        return self.weighted_sum / self.total if self.total else np.nan
+
+    def quantile(self, q: float) -> float:
+        """
+        Interpolated within the bin holding the q-th share of the weight; the
+        under/overflow mass is spread between the observed min/max and the edges.
+        """
+        if not self.total:
+            return np.nan
+        edges = np.concatenate([[min(self.min, self.edges[0])], self.edges])
+        edges = np.append(edges, max(self.max, self.edges[-1]))
+        masses = np.concatenate([[self.underflow], self.counts, [self.overflow]])
+        cumulative = np.concatenate([[0.0], np.cumsum(masses)]) / self.total
+        return float(np.interp(q, cumulative, edges))
+
+    def summary(self, quantiles=SUMMARY_QUANTILES) -> dict:
+        return {
+            "mean": self.mean,
+            **{f"p{round(q * 100)}": self.quantile(q) for q in quantiles},
+        }
+
+
+def shared_edges(samples: dict[str, ndarray], bins: int = HISTOGRAM_BINS) -> ndarray:
+    """Equal-width edges spanning every array, so histograms overlay bin for bin"""
+    low = min(float(np.min(x)) for x in samples.values())
+    high = max(float(np.max(x)) for x in samples.values())
+    return np.linspace(low, high if high > low else low + 1, bins + 1)
+
+
+@profiled()
+def bin_countries(
+    costs: dict[str, ndarray],
+    weights: dict[str, ndarray | None] | None = None,
+    bins: int = HISTOGRAM_BINS,
+) -> dict[str, Histogram]:
+    """One histogram per country, all on shared edges"""
+    edges = shared_edges(costs, bins)
+    weights = weights or {}
+    return {
+        country: Histogram.from_samples(x, edges, weights.get(country))
+        for country, x in costs.items()
+    }
@@ -0,0 +1,175 @@
+import numpy as np
+from numpy import ndarray
+from numpy.random import Generator
+
+from config import COST_KERNEL, KERNEL_CHUNK_SIZE, PRECISION
+from discrete import precision_dtypes, simulate_discrete_risks
+from params import CountryParams, compile_params
+from profiling import profiled
+from streams import get_rng
+
+# Fused per-trial cost model. Once the random draws exist, each trial's total
+# cost is ((base / yield) * (1 + currency shock) * (1 + tariff + escalation))
+# * order_size + the summed discrete-risk costs, and its lost units are the
+# summed component losses. As separate NumPy expressions this takes a handful
+# of full-length temporaries; here it is one pass into preallocated outputs,
+# compiled with numba when it is installed and done in place otherwise. The
+# operations run in the same order as the plain expressions, so both paths
+# give bit-identical results. The arithmetic is float64 whatever the storage
+# precision; only the final values are rounded into the outputs' dtype.
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _fused_costs_numpy(
+    base: ndarray,
+    yield_: ndarray,
+    currency_shock: ndarray,
+    escalation: ndarray,
+    discrete_cost: ndarray,
+    discrete_lost: ndarray,
+    fixed_tariff: float,
+    order_size: int,
+    total_cost: ndarray,
+    lost_units: ndarray,
+):
+    np.divide(base, yield_, out=base)
+    currency_shock += 1
+    base *= currency_shock
+    base *= np.add(escalation, 1 + fixed_tariff, out=yield_, dtype=np.float64)
+    base *= order_size
+    base += np.sum(discrete_cost, axis=0, dtype=np.float64, out=currency_shock)
+    total_cost[...] = base
+    np.sum(discrete_lost, axis=0, dtype=np.int64, out=lost_units)
+
+
+def _fused_costs_loop(
+    base,
+    yield_,
+    currency_shock,
+    escalation,
+    discrete_cost,
+    discrete_lost,
+    fixed_tariff,
+    order_size,
+    total_cost,
+    lost_units,
+):
+    tariff = 1.0 + fixed_tariff
+    components = discrete_cost.shape[0]
+    for i in range(base.shape[0]):
+        # np.float64, not float(): numba keeps float(float32) in single precision
+        discrete = np.float64(discrete_cost[0, i])
+        units = int(discrete_lost[0, i])
+        for c in range(1, components):
+            discrete += np.float64(discrete_cost[c, i])
+            units += discrete_lost[c, i]
+        per_lamp = base[i] / yield_[i] * (1.0 + currency_shock[i])
+        total_cost[i] = (
+            per_lamp * (tariff + np.float64(escalation[i])) * order_size + discrete
+        )
+        lost_units[i] = units
+
+
+_fused_costs_compiled = (
+    njit(cache=True, nogil=True)(_fused_costs_loop) if njit is not None else None
+)
+
+
+def kernel_backend(kernel: str = COST_KERNEL) -> str:
+    """The backend fused_costs actually uses: "numba" or "numpy" """
+    if kernel not in ("numba", "numpy"):
+        raise ValueError(f"Unknown cost kernel '{kernel}', expected numba or numpy")
+    return "numba" if kernel == "numba" and njit is not None else "numpy"
+
+
+def fused_costs(
+    base: ndarray,
+    yield_: ndarray,
+    currency_shock: ndarray,
+    escalation: ndarray,
+    discrete_cost: ndarray,
+    discrete_lost: ndarray,
+    fixed_tariff: float,
+    order_size: int,
+    total_cost: ndarray,
+    lost_units: ndarray,
+    kernel: str = COST_KERNEL,
+):
+    """
+    Writes n trials' total cost and lost units into `total_cost` and
+    `lost_units` (1-D, possibly strided views). `base` is the per-lamp sum of
+    the cost drivers, `discrete_cost` / `discrete_lost` the (components, n)
+    rows of a DiscreteRiskBatch. The NumPy path uses the float64 `base`,
+    `yield_` and `currency_shock` as scratch space, so callers must not reuse
+    them.
+    """
+    fused = (
+        _fused_costs_compiled
+        if kernel_backend(kernel) == "numba"
+        else _fused_costs_numpy
+    )
+    fused(
+        base,
+        yield_,
+        currency_shock,
+        escalation,
+        discrete_cost,
+        discrete_lost,
+        float(fixed_tariff),
+        order_size,
+        total_cost,
+        lost_units,
+    )
+
+
+@profiled()
+def simulate_costs(
+    params: "dict | CountryParams",
+    order_size: int,
+    n: int,
+    rng: Generator | None = None,
+    chunk_size: int = KERNEL_CHUNK_SIZE,
+    kernel: str = COST_KERNEL,
+    precision: str = PRECISION,
+) -> dict:
+    """
+    Totals-only simulate_country (plain sampling): trials are drawn
+    chunk_size at a time and fused straight into the n-long outputs, so
+    beyond the results memory stays bounded by the chunk. Draws are
+    consumed in the same order as simulate_country within each chunk, so
+    a single chunk reproduces it exactly.
+    """
+    rng = get_rng(rng)
+    params = compile_params(params)
+    discrete_params = params.discrete_params(order_size)
+    cost_dtype, unit_dtype = precision_dtypes(precision)
+    total_cost = np.empty(n, dtype=cost_dtype)
+    lost_units = np.empty(n, dtype=unit_dtype)
+    for start in range(0, n, chunk_size):
+        size = min(chunk_size, n - start)
+        base = params.drivers[0].sample(size, rng)
+        for spec in params.drivers[1:]:
+            base += spec.sample(size, rng)
+        yield_ = params.yield_spec.sample(size, rng)
+        currency_shock = rng.normal(0, params.currency_std, size)
+        discrete = simulate_discrete_risks(
+            discrete_params, size, rng, precision=precision
+        )
+        fused_costs(
+            base,
+            yield_,
+            currency_shock,
+            discrete.tariff_escalation,
+            discrete.cost,
+            discrete.lost_units,
+            params.fixed_tariff,
+            order_size,
+            total_cost[start : start + size],
+            lost_units[start : start + size],
+            kernel,
+        )
+    return {"total_cost": total_cost, "lost_units": lost_units, "weights": None}
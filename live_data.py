@@ -1,20 +1,88 @@
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+import pandas as pd
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from profiling import profiled
 
 load_dotenv()
 
 api_key = os.getenv("FRED_API_KEY")
-url = "https://api.stlouisfed.org/fred/series/observations"
+# Point FRED_API_URL at a local stand-in server to run without the network
+url = os.getenv("FRED_API_URL", "https://api.stlouisfed.org/fred/series/observations")
+
+# On-disk FRED cache, reused until it is older than max-age
+CACHE_DIR = Path(os.getenv("FRED_CACHE_DIR", Path.home() / ".cache" / "teslacase"))
+CACHE_MAX_AGE_SECONDS = float(os.getenv("FRED_CACHE_MAX_AGE", 12 * 60 * 60))
 
 # Fallback value for Fed Funds Rate (as of January 2025)
 DEFAULT_FED_FUNDS_RATE = 4.5
 
+# Series behind the Bayesian priors and how many months of history each keeps
+PRIOR_SERIES = {
+    "PCU325211325211P": 24,  # plastics PPI, raw material prior
+    "DEXMXUS": 12,  # MXN per USD, Mexico FX prior
+    "DEXCHUS": 12,  # CNY per USD, China FX prior
+    "FEDFUNDS": 12,
+}
+
+_fed_funds_rate = None
+_fed_funds_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """One pooled session per process, shared by every FRED request"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _cache_path(series_id: str) -> Path:
+    return CACHE_DIR / f"fred_{series_id}.json"
+
 
+def read_cached_observation(series_id: str, max_age: float | None = None):
+    """
+    Returns the cached latest observation for a series, or None when there is
+    no cache or it is older than max_age seconds (None accepts any age).
+    """
+    try:
+        cached = json.loads(_cache_path(series_id).read_text())
+    except (OSError, ValueError):
+        return None
+    if max_age is not None and time.time() - cached["fetched_at"] > max_age:
+        return None
+    return cached["observation"]
+
+
+def write_cached_observation(series_id: str, observation: dict):
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _cache_path(series_id).write_text(
+            json.dumps({"fetched_at": time.time(), "observation": observation})
+        )
+    except OSError as e:
+        print(f"Warning: Failed to write FRED cache: {str(e)}")
+
+
+@profiled()
 def get_fed_funds_rate():
     """
-    Fetches the Federal Funds Rate from FRED API.
+    Fetches the latest Federal Funds Rate observation from FRED API.
     Returns None if the request fails.
     """
     try:
@@ -25,29 +93,187 @@ def get_fed_funds_rate():
             "series_id": "FEDFUNDS",
             "api_key": api_key,
             "file_type": "json",
+            # only the newest observation, not the full history since 1954
+            "sort_order": "desc",
+            "limit": 1,
         }
-        # Use a session context manager to ensure proper connection cleanup
-        with requests.Session() as session:
-            response = session.get(url, params=params, timeout=10)
-            response.raise_for_status()  # Raise an exception for bad status codes
-            return response.json()
+        response = get_session().get(url, params=params, timeout=10)
+        response.raise_for_status()  # Raise an exception for bad status codes
+        return response.json()
     except Exception as e:
         print(f"Warning: Failed to fetch FRED data: {str(e)}")
         return None
 
 
+@profiled()
 def get_most_recent_fed_funds_rate():
     """
-    Gets the most recent Federal Funds Rate from FRED API.
-    Falls back to a default value if the API is unavailable.
+    Gets the most recent Federal Funds Rate, from the on-disk cache when it
+    is fresh and from the FRED API otherwise. Falls back to a stale cached
+    value, then to a default value if the API is unavailable.
     """
+    cached = read_cached_observation("FEDFUNDS", CACHE_MAX_AGE_SECONDS)
+    if cached is not None:
+        return float(cached["value"])
+
     try:
         data = get_fed_funds_rate()
         if data and "observations" in data and len(data["observations"]) > 0:
-            return float(data["observations"][-1]["value"])
+            observation = data["observations"][0]
+            rate = float(observation["value"])
+            write_cached_observation("FEDFUNDS", observation)
+            return rate
     except Exception as e:
         print(f"Warning: Failed to parse FRED data: {str(e)}")
 
+    stale = read_cached_observation("FEDFUNDS")
+    if stale is not None:
+        print(f"Using cached Fed Funds Rate from {stale['date']}")
+        return float(stale["value"])
+
     # Fallback to default value
     print(f"Using default Fed Funds Rate: {DEFAULT_FED_FUNDS_RATE}%")
     return DEFAULT_FED_FUNDS_RATE
+
+
+def resolve_fed_funds_rate():
+    """Resolves the rate once per process; later calls return the same value"""
+    global _fed_funds_rate
+    with _fed_funds_lock:
+        if _fed_funds_rate is None:
+            _fed_funds_rate = get_most_recent_fed_funds_rate()
+        return _fed_funds_rate
+
+
+def peek_fed_funds_rate() -> float:
+    """
+    The resolved rate without waiting on it: while resolution is still in
+    flight, the cached observation of any age, or the default
+    """
+    if _fed_funds_rate is not None:
+        return _fed_funds_rate
+    cached = read_cached_observation("FEDFUNDS")
+    return float(cached["value"]) if cached is not None else DEFAULT_FED_FUNDS_RATE
+
+
+def prefetch_fed_funds_rate():
+    """Resolves the rate on a background thread so the caller never waits on I/O"""
+    threading.Thread(target=resolve_fed_funds_rate, daemon=True).start()
+
+
+# --- Multi-series client ---
+
+
+@profiled()
+def fetch_series(series_id: str, observation_start: str | None = None) -> pd.DataFrame:
+    """
+    Fetches one series' observations from observation_start (YYYY-MM-DD)
+    onwards as a (date, value) frame. Missing values ("." in FRED) are dropped.
+    """
+    params = {"series_id": series_id, "api_key": api_key, "file_type": "json"}
+    if observation_start is not None:
+        params["observation_start"] = observation_start
+    response = get_session().get(url, params=params, timeout=10)
+    response.raise_for_status()
+    observations = pd.DataFrame(
+        response.json().get("observations", []), columns=["date", "value"]
+    )
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(observations["date"]),
+            "value": pd.to_numeric(observations["value"], errors="coerce"),
+        }
+    ).dropna()
+
+
+def _series_cache_path(series_id: str) -> Path:
+    return CACHE_DIR / f"fred_{series_id}.parquet"
+
+
+def read_cached_series(series_id: str) -> pd.DataFrame | None:
+    try:
+        return pd.read_parquet(_series_cache_path(series_id))
+    except (OSError, ImportError, ValueError):
+        return None
+
+
+def write_cached_series(series_id: str, observations: pd.DataFrame):
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        observations.to_parquet(_series_cache_path(series_id), index=False)
+    except (OSError, ImportError) as e:
+        print(f"Warning: Failed to write FRED cache for {series_id}: {str(e)}")
+
+
+def cached_window(series_id: str, months: int) -> pd.DataFrame:
+    """The cached last `months` of a series, empty when nothing is cached"""
+    window_start = pd.Timestamp.today().normalize() - pd.DateOffset(months=months)
+    cached = read_cached_series(series_id)
+    if cached is None:
+        return pd.DataFrame(columns=["date", "value"])
+    return cached[cached["date"] >= window_start].reset_index(drop=True)
+
+
+@profiled()
+def refresh_series(series_id: str, months: int) -> pd.DataFrame:
+    """
+    Returns the last `months` of a series. Only observations newer than the
+    cached tail are requested, and nothing is requested while the cache file
+    is younger than CACHE_MAX_AGE_SECONDS. A cache that does not reach back
+    to the window start (e.g. `months` grew) is backfilled. Full fetches
+    start a month before the window, and the cache keeps the last
+    observation before it, as the mark that the window is covered (the
+    series here are monthly or finer).
+    """
+    window_start = pd.Timestamp.today().normalize() - pd.DateOffset(months=months)
+    cached = read_cached_series(series_id)
+    path = _series_cache_path(series_id)
+
+    if cached is not None and len(cached) == 0:
+        cached = None
+    if cached is not None and cached["date"].min() <= window_start:
+        if time.time() - path.stat().st_mtime < CACHE_MAX_AGE_SECONDS:
+            return cached[cached["date"] >= window_start].reset_index(drop=True)
+        start = cached["date"].max() + pd.Timedelta(days=1)
+    else:
+        start = window_start - pd.DateOffset(months=1)
+
+    try:
+        fresh = fetch_series(series_id, start.strftime("%Y-%m-%d"))
+    except Exception as e:
+        print(f"Warning: Failed to fetch FRED series {series_id}: {str(e)}")
+        if cached is None:
+            return pd.DataFrame(columns=["date", "value"])
+        return cached[cached["date"] >= window_start].reset_index(drop=True)
+
+    observations = pd.concat([cached, fresh]) if cached is not None else fresh
+    observations = (
+        observations.drop_duplicates("date", keep="last")
+        .sort_values("date")
+        .reset_index(drop=True)
+    )
+    # the window, plus the last observation before it
+    before = observations["date"] < window_start
+    first = max(int(before.sum()) - 1, 0)
+    write_cached_series(series_id, observations.iloc[first:])
+    return observations[~before].reset_index(drop=True)
+
+
+def get_series(
+    series: dict[str, int] = PRIOR_SERIES, max_workers: int = 4
+) -> dict[str, pd.DataFrame]:
+    """
+    Refreshes several series concurrently over the shared pooled session.
+    `series` maps each series id to the months of history to keep. Without
+    an API key nothing is fetched, and each series is its cached window
+    (an empty date / value frame if uncached).
+    """
+    if not api_key:
+        return {
+            series_id: cached_window(series_id, months)
+            for series_id, months in series.items()
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = pool.map(refresh_series, series.keys(), series.values())
+        return dict(zip(series.keys(), frames))
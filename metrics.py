@@ -0,0 +1,65 @@
+import numpy as np
+from numpy import ndarray
+from numpy.random import Generator
+
+from streams import get_rng
+
+# Risk metrics over per-trial results. Every function takes optional per-trial
+# weights (importance-sampling likelihood ratios); weights are self-normalized,
+# and None means every trial counts equally.
+
+
+def weighted_mean(x: ndarray, weights: ndarray | None = None) -> float:
+    if weights is None:
+        return float(np.mean(x, dtype=float))
+    return float(np.dot(x, weights) / np.sum(weights))
+
+
+def weighted_quantile(x: ndarray, q: float, weights: ndarray | None = None) -> float:
+    if weights is None:
+        return float(np.quantile(x, q))
+    order = np.argsort(x)
+    cumulative = np.cumsum(weights[order])
+    index = np.searchsorted(cumulative, q * cumulative[-1])
+    return float(x[order[min(index, len(x) - 1)]])
+
+
+def cvar(x: ndarray, alpha: float = 0.95, weights: ndarray | None = None) -> float:
+    """Expected shortfall: mean cost in the worst (1 - alpha) share of trials"""
+    if weights is None:
+        weights = np.ones(len(x))
+    order = np.argsort(x)[::-1]
+    tail_mass = (1 - alpha) * np.sum(weights)
+    cumulative = np.cumsum(weights[order])
+    # whole trials inside the tail, plus the fraction of the one straddling it
+    taken = np.minimum(
+        weights[order], np.maximum(tail_mass - cumulative + weights[order], 0)
+    )
+    return float(np.dot(x[order], taken) / tail_mass)
+
+
+def exceedance_probability(
+    x: ndarray, threshold: float, weights: ndarray | None = None
+) -> float:
+    """P(cost > threshold)"""
+    if weights is None:
+        return float(np.mean(x > threshold))
+    return float(np.dot(x > threshold, weights) / np.sum(weights))
+
+
+def resample_by_weight(
+    x: ndarray,
+    weights: ndarray | None,
+    n: int | None = None,
+    rng: Generator | None = None,
+) -> ndarray:
+    """
+    Systematic resampling of weighted trials into n equally weighted ones, for
+    consumers (optimizer, plain histograms) that do not take weights.
+    """
+    if weights is None:
+        return x
+    n = len(x) if n is None else n
+    cumulative = np.cumsum(weights) / np.sum(weights)
+    positions = (get_rng(rng).random() + np.arange(n)) / n
+    return x[np.minimum(np.searchsorted(cumulative, positions), len(x) - 1)]
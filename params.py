@@ -0,0 +1,208 @@
+import math
+from dataclasses import replace
+
+import numpy as np
+from numpy import ndarray
+from numpy.random import Generator
+from scipy import stats
+from scipy.special import ndtri
+
+from discrete import create_params_from_dict
+from structs import DiscreteRisksParams
+
+# Compiled country parameters. A COUNTRIES entry is validated once and stored
+# in flat __slots__ objects, with every distribution already in the form its
+# sampler takes, so the simulation loops do no string lookups. Overrides copy
+# only the dicts along their path and recompile; the original is untouched.
+
+# Continuous per-lamp cost drivers; each is a {"dist": ...} spec in COUNTRIES
+COST_DRIVERS = (
+    "raw",
+    "labor",
+    "indirect",
+    "logistics",
+    "electricity",
+    "depreciation",
+    "working_capital",
+)
+
+# The keys each distribution spec must set
+DISTRIBUTION_FIELDS = {
+    "normal": ("mean", "std"),
+    "lognormal": ("mean", "std"),
+    "gamma": ("shape", "scale"),
+    "triangular": ("min", "mode", "max"),
+    "beta": ("a", "b"),
+}
+
+
+def lognormal_params(spec: dict) -> tuple[float, float]:
+    """
+    (mu, sigma) of the underlying normal. `mean`/`std` are the lognormal's own
+    mean and std unless the spec sets "log_params", in which case they already
+    are mu and sigma.
+    """
+    if spec.get("log_params"):
+        return spec["mean"], spec["std"]
+    sigma2 = np.log1p((spec["std"] / spec["mean"]) ** 2)
+    return np.log(spec["mean"]) - sigma2 / 2, np.sqrt(sigma2)
+
+
+def _check(condition: bool, name: str, message: str):
+    if not condition:
+        raise ValueError(f"{name}: {message}")
+
+
+class DriverSpec:
+    """One validated distribution; `args` are what its sampler takes"""
+
+    __slots__ = ("dist", "args")
+
+    def __init__(self, spec: dict, name: str = "driver"):
+        dist = spec.get("dist")
+        _check(dist in DISTRIBUTION_FIELDS, name, f"unknown distribution '{dist}'")
+        fields = DISTRIBUTION_FIELDS[dist]
+        missing = [field for field in fields if field not in spec]
+        _check(not missing, name, f"{dist} spec is missing {', '.join(missing)}")
+        values = [float(spec[field]) for field in fields]
+        _check(all(map(math.isfinite, values)), name, "parameters must be finite")
+
+        if dist in ("normal", "lognormal"):
+            _check(values[1] >= 0, name, "std must be non-negative")
+        if dist == "lognormal" and not spec.get("log_params"):
+            _check(values[0] > 0, name, "lognormal mean must be positive")
+        if dist == "gamma":
+            _check(min(values) > 0, name, "shape and scale must be positive")
+        if dist == "triangular":
+            low, mode, high = values
+            _check(low <= mode <= high and low < high, name, "need min <= mode <= max")
+        if dist == "beta":
+            _check(min(values) > 0, name, "a and b must be positive")
+
+        self.dist = dist
+        self.args = (
+            tuple(map(float, lognormal_params(spec)))
+            if dist == "lognormal"
+            else tuple(values)
+        )
+
+    def sample(self, n: int, rng: Generator) -> ndarray:
+        dist, args = self.dist, self.args
+        if dist == "normal":
+            return rng.normal(*args, n)
+        if dist == "lognormal":
+            return rng.lognormal(*args, n)
+        if dist == "gamma":
+            return rng.gamma(*args, n)
+        if dist == "triangular":
+            return rng.triangular(*args, n)
+        return rng.beta(*args, n)
+
+    def ppf(self, u: ndarray) -> ndarray:
+        """Inverse CDF evaluated at uniforms u"""
+        dist, args = self.dist, self.args
+        if dist == "normal":
+            return args[0] + args[1] * ndtri(u)
+        if dist == "lognormal":
+            return np.exp(args[0] + args[1] * ndtri(u))
+        if dist == "gamma":
+            return stats.gamma.ppf(u, args[0], scale=args[1])
+        if dist == "triangular":
+            low, mode, high = args
+            split = (mode - low) / (high - low)
+            return np.where(
+                u < split,
+                low + np.sqrt(u * (high - low) * (mode - low)),
+                high - np.sqrt((1 - u) * (high - low) * (high - mode)),
+            )
+        return stats.beta.ppf(u, *args)
+
+    def __repr__(self):
+        return f"DriverSpec({self.dist}, {self.args})"
+
+
+def as_driver(spec: "dict | DriverSpec") -> DriverSpec:
+    return spec if isinstance(spec, DriverSpec) else DriverSpec(spec)
+
+
+def _validate_discrete(params: DiscreteRisksParams):
+    for field in (
+        "damage_probability",
+        "defective_probability",
+        "cancellation_probability",
+        "tariff_escalation",
+    ):
+        _check(0 <= getattr(params, field) <= 1, field, "must be within [0, 1]")
+    for prefix in ("disruption", "border_delay"):
+        _check(getattr(params, f"{prefix}_lambda") >= 0, prefix, "negative lambda")
+        _check(
+            0 <= getattr(params, f"{prefix}_min") <= getattr(params, f"{prefix}_max"),
+            prefix,
+            "need 0 <= min impact <= max impact",
+        )
+    for field in (
+        "disruption_days_delayed",
+        "border_delay_days_delayed",
+        "quality_days_delayed",
+        "cancellation_days_delayed",
+    ):
+        _check(getattr(params, field) >= 0, field, "must be non-negative")
+
+
+def get_param(params: dict, param_path: tuple):
+    value = params
+    for key in param_path:
+        value = value[key]
+    return value
+
+
+def override_param(params: dict, param_path: tuple, value) -> dict:
+    """Copies only the dicts along param_path; everything else is shared"""
+    updated = dict(params)
+    if len(param_path) == 1:
+        updated[param_path[0]] = value
+    else:
+        updated[param_path[0]] = override_param(
+            params[param_path[0]], param_path[1:], value
+        )
+    return updated
+
+
+class CountryParams:
+    """One COUNTRIES entry, validated and flattened"""
+
+    __slots__ = (
+        "source",
+        "drivers",
+        "yield_spec",
+        "fixed_tariff",
+        "currency_std",
+        "discrete",
+    )
+
+    def __init__(self, source: dict):
+        self.source = source
+        self.drivers = tuple(DriverSpec(source[name], name) for name in COST_DRIVERS)
+        self.yield_spec = DriverSpec(source["yield_params"], "yield_params")
+        self.fixed_tariff = float(source["tariff"]["fixed"])
+        self.currency_std = float(source["currency_std"])
+        _check(self.currency_std >= 0, "currency_std", "must be non-negative")
+        self.discrete = create_params_from_dict(source, 0)
+        _validate_discrete(self.discrete)
+
+    def discrete_params(self, order_size: int) -> DiscreteRisksParams:
+        return replace(self.discrete, order_size=order_size)
+
+    def get(self, param_path: tuple):
+        return get_param(self.source, param_path)
+
+    def override(self, param_path: tuple, value) -> "CountryParams":
+        """A new, revalidated CountryParams with one value replaced"""
+        return CountryParams(override_param(self.source, param_path, value))
+
+    def __repr__(self):
+        return f"CountryParams({self.source!r})"
+
+
+def compile_params(params: "dict | CountryParams") -> CountryParams:
+    return params if isinstance(params, CountryParams) else CountryParams(params)
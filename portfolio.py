@@ -0,0 +1,362 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+from numpy.random import Generator
+from scipy import sparse
+from scipy.cluster.vq import kmeans2
+from scipy.optimize import linprog, minimize
+
+from config import (
+    CVAR_ALPHA,
+    CVAR_SCENARIOS,
+    MAX_SUPPLIER_SHARE,
+    MIN_SUPPLIER_SHARE,
+    SCENARIO_REDUCTION,
+)
+from metrics import cvar, resample_by_weight, weighted_mean
+from profiling import profiled
+from streams import get_rng
+
+# Mean-risk allocation of an order across any number of suppliers. The
+# optimizer only sees sufficient statistics (mean vector and covariance of
+# the per-lamp cost), so its cost does not grow with the trial count.
+# Objective: w . mean + risk_tolerance * sqrt(w' cov w), with the shares w
+# summing to one. The CVaR objective further down works from the scenarios
+# themselves instead.
+
+
+def scenario_matrix(
+    costs: dict[str, ndarray], weights: dict[str, ndarray | None] | None = None
+) -> tuple[tuple[str, ...], ndarray, ndarray | None]:
+    """
+    (suppliers, trials x suppliers cost matrix, trial weights) from separate
+    per-supplier runs. Trials are paired by index, so every run must have
+    the same trial count. The runs are independent, so a paired trial's
+    likelihood ratio is the product of the suppliers' importance weights.
+    """
+    suppliers = tuple(costs)
+    counts = {len(x) for x in costs.values()}
+    if len(counts) > 1:
+        raise ValueError(
+            "Runs with different trial counts cannot be paired by index "
+            f"({', '.join(f'{s} {len(x)}' for s, x in costs.items())})"
+        )
+    n = counts.pop()
+    matrix = np.column_stack([costs[s] for s in suppliers])
+    if weights is None or all(w is None for w in weights.values()):
+        return suppliers, matrix, None
+    trial_weights = np.prod(
+        [np.ones(n) if weights.get(s) is None else weights[s][:n] for s in suppliers],
+        axis=0,
+    )
+    return suppliers, matrix, trial_weights
+
+
+@dataclass
+class PortfolioStats:
+    suppliers: tuple[str, ...]
+    mean: ndarray  # (k,)
+    cov: ndarray  # (k, k)
+
+    @classmethod
+    def from_matrix(
+        cls,
+        suppliers: tuple[str, ...],
+        costs: ndarray,
+        weights: ndarray | None = None,
+    ) -> "PortfolioStats":
+        """Mean and covariance of a trials x suppliers cost matrix"""
+        cov = np.atleast_2d(np.cov(costs, rowvar=False, aweights=weights))
+        if weights is None:
+            # float64 accumulation for single-precision matrices too
+            mean = costs.mean(axis=0, dtype=float)
+        else:
+            mean = np.average(costs, axis=0, weights=weights)
+        return cls(tuple(suppliers), mean, cov)
+
+    @classmethod
+    def from_scenarios(
+        cls,
+        costs: dict[str, ndarray],
+        weights: dict[str, ndarray | None] | None = None,
+    ) -> "PortfolioStats":
+        """
+        Mean and covariance of separate, independent per-supplier runs: each
+        supplier's mean and variance come from its whole run, whatever its
+        trial count (e.g. adaptive runs), and the covariance is diagonal
+        """
+        suppliers = tuple(costs)
+        weights = weights or {}
+        mean = np.array([weighted_mean(costs[s], weights.get(s)) for s in suppliers])
+        variance = [float(np.cov(costs[s], aweights=weights.get(s))) for s in suppliers]
+        return cls(suppliers, mean, np.diag(variance))
+
+
+def share_bounds(
+    suppliers: tuple[str, ...], min_share, max_share
+) -> list[tuple[float, float]]:
+    """Per-supplier (min, max) bounds from scalars or {supplier: share} dicts"""
+    if not isinstance(min_share, dict):
+        min_share = dict.fromkeys(suppliers, min_share)
+    if not isinstance(max_share, dict):
+        max_share = dict.fromkeys(suppliers, max_share)
+    return [(min_share.get(s, 0.0), max_share.get(s, 1.0)) for s in suppliers]
+
+
+def _portfolio_objective(w: ndarray, mean: ndarray, cov: ndarray, lam: float):
+    """Objective value and its gradient"""
+    cov_w = cov @ w
+    std = np.sqrt(max(w @ cov_w, 1e-18))
+    return w @ mean + lam * std, mean + lam * cov_w / std
+
+
+def _initial_shares(bounds: list[tuple[float, float]]) -> ndarray:
+    """Feasible start: every supplier at its minimum, the rest spread evenly"""
+    low = np.array([b[0] for b in bounds])
+    high = np.array([b[1] for b in bounds])
+    return low + (high - low) * (1 - low.sum()) / max((high - low).sum(), 1e-12)
+
+
+@profiled()
+def optimize_portfolio(
+    stats: PortfolioStats,
+    risk_tolerance: float,
+    min_share=MIN_SUPPLIER_SHARE,
+    max_share=MAX_SUPPLIER_SHARE,
+    warm_start: ndarray | dict | None = None,
+) -> dict | None:
+    """
+    Minimum mean + risk_tolerance * std allocation. min_share and max_share
+    are scalars or {supplier: share} dicts. warm_start (the shares from a
+    previous solve, e.g. at a nearby risk tolerance) is used as the starting
+    point. Returns None if the solver fails or the bounds are infeasible.
+    """
+    bounds = share_bounds(stats.suppliers, min_share, max_share)
+    if sum(b[0] for b in bounds) > 1 or sum(b[1] for b in bounds) < 1:
+        return None
+    if isinstance(warm_start, dict):
+        warm_start = np.array([warm_start.get(s, 0.0) for s in stats.suppliers])
+    x0 = _initial_shares(bounds) if warm_start is None else warm_start
+
+    solution = minimize(
+        _portfolio_objective,
+        np.clip(x0, [b[0] for b in bounds], [b[1] for b in bounds]),
+        args=(stats.mean, stats.cov, risk_tolerance),
+        jac=True,
+        method="SLSQP",
+        bounds=bounds,
+        constraints=[
+            {
+                "type": "eq",
+                "fun": lambda w: w.sum() - 1,
+                "jac": lambda w: np.ones_like(w),
+            }
+        ],
+        options={"ftol": 1e-9, "maxiter": 500},
+    )
+    if not solution.success:
+        return None
+
+    shares = np.clip(solution.x, 0, None)
+    shares /= shares.sum()
+    return {
+        "allocations": dict(zip(stats.suppliers, shares)),
+        "shares": shares,
+        "expected_cost": float(shares @ stats.mean),
+        "std": float(np.sqrt(max(shares @ stats.cov @ shares, 0))),
+        "iterations": solution.nit,
+    }
+
+
+def efficient_frontier(
+    stats: PortfolioStats,
+    risk_tolerances: ndarray = np.linspace(0, 5, 51),
+    min_share=MIN_SUPPLIER_SHARE,
+    max_share=MAX_SUPPLIER_SHARE,
+) -> pd.DataFrame:
+    """
+    optimize_portfolio along a path of risk tolerances, each solve warm-started
+    from the previous one. One row per risk tolerance with the expected cost,
+    std and every supplier's share.
+    """
+    rows, shares = [], None
+    for lam in risk_tolerances:
+        result = optimize_portfolio(stats, lam, min_share, max_share, shares)
+        if result is None:
+            continue
+        shares = result["shares"]
+        rows.append(
+            {
+                "Risk Tolerance": lam,
+                "Expected Cost": result["expected_cost"],
+                "Std": result["std"],
+                **result["allocations"],
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+# --- CVaR objective ---
+# Expected shortfall describes the discrete-shock tails better than the
+# standard deviation does. Minimizing mean + risk_tolerance * (CVaR - mean) is
+# a linear program over the scenarios (Rockafellar-Uryasev), so the scenarios
+# are reduced to a few thousand first to keep it interactive.
+SCENARIO_REDUCTIONS = ("kmeans", "sample")
+
+
+@dataclass
+class PortfolioScenarios:
+    suppliers: tuple[str, ...]
+    costs: ndarray  # (scenarios, k)
+    probabilities: ndarray  # (scenarios,), sums to one
+
+    @classmethod
+    def from_matrix(
+        cls,
+        suppliers: tuple[str, ...],
+        costs: ndarray,
+        weights: ndarray | None = None,
+    ) -> "PortfolioScenarios":
+        """Every row of a trials x suppliers cost matrix is one scenario"""
+        probabilities = np.ones(len(costs)) if weights is None else weights
+        return cls(tuple(suppliers), costs, probabilities / probabilities.sum())
+
+    @classmethod
+    def from_scenarios(
+        cls,
+        costs: dict[str, ndarray],
+        weights: dict[str, ndarray | None] | None = None,
+        n: int = CVAR_SCENARIOS,
+        rng: Generator | None = None,
+    ) -> "PortfolioScenarios":
+        """
+        Scenarios from separate, independent per-supplier runs. Runs of one
+        trial count are paired by index. Otherwise every run is resampled on
+        its own, by weight, into n equally likely scenarios, so no supplier's
+        trials are cut to the shortest run.
+        """
+        if len({len(x) for x in costs.values()}) == 1:
+            return cls.from_matrix(*scenario_matrix(costs, weights))
+        rng = get_rng(rng)
+        weights = weights or {}
+        matrix = np.column_stack(
+            [
+                resample_by_weight(
+                    x,
+                    np.ones(len(x)) if weights.get(s) is None else weights[s],
+                    n,
+                    rng,
+                )
+                for s, x in costs.items()
+            ]
+        )
+        return cls(tuple(costs), matrix, np.full(n, 1 / n))
+
+    @profiled()
+    def reduce(
+        self,
+        n: int = CVAR_SCENARIOS,
+        method: str = SCENARIO_REDUCTION,
+        rng: Generator | None = None,
+    ) -> "PortfolioScenarios":
+        """
+        At most n scenarios. "kmeans" replaces the scenarios with cluster
+        centers weighted by cluster probability; "sample" draws n equally
+        likely scenarios in proportion to their probability.
+        """
+        if len(self.costs) <= n:
+            return self
+        rng = get_rng(rng)
+        if method == "sample":
+            costs = resample_by_weight(self.costs, self.probabilities, n, rng)
+            return PortfolioScenarios(self.suppliers, costs, np.full(n, 1 / n))
+        if method == "kmeans":
+            # cluster in standardized units so no supplier dominates the distance
+            scale = self.costs.std(axis=0)
+            scale[scale == 0] = 1
+            # (k-means++ seeding is too slow at this size; Lloyd's from sampled points)
+            _, labels = kmeans2(self.costs / scale, n, iter=5, minit="points", seed=rng)
+            probabilities = np.bincount(labels, self.probabilities, minlength=n)
+            keep = probabilities > 0
+            centers = np.column_stack(
+                [
+                    np.bincount(labels, self.probabilities * column, minlength=n)
+                    for column in self.costs.T
+                ]
+            )
+            return PortfolioScenarios(
+                self.suppliers,
+                centers[keep] / probabilities[keep, None],
+                probabilities[keep],
+            )
+        raise ValueError(
+            f"Unknown scenario reduction '{method}', expected one of {SCENARIO_REDUCTIONS}"
+        )
+
+
+@profiled()
+def optimize_portfolio_cvar(
+    scenarios: PortfolioScenarios,
+    risk_tolerance: float,
+    alpha: float = CVAR_ALPHA,
+    min_share=MIN_SUPPLIER_SHARE,
+    max_share=MAX_SUPPLIER_SHARE,
+) -> dict | None:
+    """
+    Minimum mean + risk_tolerance * (CVaR_alpha - mean) allocation, solved
+    with HiGHS. Variables are the k shares, the VaR level t and one shortfall
+    z_s >= cost_s . w - t per scenario. Returns the same keys as
+    optimize_portfolio plus "cvar", or None if the LP fails.
+    """
+    costs, p = scenarios.costs, scenarios.probabilities
+    s, k = costs.shape
+    mean = p @ costs
+
+    # mean + lam * (CVaR - mean), with CVaR = t + sum(p_s z_s) / (1 - alpha)
+    objective = np.concatenate(
+        [
+            (1 - risk_tolerance) * mean,
+            [risk_tolerance],
+            risk_tolerance * p / (1 - alpha),
+        ]
+    )
+    # cost_s . w - t - z_s <= 0
+    a_ub = sparse.hstack(
+        [
+            sparse.csr_matrix(costs),
+            sparse.csr_matrix(-np.ones((s, 1))),
+            -sparse.identity(s, format="csr"),
+        ],
+        format="csr",
+    )
+    a_eq = sparse.csr_matrix(np.concatenate([np.ones(k), np.zeros(1 + s)])[None, :])
+    bounds = (
+        share_bounds(scenarios.suppliers, min_share, max_share)
+        + [(None, None)]
+        + [(0, None)] * s
+    )
+    solution = linprog(
+        objective,
+        A_ub=a_ub,
+        b_ub=np.zeros(s),
+        A_eq=a_eq,
+        b_eq=[1.0],
+        bounds=bounds,
+        method="highs",
+    )
+    if not solution.success:
+        return None
+
+    shares = np.clip(solution.x[:k], 0, None)
+    shares /= shares.sum()
+    portfolio_costs = costs @ shares
+    return {
+        "allocations": dict(zip(scenarios.suppliers, shares)),
+        "shares": shares,
+        "expected_cost": float(shares @ mean),
+        "std": float(np.sqrt(p @ (portfolio_costs - shares @ mean) ** 2)),
+        # from the costs, since t and z are not pinned down when risk_tolerance is 0
+        "cvar": cvar(portfolio_costs, alpha, p),
+    }
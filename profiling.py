@@ -0,0 +1,269 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+import pandas as pd
+
+# Span instrumentation for the slow stages (FRED, simulation, discrete risks,
+# optimizer, app rendering). Spans are recorded process-wide while enabled,
+# and into a Collector wherever one is set for the current context with
+# collect(), e.g. for one app session, so one session's recording does not
+# reach another's. Otherwise @profiled costs a flag check and a context
+# variable lookup per call, and span() returns a shared no-op context. Every
+# recorded span holds its wall time and, when memory tracking is on, its peak
+# traced memory above the level at its start (tracemalloc, whose counts are
+# process-wide), so temporaries freed before the span ends still count.
+# Work handed to worker threads or processes records through run_collected,
+# and its spans are merged back into the submitting context's recording with
+# merge_events (see executor.imap_seeded). Set PROFILING=1 in the
+# environment to enable it at import (read here rather than from config,
+# which itself imports live_data).
+
+_enabled = os.getenv("PROFILING") == "1"
+_track_memory = False
+_events = []
+_lock = threading.Lock()
+_NOOP = nullcontext()
+# this thread's open memory-tracking spans, innermost last
+_memory_spans = threading.local()
+
+
+class Collector:
+    """Spans recorded in the contexts it is set for"""
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.events = []
+
+
+_collector: ContextVar[Collector | None] = ContextVar("collector", default=None)
+# collectors tracking memory; tracemalloc runs while any is alive
+_memory_collectors = weakref.WeakSet()
+
+
+def _update_tracemalloc():
+    wanted = _track_memory or len(_memory_collectors) > 0
+    if wanted and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not wanted and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def collect(collector: Collector | None):
+    """Records the current context's spans into collector (None stops)"""
+    _collector.set(collector)
+    if collector is not None and collector.track_memory:
+        _memory_collectors.add(collector)
+    _update_tracemalloc()
+
+
+def enable(track_memory: bool = False):
+    """Records every context's spans process-wide"""
+    global _enabled, _track_memory
+    _track_memory = track_memory
+    _update_tracemalloc()
+    _enabled = True
+
+
+def disable():
+    global _enabled, _track_memory
+    _enabled = _track_memory = False
+    _update_tracemalloc()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _recording() -> bool:
+    return _enabled or _collector.get() is not None
+
+
+def _tracks_memory(collector: Collector | None) -> bool:
+    return (_enabled and _track_memory) or (
+        collector is not None and collector.track_memory
+    )
+
+
+def worker_tracking() -> bool | None:
+    """
+    For work handed to another thread or process: None when this context is
+    not recording, else whether its recording tracks memory
+    """
+    if not _recording():
+        return None
+    return _tracks_memory(_collector.get())
+
+
+def run_collected(track_memory: bool, fn, *args) -> tuple:
+    """fn(*args) recorded into a fresh Collector; returns (result, its spans)"""
+    collector = Collector(track_memory)
+    token = _collector.set(collector)
+    if track_memory:
+        _memory_collectors.add(collector)
+    _update_tracemalloc()
+    try:
+        result = fn(*args)
+    finally:
+        _collector.reset(token)
+        _memory_collectors.discard(collector)
+        _update_tracemalloc()
+    return result, collector.events
+
+
+def merge_events(events: list):
+    """Adds spans recorded elsewhere (e.g. in a worker) to this context's recording"""
+    collector = _collector.get()
+    with _lock:
+        if _enabled:
+            _events.extend(events)
+        if collector is not None:
+            collector.events.extend(events)
+
+
+def _events_of(collector: Collector | None) -> list:
+    return _events if collector is None else collector.events
+
+
+def reset(collector: Collector | None = None):
+    with _lock:
+        _events_of(collector).clear()
+
+
+def _open_memory_spans() -> list:
+    if not hasattr(_memory_spans, "stack"):
+        _memory_spans.stack = []
+    return _memory_spans.stack
+
+
+class _Span:
+    __slots__ = ("name", "start", "memory", "peak", "collector", "track_memory")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.collector = _collector.get()
+        self.track_memory = _tracks_memory(self.collector) and tracemalloc.is_tracing()
+        self.memory = self.peak = 0
+        if self.track_memory:
+            # the peak is reset for this span, so the enclosing span keeps
+            # the peak reached so far and takes this span's when it ends
+            stack = _open_memory_spans()
+            self.memory, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.peak = self.memory
+            stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        peak_bytes = 0
+        if self.track_memory:
+            stack = _open_memory_spans()
+            stack.remove(self)
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+            peak_bytes = self.peak - self.memory
+        event = (
+            self.name,
+            self.start,
+            end - self.start,
+            os.getpid(),
+            threading.get_ident(),
+            peak_bytes,
+        )
+        with _lock:
+            if _enabled:
+                _events.append(event)
+            if self.collector is not None:
+                self.collector.events.append(event)
+        return False
+
+
+def span(name: str):
+    """Context manager timing one stage; a shared no-op while not recording"""
+    return _Span(name) if _recording() else _NOOP
+
+
+def profiled(name: str | None = None):
+    """Decorator recording every call as a span named `name` (default: module.qualname)"""
+
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _recording():
+                return fn(*args, **kwargs)
+            with _Span(label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def summary(collector: Collector | None = None) -> pd.DataFrame:
+    """
+    Per-stage calls, wall time and largest peak memory, slowest stage first,
+    of collector's spans (the process-wide ones by default)
+    """
+    with _lock:
+        events = list(_events_of(collector))
+    columns = ["Stage", "Calls", "Total ms", "Mean ms", "Max ms", "Peak MB"]
+    if not events:
+        return pd.DataFrame(columns=columns)
+    frame = pd.DataFrame(
+        events, columns=["Stage", "start", "ns", "pid", "thread", "bytes"]
+    )
+    grouped = frame.groupby("Stage")
+    return (
+        pd.DataFrame(
+            {
+                "Calls": grouped.size(),
+                "Total ms": grouped["ns"].sum() / 1e6,
+                "Mean ms": grouped["ns"].mean() / 1e6,
+                "Max ms": grouped["ns"].max() / 1e6,
+                "Peak MB": grouped["bytes"].max() / 2**20,
+            }
+        )
+        .sort_values("Total ms", ascending=False)
+        .reset_index()[columns]
+    )
+
+
+def chrome_trace(collector: Collector | None = None) -> dict:
+    """The recorded spans in Chrome trace format (chrome://tracing, Perfetto)"""
+    with _lock:
+        events = list(_events_of(collector))
+    return {
+        "traceEvents": [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start / 1e3,
+                "dur": duration / 1e3,
+                "pid": pid,
+                "tid": thread,
+                "args": {"peak_bytes": peak},
+            }
+            for name, start, duration, pid, thread, peak in events
+        ],
+        "displayTimeUnit": "ms",
+    }
+
+
+def export_chrome_trace(path: str, collector: Collector | None = None):
+    with open(path, "w") as f:
+        json.dump(chrome_trace(collector), f)
@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+from numpy import int64, maximum, minimum, ndarray, take_along_axis, where
+from numpy.random import Generator
+from scipy.stats import binom, poisson
+
+from cache import memoize
+from config import EXECUTOR, MONTE_CARLO_SIMULATIONS, SENSITIVITY_SEED
+from discrete import total_cost
+from executor import map_seeded
+from params import compile_params
+from profiling import profiled
+from simulation import run_monte_carlo
+from streams import make_rng
+from structs import DiscreteRisksParams
+
+# Parameters that only feed the discrete risk generators. Perturbing one of
+# these re-evaluates the discrete costs from the stored base draws; any other
+# factor goes back through run_monte_carlo on common random numbers.
+DISCRETE_KEYS = {
+    "disruption_lambda",
+    "disruption_min_impact",
+    "disruption_max_impact",
+    "disruption_days_delayed",
+    "border_delay_lambda",
+    "border_min_impact",
+    "border_max_impact",
+    "border_days_delayed",
+    "damage_probability",
+    "defective_probability",
+    "quality_days_delayed",
+    "cancellation_probability",
+    "cancellation_days_delayed",
+}
+
+
+class DiscreteDraws:
+    """
+    The uniform variates behind every discrete risk, drawn once. Event counts
+    and unit losses are recovered by inverse CDF, and compound severities are
+    stored as cumulative uniform fractions, so changing a lambda, probability,
+    impact range or delay re-uses the same draws.
+    """
+
+    def __init__(self, n: int, max_events: int, rng: Generator):
+        self.n = n
+        self.max_events = max_events
+        self.disruption_count = rng.random(n)
+        self.disruption_severity = self._cumulative_fractions(n, max_events, rng)
+        self.border_count = rng.random(n)
+        self.border_severity = self._cumulative_fractions(n, max_events, rng)
+        self.damage = rng.random(n)
+        self.defective = rng.random(n)
+        self.cancellation = rng.random(n)
+
+    @staticmethod
+    def _cumulative_fractions(n: int, max_events: int, rng: Generator) -> ndarray:
+        fractions = np.zeros((n, max_events + 1))
+        np.cumsum(rng.random((n, max_events)), axis=1, out=fractions[:, 1:])
+        return fractions
+
+    def _compound_cost(
+        self,
+        count_u: ndarray,
+        severity: ndarray,
+        event_lambda: float,
+        min_impact: int,
+        max_impact: int,
+        days_delayed: int,
+    ) -> ndarray:
+        events = maximum(poisson.ppf(count_u, event_lambda), 0).astype(int64)
+        events = minimum(events, self.max_events)
+        fractions = take_along_axis(severity, events[:, None], axis=1)[:, 0]
+        lost = (events * min_impact + (max_impact - min_impact) * fractions).astype(
+            int64
+        )
+        return where(events == 0, 0.0, total_cost(lost, days_delayed))
+
+    def cost(self, params: DiscreteRisksParams) -> ndarray:
+        """Total discrete-risk cost per trial for the given parameters"""
+        damaged = maximum(
+            binom.ppf(self.damage, params.order_size, params.damage_probability), 0
+        )
+        defective = maximum(
+            binom.ppf(self.defective, params.order_size, params.defective_probability),
+            0,
+        )
+        cancelled = (self.cancellation < params.cancellation_probability) * (
+            params.order_size
+        )
+        return (
+            self._compound_cost(
+                self.disruption_count,
+                self.disruption_severity,
+                params.disruption_lambda,
+                params.disruption_min,
+                params.disruption_max,
+                params.disruption_days_delayed,
+            )
+            + self._compound_cost(
+                self.border_count,
+                self.border_severity,
+                params.border_delay_lambda,
+                params.border_delay_min,
+                params.border_delay_max,
+                params.border_delay_days_delayed,
+            )
+            + total_cost(damaged, params.quality_days_delayed)
+            + total_cost(defective, params.quality_days_delayed)
+            + total_cost(cancelled, params.cancellation_days_delayed)
+        )
+
+
+def _max_events(base: DiscreteRisksParams, swing: float) -> int:
+    """Event cap covering all but ~1e-12 of the Poisson mass at the largest lambda"""
+    largest = max(base.disruption_lambda, base.border_delay_lambda)
+    return int(poisson.ppf(1 - 1e-12, largest * (1 + swing))) + 1
+
+
+def _mean_total_cost(country, params, order_size):
+    """Worker task: ships back only the mean (or the error), not the trial arrays"""
+    try:
+        return np.mean(run_monte_carlo(country, params, order_size)["total_cost"])
+    except Exception as e:
+        return e
+
+
+@profiled()
+def run_sensitivity_analysis(
+    country,
+    base_params,
+    factors_to_test,
+    order_size,
+    swing=0.20,
+    seed=SENSITIVITY_SEED,
+    n=MONTE_CARLO_SIMULATIONS,
+    on_error=None,
+    executor=EXECUTOR,
+):
+    """
+    Runs a one-at-a-time sensitivity analysis for a given set of factors.
+
+    The baseline is simulated once. Discrete-risk factors are re-evaluated
+    from one set of stored draws and their change in mean discrete cost is
+    added to the baseline. Discrete costs enter the total additively, so
+    nothing else has to be re-simulated. Other factors re-run
+    run_monte_carlo in parallel on the baseline's common random numbers.
+    Returns a dataframe with the results and the baseline mean cost.
+    """
+    # validated once; each perturbation copies only the dicts on its path
+    base = compile_params(base_params)
+    draws = DiscreteDraws(n, _max_events(base.discrete, swing), make_rng(seed))
+    base_discrete_mean = np.mean(draws.cost(base.discrete_params(order_size)))
+
+    # (factor, low, high) where each side is a mean cost or a simulation task
+    factor_runs = []
+    tasks = [(country, base_params, order_size)]
+    for factor_name, param_path in factors_to_test:
+        base_value = base.get(param_path)
+
+        # Skip parameters that are 0 (can't do ±20% of 0)
+        if base_value == 0:
+            continue
+
+        sides = []
+        for value in (base_value * (1 - swing), base_value * (1 + swing)):
+            try:
+                params = base.override(param_path, value)
+            except ValueError as e:
+                # the perturbed value is invalid (e.g. a probability above 1)
+                sides.append(("error", e))
+                continue
+            if param_path[0] in DISCRETE_KEYS:
+                discrete_mean = np.mean(draws.cost(params.discrete_params(order_size)))
+                sides.append(("delta", discrete_mean - base_discrete_mean))
+            else:
+                sides.append(("task", len(tasks)))
+                tasks.append((country, params.source, order_size))
+        factor_runs.append((factor_name, sides))
+
+    means = map_seeded(_mean_total_cost, tasks, seed, kind=executor, common=True)
+    baseline_mean = means[0]
+    if isinstance(baseline_mean, Exception):
+        raise baseline_mean
+
+    results = []
+    for factor_name, sides in factor_runs:
+        values = []
+        for kind, value in sides:
+            if kind == "delta":
+                value = baseline_mean + value
+            elif kind == "task":
+                value = means[value]
+            values.append(value)
+
+        error = next((v for v in values if isinstance(v, Exception)), None)
+        if error is not None:
+            # Skip factors that cause errors (e.g., invalid parameter combinations)
+            if on_error is not None:
+                on_error(factor_name, error)
+            continue
+
+        mean_low, mean_high = values
+        results.append(
+            {
+                "Factor": factor_name,
+                "Low Cost": mean_low,
+                "High Cost": mean_high,
+                "Impact": mean_high - mean_low,
+            }
+        )
+
+    return pd.DataFrame(results), baseline_mean
+
+
+def _sensitivity_key(
+    country,
+    base_params,
+    factors_to_test,
+    order_size,
+    swing=0.20,
+    seed=SENSITIVITY_SEED,
+    n=MONTE_CARLO_SIMULATIONS,
+    **_,
+):
+    return country, base_params, factors_to_test, order_size, swing, seed, n
+
+
+@memoize(key=_sensitivity_key)
+def _cached_sensitivity(*args, on_error=None, **kwargs):
+    skipped = []
+    results, baseline_mean = run_sensitivity_analysis(
+        *args, on_error=lambda factor, e: skipped.append((factor, e)), **kwargs
+    )
+    return results, baseline_mean, skipped
+
+
+def cached_run_sensitivity_analysis(*args, on_error=None, **kwargs):
+    """
+    run_sensitivity_analysis, memoized on everything that shapes its result.
+    Skipped factors are kept with the result and passed to on_error on every
+    call, cached or not.
+    """
+    results, baseline_mean, skipped = _cached_sensitivity(*args, **kwargs)
+    if on_error is not None:
+        for factor_name, error in skipped:
+            on_error(factor_name, error)
+    return results, baseline_mean
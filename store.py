@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from functools import lru_cache, wraps
+from importlib.util import find_spec
+from pathlib import Path
+
+import numpy as np
+
+import config
+from cache import stable_hash
+from config import RESULT_STORE_DIR, RESULT_STORE_MAX_BYTES
+
+# Content-addressed result store on disk. A result (a dict, possibly nested,
+# of arrays and JSON values) is saved under the hash of its inputs, the code
+# version and the Fed Funds rate: one .npy file per array plus a meta.json.
+# Reads memory-map the arrays, so a stored run costs next to nothing to load
+# in any session or process. Entries are written to a temporary directory
+# and renamed into place, so readers never see a partial one. Loaded arrays
+# are read-only.
+
+# Modules whose source determines simulation results
+SIMULATION_MODULES = (
+    "config",
+    "discrete",
+    "engine",
+    "executor",
+    "kernels",
+    "params",
+    "simulation",
+    "streams",
+    "structs",
+)
+META_FILE = "meta.json"
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Hash of the simulation modules' source and the NumPy version"""
+    sources = []
+    for name in SIMULATION_MODULES:
+        spec = find_spec(name)
+        if spec is not None and spec.origin:
+            sources.append(hashlib.sha256(Path(spec.origin).read_bytes()).hexdigest())
+    return stable_hash(np.__version__, sources)
+
+
+def _flatten(result: dict, prefix: tuple = ()):
+    """Splits a result into {"a/b": array} and the nested non-array values"""
+    arrays, values = {}, {}
+    for key, value in result.items():
+        path = prefix + (str(key),)
+        if isinstance(value, dict):
+            nested_arrays, values[key] = _flatten(value, path)
+            arrays.update(nested_arrays)
+        elif isinstance(value, np.ndarray):
+            arrays["/".join(path)] = value
+        else:
+            values[key] = value
+    return arrays, values
+
+
+def _tuples(value):
+    # JSON turns tuples (e.g. suppliers) into lists; results use tuples
+    if isinstance(value, list):
+        return tuple(_tuples(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _tuples(item) for key, item in value.items()}
+    return value
+
+
+class ResultStore:
+    """Size-bounded, least-recently-used directory of stored results"""
+
+    def __init__(
+        self, root: str | Path = RESULT_STORE_DIR, max_bytes=RESULT_STORE_MAX_BYTES
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def key(self, *parts) -> str:
+        return stable_hash(code_version(), config.FED_FUNDS_RATE, *parts)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            meta = json.loads((path / META_FILE).read_text())
+            arrays = {
+                name: np.load(path / f"{name}.npy", mmap_mode="r")
+                for name in meta["arrays"]
+            }
+            # the meta file's mtime is the entry's last use, for eviction
+            os.utime(path / META_FILE)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        result = _tuples(meta["values"])
+        for name, array in arrays.items():
+            *parents, leaf = name.split("/")
+            target = result
+            for parent in parents:
+                target = target[parent]
+            target[leaf] = array
+        return result
+
+    def put(self, key: str, result: dict):
+        arrays, values = _flatten(result)
+        path = self._path(key)
+        staging = path.with_name(f".{key}.{uuid.uuid4().hex}")
+        try:
+            for name, array in arrays.items():
+                file = staging / f"{name}.npy"
+                file.parent.mkdir(parents=True, exist_ok=True)
+                np.save(file, np.ascontiguousarray(array))
+            staging.mkdir(parents=True, exist_ok=True)
+            (staging / META_FILE).write_text(
+                json.dumps(
+                    {"created": time.time(), "arrays": list(arrays), "values": values}
+                )
+            )
+            try:
+                staging.rename(path)
+            except OSError:
+                pass  # another process stored the same result first
+        except (OSError, TypeError) as e:
+            print(f"Warning: Failed to store simulation result: {str(e)}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def entries(self) -> list[tuple[Path, float, int]]:
+        """(path, last use, bytes) for every complete entry, oldest use first"""
+        entries = []
+        for meta in self.root.glob(f"*/*/{META_FILE}"):
+            if meta.parent.name.startswith("."):
+                continue  # still being written
+            try:
+                used = meta.stat().st_mtime
+                size = sum(f.stat().st_size for f in meta.parent.rglob("*"))
+            except OSError:
+                continue  # evicted meanwhile
+            entries.append((meta.parent, used, size))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self.entries())
+
+    def evict(self, max_bytes: int | None = None):
+        """Removes the least recently used entries until within max_bytes"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= max_bytes:
+                break
+            # open memory maps stay valid after their files are unlinked
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        self.evict(0)
+
+    def __len__(self):
+        return len(self.entries())
+
+
+@lru_cache(maxsize=1)
+def get_store() -> ResultStore | None:
+    return ResultStore() if RESULT_STORE_DIR else None
+
+
+def persist(key):
+    """
+    Stores fn's results in the result store under key(*args, **kwargs), and
+    serves later calls from it. A key of None (e.g. an unseeded run) is
+    neither read nor stored.
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            store = get_store()
+            parts = key(*args, **kwargs)
+            if store is None or parts is None:
+                return fn(*args, **kwargs)
+            store_key = store.key(fn.__qualname__, parts)
+            result = store.get(store_key)
+            if result is None:
+                result = fn(*args, **kwargs)
+                store.put(store_key, result)
+            return result
+
+        return wrapper
+
+    return decorator
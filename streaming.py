@@ -0,0 +1,179 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy import ndarray
+
+from analytic import country_moments
+from config import DDSKETCH_RELATIVE_ACCURACY, HISTOGRAM_BINS
+from histogram import Histogram
+
+# Constant-memory statistics for runs too large to keep every trial. Each
+# accumulator takes trials in batches (with optional importance weights) and
+# merges with another of its kind, so chunks simulated on different workers
+# are combined into exactly the statistics of one long run.
+
+
+@dataclass
+class Welford:
+    """Running mean and variance (Chan et al.'s batched update)"""
+
+    n: int = 0  # trials
+    weight: float = 0.0  # summed trial weight, equal to n when unweighted
+    mean: float = 0.0
+    m2: float = 0.0  # weighted sum of squared deviations from the mean
+
+    def add(self, x: ndarray, weights: ndarray | None = None):
+        if len(x) == 0:
+            return
+        if weights is None:
+            weights = np.ones(len(x))
+        batch_weight = float(weights.sum())
+        batch_mean = float(np.dot(x, weights) / batch_weight)
+        batch_m2 = float(np.dot(weights, (x - batch_mean) ** 2))
+        self._combine(len(x), batch_weight, batch_mean, batch_m2)
+
+    def _combine(self, n: int, weight: float, mean: float, m2: float):
+        total = self.weight + weight
+        delta = mean - self.mean
+        self.mean += delta * weight / total
+        self.m2 += m2 + delta**2 * self.weight * weight / total
+        self.n += n
+        self.weight = total
+
+    def merge(self, other: "Welford") -> "Welford":
+        merged = Welford(self.n, self.weight, self.mean, self.m2)
+        if other.n:
+            merged._combine(other.n, other.weight, other.mean, other.m2)
+        return merged
+
+    __add__ = merge
+
+    @property
+    def variance(self) -> float:
+        if self.n < 2:
+            return np.nan
+        return self.m2 / self.weight * self.n / (self.n - 1)
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def stderr(self) -> float:
+        return float(np.sqrt(self.variance / self.n)) if self.n else np.nan
+
+
+@dataclass
+class DDSketch:
+    """
+    Quantile sketch with bounded relative error (Masson et al., 2019). A value
+    x > 0 falls in bucket ceil(log_gamma(x)), gamma = (1 + a) / (1 - a), and
+    every quantile is returned to within a relative accuracy a. Values <= 0
+    share one zero bucket. Memory grows with log(max / min), not trial count.
+    """
+
+    relative_accuracy: float = DDSKETCH_RELATIVE_ACCURACY
+    buckets: dict[int, float] = field(default_factory=dict)
+    zero_weight: float = 0.0
+    weight: float = 0.0
+
+    @property
+    def gamma(self) -> float:
+        return (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+
+    def add(self, x: ndarray, weights: ndarray | None = None):
+        if len(x) == 0:
+            return
+        if weights is None:
+            weights = np.ones(len(x))
+        positive = x > 0
+        self.zero_weight += float(weights[~positive].sum())
+        self.weight += float(weights.sum())
+
+        logs = np.log(x[positive], dtype=float)
+        keys = np.ceil(logs / np.log(self.gamma)).astype(np.int64)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=weights[positive])
+        for key, value in zip(unique.tolist(), sums.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0.0) + value
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same accuracy can be merged")
+        buckets = dict(self.buckets)
+        for key, value in other.buckets.items():
+            buckets[key] = buckets.get(key, 0.0) + value
+        return DDSketch(
+            self.relative_accuracy,
+            buckets,
+            self.zero_weight + other.zero_weight,
+            self.weight + other.weight,
+        )
+
+    __add__ = merge
+
+    def quantile(self, q: float) -> float:
+        if not self.weight:
+            return np.nan
+        rank = q * self.weight
+        if rank < self.zero_weight:
+            return 0.0
+        keys = np.array(sorted(self.buckets))
+        cumulative = self.zero_weight + np.cumsum([self.buckets[k] for k in keys])
+        key = keys[min(np.searchsorted(cumulative, rank), len(keys) - 1)]
+        # midpoint of the bucket (gamma^(key-1), gamma^key] in relative terms
+        return float(2 * self.gamma**key / (self.gamma + 1))
+
+
+@dataclass
+class StreamingSummary:
+    """Every accumulator a streaming run keeps for one supplier"""
+
+    cost: Welford
+    lost_units: Welford
+    cost_sketch: DDSketch
+    cost_histogram: Histogram
+
+    @classmethod
+    def empty(
+        cls, edges: ndarray, relative_accuracy: float = DDSKETCH_RELATIVE_ACCURACY
+    ) -> "StreamingSummary":
+        return cls(
+            Welford(), Welford(), DDSketch(relative_accuracy), Histogram.empty(edges)
+        )
+
+    def add(
+        self, total_cost: ndarray, lost_units: ndarray, weights: ndarray | None = None
+    ):
+        self.cost.add(total_cost, weights)
+        self.lost_units.add(lost_units, weights)
+        self.cost_sketch.add(total_cost, weights)
+        self.cost_histogram.add(total_cost, weights)
+
+    def merge(self, other: "StreamingSummary") -> "StreamingSummary":
+        return StreamingSummary(
+            self.cost + other.cost,
+            self.lost_units + other.lost_units,
+            self.cost_sketch + other.cost_sketch,
+            self.cost_histogram + other.cost_histogram,
+        )
+
+    __add__ = merge
+
+    @property
+    def trials(self) -> int:
+        return self.cost.n
+
+    def quantile(self, q: float) -> float:
+        return self.cost_sketch.quantile(q)
+
+
+def moment_edges(params: dict, order_size: int, bins: int = HISTOGRAM_BINS) -> ndarray:
+    """
+    Histogram edges fixed before any trial is drawn, from the analytic mean and
+    std; the right-skewed tail gets more room, and the rest lands in overflow.
+    """
+    total = country_moments(params, order_size)["total"]
+    return np.linspace(
+        max(total.mean - 4 * total.std, 0), total.mean + 8 * total.std, bins + 1
+    )
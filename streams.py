@@ -0,0 +1,63 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from numpy.random import Generator, SeedSequence, default_rng
+
+# Stream used by the generators when no explicit Generator is passed in. Each
+# thread has its own, so seeded tasks on a thread pool cannot draw from (or
+# reseed) each other's stream.
+_local = threading.local()
+
+
+def _default_stream() -> Generator:
+    rng = getattr(_local, "rng", None)
+    if rng is None:
+        rng = _local.rng = default_rng()
+    return rng
+
+
+def get_rng(rng: Generator | None = None) -> Generator:
+    """Returns the given Generator, or this thread's default stream"""
+    return _default_stream() if rng is None else rng
+
+
+def make_rng(seed: int | SeedSequence | None = None) -> Generator:
+    return default_rng(seed)
+
+
+def spawn_seeds(seed: int | SeedSequence | None, n: int) -> list[SeedSequence]:
+    """Splits one seed into n statistically independent child seeds"""
+    if not isinstance(seed, SeedSequence):
+        seed = SeedSequence(seed)
+    return seed.spawn(n)
+
+
+def reset_streams(seed: int | SeedSequence | None) -> Generator:
+    """
+    Reseeds this thread's default stream. numpy's legacy global state is
+    seeded from the same SeedSequence so code that still draws from
+    numpy.random directly replays as well; that state is shared by every
+    thread, so such code only replays when nothing else draws concurrently.
+    """
+    if not isinstance(seed, SeedSequence):
+        seed = SeedSequence(seed)
+    _local.rng = default_rng(seed)
+    np.random.seed(seed.generate_state(1)[0])
+    return _local.rng
+
+
+@contextmanager
+def common_random_numbers(seed: int | SeedSequence | None):
+    """
+    Every block entered with the same seed sees the same random draws, so
+    baseline, low and high scenarios differ only by their parameters.
+    The previous streams are restored on exit.
+    """
+    previous_rng = _default_stream()
+    previous_state = np.random.get_state()
+    try:
+        yield reset_streams(seed)
+    finally:
+        _local.rng = previous_rng
+        np.random.set_state(previous_state)
@@ -0,0 +1,177 @@
+"""
+Precomputed cost summaries over the whole order-size grid.
+
+Damage, defect and cancellation costs scale with the order size, while
+disruption and border losses and the per-lamp cost do not. So one set of
+draws per country is evaluated at every grid point at once. Binomial losses
+come from shared uniforms, which keeps the surface smooth across the grid.
+The app answers any slider position by interpolating the saved summaries.
+The file records a hash of its inputs (the country parameters, grid, trial
+count, seed and Fed Funds rate), and a file built from other inputs is
+ignored.
+
+Run from the repository root to rebuild the file:
+    python surface.py
+"""
+
+import os
+
+import numpy as np
+from scipy.stats import binom
+
+import config
+from cache import stable_hash
+from config import (
+    COUNTRIES,
+    ORDER_SIZE_MAX,
+    ORDER_SIZE_MIN,
+    ORDER_SIZE_STEP,
+    SURFACE_PATH,
+    SURFACE_TRIALS,
+)
+from discrete import compound_risk_batch, generate_tariff_escalation_batch, total_cost
+from engine import sample_continuous
+from params import compile_params
+from streams import make_rng, spawn_seeds
+
+ORDER_SIZES = np.arange(ORDER_SIZE_MIN, ORDER_SIZE_MAX + 1, ORDER_SIZE_STEP)
+QUANTILE_LEVELS = np.array([0.05, 0.25, 0.50, 0.75, 0.95, 0.99])
+
+
+def surface_key(
+    countries: dict = COUNTRIES,
+    order_sizes: np.ndarray = ORDER_SIZES,
+    n: int = SURFACE_TRIALS,
+    seed=0,
+    fed_funds_rate: float | None = None,
+) -> str:
+    """Hash of every input of precompute_surface (default: the configured rate)"""
+    if fed_funds_rate is None:
+        fed_funds_rate = config.FED_FUNDS_RATE
+    return stable_hash(
+        countries, np.asarray(order_sizes).tolist(), n, seed, fed_funds_rate
+    )
+
+
+def country_cost_grid(
+    params: dict, order_sizes: np.ndarray, n: int, rng: np.random.Generator
+) -> np.ndarray:
+    """(len(order_sizes), n) total cost for every grid point from one set of draws"""
+    params = compile_params(params)
+    discrete_params = params.discrete_params(int(order_sizes[0]))
+    per_lamp, yield_, currency = sample_continuous(params, n, rng)
+    escalation = generate_tariff_escalation_batch(
+        discrete_params.tariff_escalation, n, rng
+    )
+    per_lamp *= currency * (1 + params.fixed_tariff + escalation) / yield_
+
+    # independent of the order size
+    fixed_cost = (
+        compound_risk_batch(
+            discrete_params.disruption_lambda,
+            discrete_params.disruption_min,
+            discrete_params.disruption_max,
+            discrete_params.disruption_days_delayed,
+            n,
+            rng,
+        )[2]
+        + compound_risk_batch(
+            discrete_params.border_delay_lambda,
+            discrete_params.border_delay_min,
+            discrete_params.border_delay_max,
+            discrete_params.border_delay_days_delayed,
+            n,
+            rng,
+        )[2]
+    )
+
+    orders = order_sizes[:, None]
+    costs = orders * per_lamp + fixed_cost
+    for probability in (
+        discrete_params.damage_probability,
+        discrete_params.defective_probability,
+    ):
+        lost = np.maximum(binom.ppf(rng.random(n), orders, probability), 0)
+        costs += total_cost(lost, discrete_params.quality_days_delayed)
+    cancelled = rng.random(n) < discrete_params.cancellation_probability
+    costs += total_cost(orders * cancelled, discrete_params.cancellation_days_delayed)
+    return costs
+
+
+def precompute_surface(
+    countries: dict = COUNTRIES,
+    order_sizes: np.ndarray = ORDER_SIZES,
+    n: int = SURFACE_TRIALS,
+    seed=0,
+) -> dict:
+    countries_list = list(countries)
+    shape = (len(countries_list), len(order_sizes))
+    mean, std = np.empty(shape), np.empty(shape)
+    quantiles = np.empty(shape + (len(QUANTILE_LEVELS),))
+
+    for i, (country, child) in enumerate(
+        zip(countries_list, spawn_seeds(seed, len(countries_list)))
+    ):
+        costs = country_cost_grid(countries[country], order_sizes, n, make_rng(child))
+        mean[i] = costs.mean(axis=1)
+        std[i] = costs.std(axis=1)
+        quantiles[i] = np.quantile(costs, QUANTILE_LEVELS, axis=1).T
+
+    return {
+        "countries": np.array(countries_list),
+        "order_sizes": order_sizes,
+        "quantile_levels": QUANTILE_LEVELS,
+        "mean": mean,
+        "std": std,
+        "quantiles": quantiles,
+        "key": np.array(surface_key(countries, order_sizes, n, seed)),
+    }
+
+
+def save_surface(surface: dict, path=SURFACE_PATH):
+    np.savez_compressed(path, **surface)
+
+
+# path -> (file mtime and size, surface); a rewritten file is loaded again
+_loaded = {}
+
+
+def load_surface(path=SURFACE_PATH, key: str | None = None) -> dict | None:
+    """
+    The saved surface, or None if it has not been precomputed yet or, given
+    `key` (see surface_key), was computed from other inputs
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _loaded.get(str(path))
+    if cached is None or cached[0] != version:
+        with np.load(path) as saved:
+            cached = (version, {name: saved[name] for name in saved.files})
+        _loaded[str(path)] = cached
+    surface = cached[1]
+    if key is not None and ("key" not in surface or surface["key"].item() != key):
+        return None
+    return surface
+
+
+def lookup(surface: dict, country: str, order_size: float) -> dict:
+    """Cost summaries for any order size, linearly interpolated on the grid"""
+    i = list(surface["countries"]).index(country)
+    grid = surface["order_sizes"]
+    summary = {
+        "mean": np.interp(order_size, grid, surface["mean"][i]),
+        "std": np.interp(order_size, grid, surface["std"][i]),
+    }
+    for j, level in enumerate(surface["quantile_levels"]):
+        summary[f"p{round(level * 100)}"] = np.interp(
+            order_size, grid, surface["quantiles"][i, :, j]
+        )
+    return summary
+
+
+if __name__ == "__main__":
+    save_surface(precompute_surface())
+    print(f"Saved order-size surface to {SURFACE_PATH}")
@@ -0,0 +1,28 @@
+import pytest
+
+import config
+from analytic import country_moments
+from config import COUNTRIES
+from engine import simulate_country
+from streams import make_rng
+
+ORDER_SIZE = 8_000
+
+
+@pytest.mark.parametrize("country", list(COUNTRIES))
+def test_moments_match_simulation(country):
+    params = COUNTRIES[country]
+    expected = country_moments(params, ORDER_SIZE)["total"]
+    costs = simulate_country(params, ORDER_SIZE, 400_000, make_rng(0))["total_cost"]
+    # well inside the Monte Carlo error at 400k trials
+    assert costs.mean() == pytest.approx(expected.mean, rel=0.002)
+    assert costs.std() == pytest.approx(expected.std, rel=0.02)
+
+
+def test_explicit_rate_matches_the_configured_rate():
+    params = COUNTRIES["China"]
+    assert country_moments(params, ORDER_SIZE, config.FED_FUNDS_RATE)[
+        "total"
+    ].mean == pytest.approx(country_moments(params, ORDER_SIZE)["total"].mean)
+    higher = country_moments(params, ORDER_SIZE, config.FED_FUNDS_RATE + 1)
+    assert higher["total"].mean > country_moments(params, ORDER_SIZE)["total"].mean
@@ -0,0 +1,39 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from batch import run_grid, validate_overrides
+from config import COUNTRIES
+
+
+def test_mixed_int_and_float_overrides_share_a_float_column(tmp_path):
+    output = tmp_path / "scenarios.parquet"
+    written = run_grid(
+        str(output),
+        overrides={"US.raw.mean": [38, 42.5]},
+        risk_tolerances=[0.0, 5.0],
+        n=2_000,
+        kind="serial",
+    )
+    table = pq.read_table(output)
+    assert written == table.num_rows == 4
+    assert table.schema.field("override:US.raw.mean").type == pa.float64()
+    assert sorted(set(table["override:US.raw.mean"].to_pylist())) == [38.0, 42.5]
+
+
+def test_overrides_for_unselected_countries_are_rejected():
+    countries = {country: COUNTRIES[country] for country in ("US", "Mexico")}
+    with pytest.raises(ValueError, match="not among the selected countries"):
+        validate_overrides(countries, {"China.tariff.fixed": [0.25]})
+
+
+def test_unknown_override_paths_are_rejected():
+    with pytest.raises(ValueError, match="not a parameter"):
+        validate_overrides(COUNTRIES, {"US.raw.meen": [1]})
+
+
+@pytest.mark.parametrize("path", ["US.raw", "US"])
+def test_overrides_of_parameter_groups_are_rejected(path):
+    with pytest.raises(ValueError, match="group of parameters") as error:
+        validate_overrides(COUNTRIES, {path: [1]})
+    assert f"{path}." in str(error.value)
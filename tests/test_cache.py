@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+import cache
+from cache import TTLCache, memoize, stable_hash
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    entries = TTLCache(ttl=10)
+    entries.put("a", 1)
+    now[0] += 10
+    assert entries.get("a") == 1
+    now[0] += 0.5
+    assert entries.get("a") is None
+    assert len(entries) == 0
+
+
+def test_least_recently_used_entry_is_dropped():
+    entries = TTLCache(max_entries=2)
+    entries.put("a", 1)
+    entries.put("b", 2)
+    assert entries.get("a") == 1
+    entries.put("c", 3)
+    assert entries.get("b") is None
+    assert entries.get("a") == 1 and entries.get("c") == 3
+
+
+def test_stable_hash_ignores_dict_order():
+    assert stable_hash({"a": 1, "b": {"c": 2, "d": 3}}) == stable_hash(
+        {"b": {"d": 3, "c": 2}, "a": 1}
+    )
+    assert stable_hash([1, 2]) != stable_hash([2, 1])
+    assert stable_hash("a", "b") != stable_hash("ab")
+
+
+def test_stable_hash_hashes_array_contents():
+    values = np.arange(5.0)
+    assert stable_hash(values) == stable_hash(values.copy())
+    assert stable_hash(values) == stable_hash(values.tolist())
+    changed = values.copy()
+    changed[-1] = 0
+    assert stable_hash(values) != stable_hash(changed)
+    assert stable_hash({"x": np.float64(1.5)}) == stable_hash({"x": 1.5})
+
+
+def test_memoize_keys_on_the_chosen_arguments():
+    calls = []
+
+    @memoize(key=lambda n, callback=None: n)
+    def square(n, callback=None):
+        calls.append(n)
+        return n * n
+
+    assert square(3) == 9
+    assert square(3, callback=print) == 9
+    assert square(4) == 16
+    assert calls == [3, 4]
+    square.cache.clear()
+    square(3)
+    assert calls == [3, 4, 3]
+
+
+def test_memoize_is_per_function():
+    @memoize(key=lambda n: n)
+    def double(n):
+        return 2 * n
+
+    @memoize(key=lambda n: n)
+    def triple(n):
+        return 3 * n
+
+    assert (double(2), triple(2)) == (4, 6)
+
+
+@pytest.mark.parametrize("ttl", [None, 60])
+def test_memoize_respects_max_entries(ttl):
+    calls = []
+
+    @memoize(key=lambda n: n, max_entries=1, ttl=ttl)
+    def identity(n):
+        calls.append(n)
+        return n
+
+    identity(1), identity(2), identity(1)
+    assert calls == [1, 2, 1]
@@ -0,0 +1,234 @@
+import numpy as np
+import pytest
+
+import discrete
+from config import COUNTRIES
+from discrete import (
+    RISK_COMPONENTS,
+    TARIFF_ESCALATION_LEVELS,
+    DiscreteRiskBatch,
+    ImportanceSampling,
+    compound_risk_batch,
+    simulate_discrete_risks,
+    total_cost,
+)
+from params import compile_params
+from streams import make_rng
+
+REFERENCE_TRIALS = 4_000
+BATCH_TRIALS = 200_000
+
+
+def assert_same_mean(a: np.ndarray, b: np.ndarray):
+    """Two-sample z-test, far outside chance at the fixed seeds"""
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    stderr = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    assert abs(a.mean() - b.mean()) <= 5 * stderr + 1e-12
+
+
+def reference_compound(event_lambda, min_impact, max_impact, days_delayed, n, rng):
+    """The original per-trial loop: a Poisson count, then one uniform per event"""
+    lost, cost = np.zeros(n), np.zeros(n)
+    for i in range(n):
+        events = rng.poisson(event_lambda)
+        if events:
+            lost[i] = int(sum(rng.uniform(min_impact, max_impact, size=events)))
+            cost[i] = total_cost(lost[i], days_delayed)
+    return lost, cost
+
+
+def reference_units(order_size, probability, days_delayed, n, rng):
+    """Per trial, every unit of the order is damaged (or defective) on its own"""
+    lost, cost = np.zeros(n), np.zeros(n)
+    for i in range(n):
+        lost[i] = np.count_nonzero(rng.random(order_size) < probability)
+        cost[i] = total_cost(lost[i], days_delayed)
+    return lost, cost
+
+
+def reference_cancellation(probability, order_size, days_delayed, n, rng):
+    """Per trial, the whole order is cancelled or it is not"""
+    lost, cost = np.zeros(n), np.zeros(n)
+    for i in range(n):
+        lost[i] = order_size if rng.random() < probability else 0
+        # the carry cost is paid either way, as in the original model
+        cost[i] = total_cost(lost[i], days_delayed)
+    return lost, cost
+
+
+# (batch generator, its arguments before n and rng, per-trial reference)
+GENERATORS = {
+    "disruption": (
+        discrete.generate_disruption_risk_batch,
+        (2.0, 100, 1_000, 30),
+        reference_compound,
+    ),
+    "border_delay": (
+        discrete.generate_border_delay_risk_batch,
+        (0.5, 50, 400, 10),
+        reference_compound,
+    ),
+    "damaged": (
+        discrete.generate_damaged_risk_batch,
+        (8_000, 0.015, 5),
+        reference_units,
+    ),
+    "defective": (
+        discrete.generate_defective_risk_batch,
+        (8_000, 0.02, 5),
+        reference_units,
+    ),
+    "cancellation": (
+        discrete.generate_last_minute_cancellation_risk_batch,
+        (0.1, 8_000, 60),
+        reference_cancellation,
+    ),
+}
+
+
+@pytest.mark.parametrize("name", list(GENERATORS))
+def test_batch_agrees_with_per_trial_reference(name):
+    batch, args, reference = GENERATORS[name]
+    expected_lost, expected_cost = reference(*args, REFERENCE_TRIALS, make_rng(0))
+    lost, cost = batch(*args, BATCH_TRIALS, make_rng(1))
+    assert len(lost) == len(cost) == BATCH_TRIALS
+    assert_same_mean(expected_lost, lost)
+    assert_same_mean(expected_cost, cost)
+    assert_same_mean(expected_lost == 0, lost == 0)
+
+
+def test_compound_draw_matches_the_per_trial_loop():
+    args = (2.0, 100, 1_000, 30)
+    lost, cost = reference_compound(*args, REFERENCE_TRIALS, make_rng(0))
+    events, batch_lost, batch_cost = compound_risk_batch(
+        *args, BATCH_TRIALS, make_rng(1)
+    )
+    assert_same_mean(lost, batch_lost)
+    assert_same_mean(cost, batch_cost)
+    assert_same_mean(lost == 0, batch_lost == 0)
+    # one severity per event, not one per trial scaled by the count
+    assert batch_lost.var() == pytest.approx(lost.var(), rel=0.1)
+    # no events, no cost; every event loses at least min_impact units
+    assert np.all(batch_cost[events == 0] == 0)
+    assert np.all(batch_lost >= 100 * events)
+
+
+def test_tariff_escalation_levels_agree_with_per_trial_reference():
+    rng = make_rng(0)
+    reference = np.array(
+        [
+            rng.choice(TARIFF_ESCALATION_LEVELS) if rng.random() < 0.3 else 0.0
+            for _ in range(REFERENCE_TRIALS)
+        ]
+    )
+    batch = discrete.generate_tariff_escalation_batch(0.3, BATCH_TRIALS, make_rng(1))
+    for level in [0.0] + TARIFF_ESCALATION_LEVELS:
+        assert_same_mean(reference == level, batch == level)
+    assert batch.mean() == pytest.approx(
+        0.3 * np.mean(TARIFF_ESCALATION_LEVELS), rel=0.02
+    )
+
+
+def replay_generators(params, n: int, rng) -> list[tuple[np.ndarray, np.ndarray]]:
+    """The per-risk batch generators, in simulate_discrete_risks' draw order"""
+    return [
+        discrete.generate_disruption_risk_batch(
+            params.disruption_lambda,
+            params.disruption_min,
+            params.disruption_max,
+            params.disruption_days_delayed,
+            n,
+            rng,
+        ),
+        discrete.generate_border_delay_risk_batch(
+            params.border_delay_lambda,
+            params.border_delay_min,
+            params.border_delay_max,
+            params.border_delay_days_delayed,
+            n,
+            rng,
+        ),
+        discrete.generate_damaged_risk_batch(
+            params.order_size,
+            params.damage_probability,
+            params.quality_days_delayed,
+            n,
+            rng,
+        ),
+        discrete.generate_defective_risk_batch(
+            params.order_size,
+            params.defective_probability,
+            params.quality_days_delayed,
+            n,
+            rng,
+        ),
+        discrete.generate_last_minute_cancellation_risk_batch(
+            params.cancellation_probability,
+            params.order_size,
+            params.cancellation_days_delayed,
+            n,
+            rng,
+        ),
+    ]
+
+
+@pytest.mark.parametrize("country", list(COUNTRIES))
+def test_batch_rows_match_the_per_risk_generators(country):
+    params = compile_params(COUNTRIES[country]).discrete_params(8_000)
+    batch = simulate_discrete_risks(params, 20_000, make_rng(0))
+    rows = replay_generators(params, 20_000, make_rng(0))
+    assert batch.lost_units.shape == batch.cost.shape == (len(RISK_COMPONENTS), 20_000)
+    for component, (lost, cost) in zip(RISK_COMPONENTS, rows):
+        np.testing.assert_array_equal(batch.component_lost_units(component), lost)
+        np.testing.assert_array_equal(batch.component_cost(component), cost)
+    np.testing.assert_array_equal(
+        batch.total_lost_units, np.sum([lost for lost, _ in rows], axis=0)
+    )
+    np.testing.assert_allclose(
+        batch.total_cost, np.sum([cost for _, cost in rows], axis=0), rtol=1e-12
+    )
+    # each component is a contiguous view of the batch, not a copy
+    for i in range(len(RISK_COMPONENTS)):
+        assert batch.cost[i].flags.c_contiguous and batch.cost[i].base is batch.cost
+
+
+def test_cost_breakdown_is_the_mean_of_each_row():
+    params = compile_params(COUNTRIES["China"]).discrete_params(8_000)
+    batch = simulate_discrete_risks(params, 20_000, make_rng(0))
+    assert batch.weights is None
+    breakdown = batch.cost_breakdown()
+    assert list(breakdown) == list(RISK_COMPONENTS)
+    for i, component in enumerate(RISK_COMPONENTS):
+        assert breakdown[component] == pytest.approx(batch.cost[i].mean(), rel=1e-12)
+    assert sum(breakdown.values()) == pytest.approx(batch.total_cost.mean())
+
+
+def test_weighted_cost_breakdown():
+    params = compile_params(COUNTRIES["US"]).discrete_params(8_000)
+    batch = simulate_discrete_risks(
+        params, 200_000, make_rng(0), importance=ImportanceSampling()
+    )
+    weights = batch.weights
+    assert weights.shape == (batch.n,) and np.all(weights > 0)
+    breakdown = batch.cost_breakdown()
+    for i, component in enumerate(RISK_COMPONENTS):
+        assert breakdown[component] == pytest.approx(
+            np.average(batch.cost[i], weights=weights), rel=1e-9
+        )
+    # the weights undo the oversampling: compare with a plain run
+    plain = simulate_discrete_risks(params, 200_000, make_rng(1)).cost_breakdown()
+    assert breakdown["damage"] == pytest.approx(plain["damage"], rel=0.02)
+
+
+def test_single_precision_batch_totals_accumulate_in_64_bits():
+    batch = DiscreteRiskBatch.empty(3, precision="single")
+    assert batch.cost.dtype == np.float32 and batch.lost_units.dtype == np.int32
+    # float32 would round 2**24 + 1 back down to 2**24, and int32 overflow
+    batch.cost[:] = 1.0
+    batch.cost[0] = 2**24
+    batch.lost_units[:] = 2**30
+    assert batch.total_cost.dtype == np.float64
+    np.testing.assert_array_equal(batch.total_cost, 2**24 + len(RISK_COMPONENTS) - 1)
+    np.testing.assert_array_equal(batch.total_lost_units, len(RISK_COMPONENTS) * 2**30)
+    with pytest.raises(ValueError, match="Unknown precision"):
+        DiscreteRiskBatch.empty(3, precision="half")
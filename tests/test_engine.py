@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from analytic import country_moments
+from config import COUNTRIES
+from discrete import ImportanceSampling
+from engine import (
+    SAMPLING_STRATEGIES,
+    quantile_rel_halfwidth,
+    run_monte_carlo_adaptive,
+    simulate_suppliers,
+)
+from metrics import weighted_mean
+from streams import make_rng
+
+ORDER_SIZE = 8_000
+
+
+def test_plain_joint_run_has_no_weights():
+    joint = simulate_suppliers(COUNTRIES, ORDER_SIZE, 1_000, make_rng(0))
+    assert joint["weights"] is None
+
+
+def test_importance_weighted_joint_means_match_analytic():
+    joint = simulate_suppliers(
+        COUNTRIES, ORDER_SIZE, 200_000, make_rng(0), importance=ImportanceSampling()
+    )
+    weights = joint["weights"]
+    assert weights.shape == (200_000,) and np.all(weights > 0)
+    for supplier, costs in zip(joint["suppliers"], joint["total_cost"].T):
+        expected = country_moments(COUNTRIES[supplier], ORDER_SIZE)["total"].mean
+        assert weighted_mean(costs, weights) == pytest.approx(
+            expected, rel=0.01
+        ), supplier
+
+
+@pytest.mark.parametrize("sampling", SAMPLING_STRATEGIES)
+def test_sampled_joint_means_match_analytic(sampling):
+    joint = simulate_suppliers(
+        COUNTRIES, ORDER_SIZE, 100_000, make_rng(0), sampling=sampling
+    )
+    for supplier, costs in zip(joint["suppliers"], joint["total_cost"].T):
+        expected = country_moments(COUNTRIES[supplier], ORDER_SIZE)["total"].mean
+        assert costs.mean() == pytest.approx(expected, rel=0.005), supplier
+
+
+def test_importance_needs_plain_sampling():
+    with pytest.raises(ValueError, match="plain sampling"):
+        simulate_suppliers(
+            COUNTRIES,
+            ORDER_SIZE,
+            100,
+            importance=ImportanceSampling(),
+            sampling="lhs",
+        )
+
+
+def test_adaptive_budget_goes_to_the_high_variance_supplier():
+    runs = {
+        country: run_monte_carlo_adaptive(country, params, ORDER_SIZE, seed=0)
+        for country, params in COUNTRIES.items()
+    }
+    assert all(run["converged"] for run in runs.values())
+    assert runs["US"]["trials"] < runs["China"]["trials"]
+    for run in runs.values():
+        costs = run["total_cost"]
+        assert len(costs) == len(run["lost_units"]) == run["trials"]
+        # the running standard error matches the one of the stored trials
+        assert run["stderr"] == pytest.approx(
+            costs.std(ddof=1) / np.sqrt(len(costs)), rel=1e-9
+        )
+        assert run["stderr"] <= 0.001 * costs.mean()
+
+
+def test_adaptive_quantile_target_is_met():
+    run = run_monte_carlo_adaptive(
+        "US",
+        COUNTRIES["US"],
+        ORDER_SIZE,
+        quantile=0.95,
+        quantile_rel_precision=0.002,
+        seed=0,
+    )
+    assert run["converged"]
+    assert quantile_rel_halfwidth(np.sort(run["total_cost"]), 0.95) <= 0.002
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from discrete import generate_damaged_risk_batch
+from executor import EXECUTOR_KINDS, get_executor, map_seeded, run_countries
+from streams import common_random_numbers, get_rng
+
+
+def damaged_units(calls: int) -> np.ndarray:
+    # draws from the default stream, as the generators do without an rng
+    return np.concatenate(
+        [generate_damaged_risk_batch(8_000, 0.015, 5, 100)[0] for _ in range(calls)]
+    )
+
+
+@pytest.mark.parametrize("common", [False, True])
+def test_seeded_map_is_identical_on_every_executor(common):
+    tasks = [(200,)] * 16
+    results = {
+        kind: map_seeded(damaged_units, tasks, seed=3, kind=kind, common=common)
+        for kind in EXECUTOR_KINDS
+    }
+    for kind in ("thread", "process"):
+        for serial, other in zip(results["serial"], results[kind]):
+            np.testing.assert_array_equal(serial, other)
+
+
+def test_common_random_numbers_restores_the_default_stream():
+    before = get_rng()
+    with common_random_numbers(0) as rng:
+        assert get_rng() is rng
+    assert get_rng() is before
+
+
+def test_run_countries_rejects_the_thread_executor():
+    with pytest.raises(ValueError):
+        run_countries({}, 8_000, seed=0, kind="thread")
+
+
+def test_process_workers_are_spawned_not_forked():
+    # a forked child would inherit the parent's threads' locks mid-use
+    assert get_executor("process")._mp_context.get_start_method() == "spawn"
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from histogram import Histogram, bin_countries, shared_edges
+from streams import make_rng
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def costs() -> dict[str, np.ndarray]:
+    rng = make_rng(0)
+    return {
+        "US": rng.normal(1_000, 50, 40_000),
+        "China": rng.lognormal(6.8, 0.3, 60_000),
+    }
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_merged_chunks_equal_one_histogram(weighted):
+    x = costs()["China"]
+    weights = make_rng(1).uniform(0.5, 2.0, len(x)) if weighted else None
+    # edges inside the data, so both under- and overflow get mass
+    edges = np.linspace(np.quantile(x, 0.02), np.quantile(x, 0.97), 51)
+    one_shot = Histogram.from_samples(x, edges, weights)
+
+    merged = Histogram.empty(edges)
+    for part in np.array_split(np.arange(len(x)), 9):
+        merged = merged + Histogram.from_samples(
+            x[part], edges, None if weights is None else weights[part]
+        )
+    np.testing.assert_allclose(merged.counts, one_shot.counts)
+    for field in ("underflow", "overflow", "total", "weighted_sum"):
+        assert getattr(merged, field) == pytest.approx(getattr(one_shot, field))
+    assert (merged.min, merged.max) == (x.min(), x.max())
+    assert merged.underflow > 0 and merged.overflow > 0
+    expected_mean = np.average(x, weights=weights)
+    assert merged.mean == pytest.approx(expected_mean, rel=1e-12)
+
+
+def test_histograms_on_different_edges_do_not_merge():
+    with pytest.raises(ValueError, match="same bin edges"):
+        Histogram.empty(np.linspace(0, 1, 11)) + Histogram.empty(np.linspace(0, 2, 11))
+
+
+def test_shared_edges_span_every_country():
+    samples = costs()
+    edges = shared_edges(samples, bins=100)
+    assert len(edges) == 101
+    assert edges[0] == min(x.min() for x in samples.values())
+    assert edges[-1] == max(x.max() for x in samples.values())
+    # constant samples still get a bin of positive width
+    assert np.all(np.diff(shared_edges({"a": np.full(5, 3.0)}, bins=4)) > 0)
+
+
+def test_quantiles_land_within_one_bin():
+    samples = costs()
+    histograms = bin_countries(samples, bins=200)
+    width = np.diff(next(iter(histograms.values())).edges)[0]
+    for country, x in samples.items():
+        histogram = histograms[country]
+        assert histogram.underflow == histogram.overflow == 0
+        assert histogram.total == len(x)
+        for q in QUANTILES:
+            assert abs(histogram.quantile(q) - np.quantile(x, q)) <= width, (
+                country,
+                q,
+            )
+        summary = histogram.summary()
+        assert summary["mean"] == pytest.approx(x.mean(), rel=1e-12)
+        assert abs(summary["p50"] - np.median(x)) <= width
+
+
+def test_weighted_quantiles_land_within_one_bin():
+    x = costs()["China"]
+    weights = make_rng(2).uniform(0.5, 2.0, len(x))
+    histogram = bin_countries({"China": x}, {"China": weights}, bins=200)["China"]
+    width = np.diff(histogram.edges)[0]
+    for q in QUANTILES:
+        exact = np.quantile(x, q, weights=weights, method="inverted_cdf")
+        assert abs(histogram.quantile(q) - exact) <= width, q
+
+
+def test_empty_histogram_has_no_quantiles():
+    histogram = Histogram.empty(np.linspace(0, 1, 11))
+    assert np.isnan(histogram.quantile(0.5)) and np.isnan(histogram.mean)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from config import COUNTRIES
+from engine import simulate_country
+from kernels import kernel_backend, simulate_costs
+from streams import make_rng
+
+ORDER_SIZE = 8_000
+TRIALS = 20_000
+
+
+def assert_kernel_reproduces_simulate_country(kernel: str, precision: str):
+    for seed, params in enumerate(COUNTRIES.values()):
+        expected = simulate_country(
+            params, ORDER_SIZE, TRIALS, make_rng(seed), precision=precision
+        )
+        # a single chunk consumes the draws in simulate_country's order
+        fused = simulate_costs(
+            params,
+            ORDER_SIZE,
+            TRIALS,
+            make_rng(seed),
+            chunk_size=TRIALS,
+            kernel=kernel,
+            precision=precision,
+        )
+        assert fused["total_cost"].dtype == expected["total_cost"].dtype
+        np.testing.assert_array_equal(fused["total_cost"], expected["total_cost"])
+        np.testing.assert_array_equal(fused["lost_units"], expected["lost_units"])
+        assert fused["weights"] is None
+
+
+@pytest.mark.parametrize("precision", ["double", "single"])
+def test_numpy_kernel_reproduces_simulate_country(precision):
+    assert_kernel_reproduces_simulate_country("numpy", precision)
+
+
+@pytest.mark.parametrize("precision", ["double", "single"])
+def test_numba_kernel_reproduces_simulate_country(precision):
+    pytest.importorskip("numba")
+    assert kernel_backend("numba") == "numba"
+    assert_kernel_reproduces_simulate_country("numba", precision)
+
+
+def test_unknown_kernel_is_rejected():
+    with pytest.raises(ValueError, match="Unknown cost kernel"):
+        kernel_backend("cuda")
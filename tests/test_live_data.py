@@ -0,0 +1,197 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+
+import live_data
+from benchmarks.fred_stand_in import FED_FUNDS_RATE, fred_stand_in
+
+
+@pytest.fixture
+def fred(monkeypatch, tmp_path):
+    """A local FRED stand-in and an empty cache; yields the logged queries"""
+    queries = []
+    monkeypatch.setattr(live_data, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(live_data, "api_key", "test")
+    with fred_stand_in(queries) as endpoint:
+        monkeypatch.setattr(live_data, "url", endpoint)
+        yield queries
+
+
+@pytest.fixture
+def fred_down(monkeypatch, tmp_path):
+    """A FRED stand-in that fails every request; yields the logged queries"""
+    queries = []
+    monkeypatch.setattr(live_data, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(live_data, "api_key", "test")
+    with fred_stand_in(queries, status=503) as endpoint:
+        monkeypatch.setattr(live_data, "url", endpoint)
+        yield queries
+
+
+def write_stale_observation(value: str):
+    live_data.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    live_data._cache_path("FEDFUNDS").write_text(
+        json.dumps(
+            {
+                "fetched_at": time.time() - 2 * live_data.CACHE_MAX_AGE_SECONDS,
+                "observation": {"date": "2024-01-01", "value": value},
+            }
+        )
+    )
+
+
+def test_fresh_cached_rate_makes_no_request(fred):
+    live_data.write_cached_observation(
+        "FEDFUNDS", {"date": "2026-01-01", "value": "4.0"}
+    )
+    assert live_data.get_most_recent_fed_funds_rate() == 4.0
+    assert fred == []
+
+
+def test_stale_cached_rate_is_refetched(fred):
+    write_stale_observation("4.0")
+    assert live_data.get_most_recent_fed_funds_rate() == FED_FUNDS_RATE
+    # only the newest observation is requested
+    assert len(fred) == 1
+    assert fred[0]["series_id"] == "FEDFUNDS"
+    assert fred[0]["sort_order"] == "desc" and fred[0]["limit"] == "1"
+    # and the refreshed observation is cached
+    cached = live_data.read_cached_observation(
+        "FEDFUNDS", live_data.CACHE_MAX_AGE_SECONDS
+    )
+    assert float(cached["value"]) == FED_FUNDS_RATE
+    assert cached["date"] == pd.Timestamp.today().strftime("%Y-%m-01")
+
+
+def test_failed_fetch_falls_back_to_the_stale_cache(fred_down):
+    write_stale_observation("4.0")
+    assert live_data.get_most_recent_fed_funds_rate() == 4.0
+    assert len(fred_down) == 1
+
+
+def test_failed_fetch_without_cache_falls_back_to_the_default(fred_down):
+    rate = live_data.get_most_recent_fed_funds_rate()
+    assert rate == live_data.DEFAULT_FED_FUNDS_RATE
+    assert len(fred_down) == 1
+
+
+def test_no_api_key_makes_no_request(fred, monkeypatch):
+    monkeypatch.setattr(live_data, "api_key", None)
+    assert (
+        live_data.get_most_recent_fed_funds_rate() == live_data.DEFAULT_FED_FUNDS_RATE
+    )
+    assert fred == []
+
+
+def test_peek_does_not_wait_for_resolution(monkeypatch, tmp_path):
+    monkeypatch.setattr(live_data, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(live_data, "_fed_funds_rate", None)
+    with live_data._fed_funds_lock:  # resolution in flight on another thread
+        assert live_data.peek_fed_funds_rate() == live_data.DEFAULT_FED_FUNDS_RATE
+        live_data.write_cached_observation(
+            "FEDFUNDS", {"date": "2026-01-01", "value": "4.33"}
+        )
+        assert live_data.peek_fed_funds_rate() == 4.33
+
+
+def test_peek_returns_the_resolved_rate(monkeypatch):
+    monkeypatch.setattr(live_data, "_fed_funds_rate", 3.0)
+    assert live_data.peek_fed_funds_rate() == 3.0
+
+
+def test_series_without_api_key_are_empty_frames(monkeypatch, tmp_path):
+    monkeypatch.setattr(live_data, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(live_data, "api_key", None)
+    frames = live_data.get_series({"DGS10": 12, "CPIAUCSL": 24})
+    assert list(frames) == ["DGS10", "CPIAUCSL"]
+    for frame in frames.values():
+        assert list(frame.columns) == ["date", "value"] and frame.empty
+
+
+def test_series_without_api_key_use_the_cached_window(monkeypatch, tmp_path):
+    monkeypatch.setattr(live_data, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(live_data, "api_key", None)
+    today = pd.Timestamp.today().normalize()
+    live_data.write_cached_series(
+        "DGS10",
+        pd.DataFrame(
+            {"date": [today - pd.DateOffset(months=24), today], "value": [4.0, 4.2]}
+        ),
+    )
+    frame = live_data.get_series({"DGS10": 12})["DGS10"]
+    assert frame["value"].tolist() == [4.2]
+
+
+def window_start(months: int) -> pd.Timestamp:
+    return pd.Timestamp.today().normalize() - pd.DateOffset(months=months)
+
+
+def test_refresh_fetches_the_window_once(fred):
+    frame = live_data.refresh_series("DEXMXUS", 12)
+    assert len(fred) == 1
+    # from a month before the window, so the cache marks the window covered
+    assert fred[0]["observation_start"] == (
+        window_start(12) - pd.DateOffset(months=1)
+    ).strftime("%Y-%m-%d")
+    assert frame["date"].min() >= window_start(12)
+    assert frame["date"].is_monotonic_increasing and frame["date"].is_unique
+    # a young cache answers without a request
+    pd.testing.assert_frame_equal(live_data.refresh_series("DEXMXUS", 12), frame)
+    assert len(fred) == 1
+
+
+def test_refresh_after_max_age_requests_only_newer_observations(fred, monkeypatch):
+    first = live_data.refresh_series("DEXMXUS", 12)
+    monkeypatch.setattr(live_data, "CACHE_MAX_AGE_SECONDS", 0)
+    second = live_data.refresh_series("DEXMXUS", 12)
+    assert len(fred) == 2
+    assert fred[1]["observation_start"] == (
+        first["date"].max() + pd.Timedelta(days=1)
+    ).strftime("%Y-%m-%d")
+    pd.testing.assert_frame_equal(second, first)
+
+
+def test_refresh_backfills_a_longer_window(fred):
+    live_data.refresh_series("DEXMXUS", 12)
+    frame = live_data.refresh_series("DEXMXUS", 24)
+    assert len(fred) == 2
+    assert fred[1]["observation_start"] == (
+        window_start(24) - pd.DateOffset(months=1)
+    ).strftime("%Y-%m-%d")
+    assert frame["date"].min() < window_start(12)
+    assert frame["date"].min() >= window_start(24)
+    assert frame["date"].is_unique
+
+
+def test_refresh_dedups_and_trims_to_the_window(fred, monkeypatch):
+    today = pd.Timestamp.today().normalize()
+    old, anchor = today - pd.DateOffset(months=30), window_start(13)
+    overlap = today.replace(day=1)
+    live_data.write_cached_series(
+        "DEXMXUS",
+        pd.DataFrame(
+            {
+                "date": [old, anchor, window_start(12), overlap],
+                "value": [1.0, 1.0, 2.0, 3.0],
+            }
+        ),
+    )
+    monkeypatch.setattr(live_data, "CACHE_MAX_AGE_SECONDS", 0)
+    frame = live_data.refresh_series("DEXMXUS", 12)
+    assert frame["date"].is_unique and frame["date"].min() >= window_start(12)
+    # only the last observation before the window stays cached
+    dates = set(live_data.read_cached_series("DEXMXUS")["date"])
+    assert anchor in dates and old not in dates
+
+
+def test_refresh_falls_back_to_the_cache_on_fetch_error(fred_down, monkeypatch):
+    cached = pd.DataFrame(
+        {"date": [window_start(13), window_start(6)], "value": [1.0, 2.0]}
+    )
+    live_data.write_cached_series("DEXMXUS", cached)
+    monkeypatch.setattr(live_data, "CACHE_MAX_AGE_SECONDS", 0)
+    frame = live_data.refresh_series("DEXMXUS", 12)
+    assert len(fred_down) == 1
+    assert frame["value"].tolist() == [2.0]
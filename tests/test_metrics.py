@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from config import COUNTRIES
+from discrete import ImportanceSampling
+from engine import simulate_country
+from metrics import exceedance_probability
+from streams import make_rng
+
+ORDER_SIZE = 8_000
+
+
+def test_exceedance_probability_counts_trials_above_the_threshold():
+    x = np.array([1.0, 2.0, 3.0, 4.0])
+    assert exceedance_probability(x, 2.0) == 0.5
+    assert exceedance_probability(x, 0.0) == 1.0
+    assert exceedance_probability(x, 4.0) == 0.0
+    # weights are self-normalized
+    weights = np.array([1.0, 1.0, 1.0, 3.0])
+    assert exceedance_probability(x, 2.0, weights) == pytest.approx(4 / 6)
+    assert exceedance_probability(x, 2.0, 10 * weights) == pytest.approx(4 / 6)
+
+
+def test_weighted_tail_probability_matches_a_plain_run():
+    params = COUNTRIES["US"]
+    plain = simulate_country(params, ORDER_SIZE, 400_000, make_rng(0))["total_cost"]
+    weighted = simulate_country(
+        params, ORDER_SIZE, 400_000, make_rng(1), importance=ImportanceSampling()
+    )
+    # a threshold in the tail that only rare discrete shocks reach
+    threshold = np.quantile(plain, 0.99)
+    expected = exceedance_probability(plain, threshold)
+    estimate = exceedance_probability(
+        weighted["total_cost"], threshold, weighted["weights"]
+    )
+    stderr = np.sqrt(expected * (1 - expected) / len(plain))
+    assert abs(estimate - expected) <= 5 * stderr
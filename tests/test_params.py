@@ -0,0 +1,63 @@
+import copy
+
+import numpy as np
+import pytest
+
+from config import COUNTRIES
+from params import CountryParams, DriverSpec, compile_params
+
+
+@pytest.mark.parametrize(
+    "spec, message",
+    [
+        ({"dist": "cauchy", "loc": 0}, "unknown distribution"),
+        ({"dist": "normal", "mean": 1.0}, "missing std"),
+        ({"dist": "normal", "mean": 1.0, "std": -0.1}, "non-negative"),
+        ({"dist": "normal", "mean": np.nan, "std": 1.0}, "finite"),
+        ({"dist": "lognormal", "mean": 0.0, "std": 1.0}, "mean must be positive"),
+        ({"dist": "gamma", "shape": 2.0, "scale": 0.0}, "positive"),
+        ({"dist": "triangular", "min": 3.0, "mode": 1.0, "max": 5.0}, "min <= mode"),
+        ({"dist": "triangular", "min": 1.0, "mode": 1.0, "max": 1.0}, "min <= mode"),
+        ({"dist": "beta", "a": 2.0, "b": -1.0}, "positive"),
+    ],
+)
+def test_invalid_driver_spec_is_rejected(spec, message):
+    with pytest.raises(ValueError, match=message) as error:
+        DriverSpec(spec, "labor")
+    assert str(error.value).startswith("labor:")
+
+
+def test_log_params_lognormal_may_have_a_negative_mean():
+    spec = DriverSpec({"dist": "lognormal", "mean": -1.0, "std": 0.5, "log_params": 1})
+    assert spec.args == (-1.0, 0.5)
+
+
+def test_override_leaves_the_original_unchanged():
+    source = copy.deepcopy(COUNTRIES["China"])
+    snapshot = copy.deepcopy(source)
+    original = compile_params(source)
+    raw_mean = original.get(("raw", "mean"))
+
+    updated = original.override(("raw", "mean"), raw_mean * 2)
+    assert isinstance(updated, CountryParams) and updated is not original
+    assert updated.get(("raw", "mean")) == raw_mean * 2
+    assert original.get(("raw", "mean")) == raw_mean
+    assert source == snapshot
+    # only the dicts on the path are copied
+    assert updated.source["labor"] is source["labor"]
+    assert updated.source["raw"] is not source["raw"]
+
+    probability = original.override(("damage_probability",), 0.5)
+    assert probability.discrete.damage_probability == 0.5
+    assert original.discrete.damage_probability == source["damage_probability"]
+    assert source == snapshot
+
+
+def test_invalid_override_is_rejected_and_leaves_the_original_unchanged():
+    original = compile_params(copy.deepcopy(COUNTRIES["US"]))
+    before = original.get(("cancellation_probability",))
+    with pytest.raises(ValueError, match="cancellation_probability"):
+        original.override(("cancellation_probability",), 1.5)
+    with pytest.raises(ValueError, match="raw"):
+        original.override(("raw", "std"), -1.0)
+    assert original.get(("cancellation_probability",)) == before
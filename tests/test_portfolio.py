@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+from analytic import country_moments
+from config import COUNTRIES
+from discrete import ImportanceSampling
+from engine import simulate_country
+from metrics import cvar
+from portfolio import (
+    PortfolioScenarios,
+    PortfolioStats,
+    efficient_frontier,
+    optimize_portfolio,
+    optimize_portfolio_cvar,
+    scenario_matrix,
+)
+from streams import make_rng, spawn_seeds
+
+ORDER_SIZE = 8_000
+
+
+def importance_runs(n: int, seed: int = 0) -> tuple[dict, dict]:
+    costs, weights = {}, {}
+    for (country, params), child in zip(
+        COUNTRIES.items(), spawn_seeds(seed, len(COUNTRIES))
+    ):
+        run = simulate_country(
+            params, ORDER_SIZE, n, make_rng(child), importance=ImportanceSampling()
+        )
+        costs[country], weights[country] = run["total_cost"], run["weights"]
+    return costs, weights
+
+
+def four_suppliers() -> PortfolioStats:
+    """Cheaper suppliers are riskier, so the allocation moves with lambda"""
+    std = np.array([40.0, 25.0, 15.0, 8.0])
+    corr = np.full((4, 4), 0.2) + 0.8 * np.eye(4)
+    return PortfolioStats(
+        ("a", "b", "c", "d"),
+        np.array([100.0, 110.0, 118.0, 125.0]),
+        corr * np.outer(std, std),
+    )
+
+
+def test_paired_weights_are_the_product_of_supplier_weights():
+    costs = {"a": np.arange(3.0), "b": np.arange(3.0)}
+    weights = {"a": np.array([1.0, 2.0, 0.5]), "b": np.array([4.0, 0.5, 1.0])}
+    _, _, trial_weights = scenario_matrix(costs, weights)
+    np.testing.assert_allclose(trial_weights, [4.0, 1.0, 0.5])
+
+
+def test_unweighted_runs_have_no_trial_weights():
+    _, _, trial_weights = scenario_matrix({"a": np.ones(3)}, {"a": None})
+    assert trial_weights is None
+
+
+def test_importance_weighted_means_match_analytic():
+    costs, weights = importance_runs(200_000)
+    stats = PortfolioStats.from_scenarios(costs, weights)
+    for country, mean in zip(stats.suppliers, stats.mean):
+        expected = country_moments(COUNTRIES[country], ORDER_SIZE)["total"].mean
+        assert mean == pytest.approx(expected, rel=0.01), country
+
+
+def test_seeded_reduction_is_repeatable():
+    costs = make_rng(0).lognormal(size=(20_000, 3))
+    scenarios = PortfolioScenarios.from_matrix(("a", "b", "c"), costs)
+    first = scenarios.reduce(1_000, rng=make_rng(1))
+    second = scenarios.reduce(1_000, rng=make_rng(1))
+    np.testing.assert_array_equal(first.costs, second.costs)
+
+
+def test_cvar_is_reported_from_the_portfolio_costs():
+    costs = make_rng(0).lognormal(size=(2_000, 3))
+    scenarios = PortfolioScenarios.from_matrix(("a", "b", "c"), costs)
+    for risk_tolerance in (0.0, 2.0):
+        result = optimize_portfolio_cvar(scenarios, risk_tolerance)
+        assert result["cvar"] == pytest.approx(
+            cvar(costs @ result["shares"], 0.95, scenarios.probabilities)
+        )
+
+
+def unequal_runs() -> dict:
+    """Independent runs of different lengths, like adaptive runs"""
+    trials = {"China": 70_000, "US": 6_000, "Mexico": 24_000}
+    return {
+        country: simulate_country(COUNTRIES[country], ORDER_SIZE, n, make_rng(i))[
+            "total_cost"
+        ]
+        for i, (country, n) in enumerate(trials.items())
+    }
+
+
+def test_runs_of_different_lengths_are_not_paired():
+    with pytest.raises(ValueError, match="different trial counts"):
+        scenario_matrix(unequal_runs())
+
+
+def test_stats_of_unequal_runs_use_every_trial():
+    costs = unequal_runs()
+    stats = PortfolioStats.from_scenarios(costs)
+    for j, (country, x) in enumerate(costs.items()):
+        assert stats.mean[j] == pytest.approx(x.mean(), rel=1e-12)
+        assert stats.cov[j, j] == pytest.approx(x.var(ddof=1), rel=1e-12)
+        expected = country_moments(COUNTRIES[country], ORDER_SIZE)["total"].mean
+        assert stats.mean[j] == pytest.approx(expected, rel=0.003), country
+    # independent runs: no covariance between suppliers
+    assert np.count_nonzero(stats.cov - np.diag(np.diag(stats.cov))) == 0
+
+
+def test_scenarios_of_unequal_runs_resample_every_run():
+    costs = unequal_runs()
+    scenarios = PortfolioScenarios.from_scenarios(costs, n=5_000, rng=make_rng(0))
+    assert scenarios.costs.shape == (5_000, 3)
+    for column, x in zip(scenarios.costs.T, costs.values()):
+        assert column.mean() == pytest.approx(x.mean(), rel=0.01)
+
+
+def test_allocation_respects_per_supplier_bounds():
+    stats = four_suppliers()
+    min_share = {"a": 0.1, "b": 0.05, "c": 0.2, "d": 0.0}
+    max_share = {"a": 0.3, "b": 0.6, "c": 0.5, "d": 0.25}
+    for risk_tolerance in (0.0, 1.0, 5.0):
+        result = optimize_portfolio(stats, risk_tolerance, min_share, max_share)
+        shares = result["allocations"]
+        assert sum(shares.values()) == pytest.approx(1)
+        for supplier, share in shares.items():
+            assert min_share[supplier] - 1e-8 <= share <= max_share[supplier] + 1e-8
+    # the cheapest supplier is capped when risk is free
+    assert optimize_portfolio(stats, 0.0, min_share, max_share)["allocations"][
+        "a"
+    ] == pytest.approx(0.3, abs=1e-6)
+
+
+@pytest.mark.parametrize(
+    "min_share, max_share", [(0.3, 1.0), (0.0, 0.2), ({"a": 0.7, "b": 0.4}, 1.0)]
+)
+def test_infeasible_bounds_have_no_allocation(min_share, max_share):
+    stats = four_suppliers()
+    assert optimize_portfolio(stats, 1.0, min_share, max_share) is None
+    assert efficient_frontier(stats, [0.0, 1.0], min_share, max_share).empty
+
+
+def test_warm_start_matches_a_cold_start():
+    stats = four_suppliers()
+    cold = optimize_portfolio(stats, 2.0, 0.0, 0.6)
+    for warm_start in (
+        optimize_portfolio(stats, 1.8, 0.0, 0.6)["shares"],
+        {"d": 1.0},
+    ):
+        warm = optimize_portfolio(stats, 2.0, 0.0, 0.6, warm_start)
+        np.testing.assert_allclose(warm["shares"], cold["shares"], atol=1e-4)
+        assert warm["expected_cost"] == pytest.approx(cold["expected_cost"], rel=1e-6)
+
+
+def test_frontier_trades_cost_for_risk_as_lambda_grows():
+    frontier = efficient_frontier(four_suppliers(), np.linspace(0, 5, 26), 0.0, 0.6)
+    assert len(frontier) == 26
+    assert np.all(np.diff(frontier["Expected Cost"]) >= -1e-6)
+    assert np.all(np.diff(frontier["Std"]) <= 1e-6)
+    assert frontier["Std"].iloc[-1] < frontier["Std"].iloc[0]
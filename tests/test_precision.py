@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from benchmarks.precision import precision_report
+from config import COUNTRIES
+from engine import simulate_country
+from streams import make_rng
+
+
+@pytest.fixture(scope="module")
+def report():
+    return precision_report(trials=20_000, seed=0)
+
+
+def test_single_precision_leaves_mean_and_p95_unchanged(report):
+    rows, _ = report
+    costs = rows[~rows["Output"].str.startswith("share")]
+    assert len(costs) == 2 * len(COUNTRIES)
+    # relative to the double-precision value
+    assert costs["Difference"].max() < 1e-6
+
+
+def test_single_precision_leaves_allocation_unchanged(report):
+    rows, _ = report
+    shares = rows[rows["Output"].str.startswith("share")]
+    assert len(shares)
+    assert shares["Difference"].max() < 1e-4
+
+
+def test_single_precision_halves_trial_storage(report):
+    _, memory = report
+    assert memory["single"] == pytest.approx(memory["double"] / 2)
+
+
+def test_single_precision_dtypes():
+    run = simulate_country(
+        COUNTRIES["China"], 8_000, 1_000, make_rng(0), precision="single"
+    )
+    assert run["total_cost"].dtype == np.float32
+    assert run["lost_units"].dtype == np.int32
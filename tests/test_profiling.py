@@ -0,0 +1,86 @@
+import contextvars
+import os
+import threading
+import tracemalloc
+
+import pytest
+
+import profiling
+from config import COUNTRIES
+from discrete import simulate_discrete_risks
+from executor import map_seeded
+from params import compile_params
+from profiling import Collector, span
+
+
+def record(collector: Collector | None, name: str):
+    profiling.collect(collector)
+    with span(name):
+        pass
+
+
+def record_with(collector: Collector, fn):
+    profiling.collect(collector)
+    try:
+        fn()
+    finally:
+        profiling.collect(None)
+
+
+def test_collectors_only_see_their_own_context():
+    first, second = Collector(), Collector()
+    threads = [
+        threading.Thread(target=record, args=(first, "first")),
+        threading.Thread(target=record, args=(second, "second")),
+        threading.Thread(target=record, args=(None, "untracked")),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [event[0] for event in first.events] == ["first"]
+    assert [event[0] for event in second.events] == ["second"]
+    assert not profiling.is_enabled()
+    assert list(profiling.summary()["Stage"]) == []
+
+
+def test_memory_tracking_stops_with_the_last_collector():
+    context = contextvars.copy_context()
+    collector = Collector(track_memory=True)
+    context.run(record, collector, "tracked")
+    assert tracemalloc.is_tracing()
+    assert list(profiling.summary(collector)["Stage"]) == ["tracked"]
+    context.run(profiling.collect, None)
+    del collector
+    profiling.collect(None)
+    assert not tracemalloc.is_tracing()
+
+
+def test_spans_report_peak_memory_of_freed_temporaries():
+    collector = Collector(track_memory=True)
+
+    def allocate():
+        with span("outer"):
+            with span("inner"):
+                temporary = bytearray(40 * 2**20)
+                del temporary
+
+    contextvars.copy_context().run(record_with, collector, allocate)
+    peaks = {event[0]: event[-1] for event in collector.events}
+    assert peaks["inner"] >= 40 * 2**20
+    assert peaks["outer"] >= peaks["inner"]
+
+
+@pytest.mark.parametrize("kind", ["process", "thread"])
+def test_worker_spans_are_merged_into_the_caller(kind):
+    params = compile_params(COUNTRIES["US"]).discrete_params(8_000)
+    collector = Collector()
+    contextvars.copy_context().run(
+        record_with,
+        collector,
+        lambda: map_seeded(simulate_discrete_risks, [(params, 100)] * 2, 0, kind),
+    )
+    names = [event[0] for event in collector.events]
+    assert names.count("discrete.simulate_discrete_risks") == 2
+    if kind == "process":
+        assert all(event[3] != os.getpid() for event in collector.events)
@@ -0,0 +1,83 @@
+import copy
+
+import numpy as np
+import pytest
+
+from config import COUNTRIES, SENSITIVITY_SEED
+from params import compile_params
+from sensitivity import cached_run_sensitivity_analysis, run_sensitivity_analysis
+from simulation import run_monte_carlo
+from streams import common_random_numbers
+
+ORDER_SIZE = 8_000
+
+
+def test_cached_analysis_replays_skipped_factors():
+    params = copy.deepcopy(COUNTRIES["US"])
+    # +20% would be a probability above 1
+    params["damage_probability"] = 0.9
+    factors = [
+        ("Damage Probability", ("damage_probability",)),
+        ("Disruption Lambda", ("disruption_lambda",)),
+    ]
+    calls = []
+    for _ in range(2):
+        skipped = []
+        results, _ = cached_run_sensitivity_analysis(
+            "US",
+            params,
+            factors,
+            ORDER_SIZE,
+            n=2_000,
+            executor="serial",
+            on_error=lambda factor, e: skipped.append(factor),
+        )
+        calls.append(skipped)
+        assert list(results["Factor"]) == ["Disruption Lambda"]
+    assert calls == [["Damage Probability"], ["Damage Probability"]]
+
+
+def brute_force_impacts(country, params, factors, order_size, swing=0.20):
+    """
+    Every side of every factor through run_monte_carlo on common random
+    numbers: {factor: (impact, its standard error)}
+    """
+    base = compile_params(params)
+    impacts = {}
+    for factor_name, param_path in factors:
+        value = base.get(param_path)
+        sides = []
+        for side in (value * (1 - swing), value * (1 + swing)):
+            with common_random_numbers(SENSITIVITY_SEED):
+                run = run_monte_carlo(
+                    country, base.override(param_path, side).source, order_size
+                )
+            sides.append(np.asarray(run["total_cost"], dtype=float))
+        change = sides[1] - sides[0]
+        impacts[factor_name] = (
+            change.mean(),
+            change.std(ddof=1) / np.sqrt(len(change)),
+        )
+    return impacts
+
+
+def test_fused_impacts_match_brute_force():
+    # the supplier whose cancellations are frequent enough to measure
+    country = "China"
+    factors = [
+        ("Cancellation Probability", ("cancellation_probability",)),  # stored draws
+        ("Raw Material Mean", ("raw", "mean")),  # re-simulated
+    ]
+    results, _ = run_sensitivity_analysis(
+        country, COUNTRIES[country], factors, ORDER_SIZE, executor="serial"
+    )
+    fused = dict(zip(results["Factor"], results["Impact"]))
+    expected = brute_force_impacts(country, COUNTRIES[country], factors, ORDER_SIZE)
+    # independent draws on the two paths: both estimates carry sampling noise.
+    # Cancellations are drawn last, so the brute-force sides stay paired.
+    impact, stderr = expected["Cancellation Probability"]
+    assert stderr < 0.05 * impact
+    assert abs(fused["Cancellation Probability"] - impact) <= 5 * np.sqrt(2) * stderr
+    # the same seeded runs on both paths
+    impact, _ = expected["Raw Material Mean"]
+    assert fused["Raw Material Mean"] == pytest.approx(impact, rel=1e-9)
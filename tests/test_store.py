@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pytest
+
+import config
+import store
+from store import META_FILE, ResultStore, persist
+
+
+def result(n: int = 1_000) -> dict:
+    rng = np.random.default_rng(0)
+    return {
+        "suppliers": ("US", "China"),
+        "trials": n,
+        "total_cost": rng.random(n),
+        "breakdown": {"tariff": rng.random(n), "label": "tariff"},
+    }
+
+
+@pytest.fixture
+def results(tmp_path):
+    return ResultStore(tmp_path, max_bytes=2**30)
+
+
+def test_key_follows_code_version_and_fed_funds_rate(results, monkeypatch):
+    key = results.key("run", 8_000)
+    assert results.key("run", 8_000) == key
+    assert results.key("run", 4_000) != key
+    monkeypatch.setattr(config, "FED_FUNDS_RATE", config.FED_FUNDS_RATE + 1)
+    assert results.key("run", 8_000) != key
+    monkeypatch.undo()
+    monkeypatch.setattr(store, "code_version", lambda: "other")
+    assert results.key("run", 8_000) != key
+
+
+def test_reload_is_memory_mapped_and_equal(results):
+    stored = result()
+    results.put("ab" * 32, stored)
+    loaded = results.get("ab" * 32)
+    assert loaded["suppliers"] == ("US", "China")
+    assert loaded["trials"] == stored["trials"]
+    assert loaded["breakdown"]["label"] == "tariff"
+    for array, original in [
+        (loaded["total_cost"], stored["total_cost"]),
+        (loaded["breakdown"]["tariff"], stored["breakdown"]["tariff"]),
+    ]:
+        assert isinstance(array, np.memmap) and not array.flags.writeable
+        np.testing.assert_array_equal(array, original)
+    assert results.get("cd" * 32) is None
+
+
+def test_failed_write_leaves_no_entry(results, capsys):
+    broken = result()
+    broken["unserializable"] = object()
+    results.put("ab" * 32, broken)
+    assert "Failed to store" in capsys.readouterr().out
+    assert results.get("ab" * 32) is None
+    # the staging directory is removed, not left for readers to find
+    assert not any(results.root.rglob(".*"))
+    assert len(results) == 0
+
+
+def test_staged_entries_are_invisible_until_renamed(results):
+    staging = results.root / "ab" / f".{'ab' * 32}.partial"
+    staging.mkdir(parents=True)
+    (staging / META_FILE).write_text("{}")
+    assert len(results) == 0
+    results.put("ab" * 32, result())
+    assert len(results) == 1
+    # a second writer of the same key keeps the first entry
+    results.put("ab" * 32, result(10))
+    assert results.get("ab" * 32)["trials"] == 1_000
+    assert sorted(path.name for path in (results.root / "ab").iterdir()) == [
+        staging.name,
+        "ab" * 32,
+    ]
+
+
+def test_eviction_drops_the_least_recently_used(results):
+    keys = [c * 64 for c in "abc"]
+    for age, key in enumerate(keys):
+        results.put(key, result())
+        # distinct, increasing last-use times
+        meta = results._path(key) / META_FILE
+        os.utime(meta, (1e9 + age, 1e9 + age))
+    sizes = {path.name: size for path, _, size in results.entries()}
+    assert results.get(keys[0]) is not None  # now the most recently used
+    results.evict(sizes[keys[0]] + sizes[keys[2]])
+    assert results.get(keys[1]) is None
+    assert results.get(keys[0]) is not None and results.get(keys[2]) is not None
+    results.clear()
+    assert len(results) == 0 and results.size_bytes() == 0
+
+
+def test_persist_serves_repeated_calls_from_the_store(results, monkeypatch):
+    monkeypatch.setattr(store, "get_store", lambda: results)
+    calls = []
+
+    @persist(key=lambda n, seed=None: None if seed is None else (n, seed))
+    def run(n, seed=None):
+        calls.append(seed)
+        return result(n)
+
+    first = run(100, seed=0)
+    second = run(100, seed=0)
+    np.testing.assert_array_equal(first["total_cost"], second["total_cost"])
+    assert calls == [0] and len(results) == 1
+    # unseeded runs are neither read nor stored
+    run(100)
+    run(100)
+    assert calls == [0, None, None] and len(results) == 1
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from config import COUNTRIES
+from executor import run_monte_carlo_streaming
+from streaming import DDSketch, StreamingSummary, Welford
+from streams import make_rng
+
+ORDER_SIZE = 8_000
+EDGES = np.linspace(0, 20, 41)
+
+
+def chunks(weighted: bool) -> list[tuple[np.ndarray, np.ndarray | None]]:
+    """Skewed batches of uneven sizes, including an empty one"""
+    rng = make_rng(0)
+    batches = []
+    for n in (1, 500, 0, 7_000, 2_499):
+        x = rng.lognormal(1.0, 0.8, n)
+        batches.append((x, rng.uniform(0.2, 3.0, n) if weighted else None))
+    return batches
+
+
+def concatenated(batches) -> tuple[np.ndarray, np.ndarray]:
+    weights = [np.ones(len(part)) if w is None else w for part, w in batches]
+    return np.concatenate([part for part, _ in batches]), np.concatenate(weights)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_merged_welford_equals_one_pass(weighted):
+    batches = chunks(weighted)
+    merged = Welford()
+    for x, weights in batches:
+        part = Welford()
+        part.add(x, weights)
+        merged = merged + part
+    one_pass = Welford()
+    one_pass.add(*concatenated(batches))
+
+    x, weights = concatenated(batches)
+    mean = np.average(x, weights=weights)
+    m2 = np.dot(weights, (x - mean) ** 2)
+    for welford in (merged, one_pass):
+        assert welford.n == len(x)
+        assert welford.weight == pytest.approx(weights.sum(), rel=1e-12)
+        assert welford.mean == pytest.approx(mean, rel=1e-12)
+        assert welford.m2 == pytest.approx(m2, rel=1e-10)
+    if not weighted:
+        assert merged.variance == pytest.approx(x.var(ddof=1), rel=1e-10)
+        assert merged.stderr == pytest.approx(
+            x.std(ddof=1) / np.sqrt(len(x)), rel=1e-10
+        )
+
+
+def test_welford_of_too_few_trials():
+    welford = Welford()
+    assert np.isnan(welford.stderr)
+    welford.add(np.array([3.0]))
+    assert welford.mean == 3.0 and np.isnan(welford.variance)
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.001])
+def test_sketch_quantiles_are_within_the_relative_accuracy(relative_accuracy):
+    rng = make_rng(1)
+    x = np.concatenate([np.zeros(300), rng.lognormal(10, 1.5, 20_000)])
+    rng.shuffle(x)
+    sketch = DDSketch(relative_accuracy)
+    for part in np.array_split(x, 7):
+        piece = DDSketch(relative_accuracy)
+        piece.add(part)
+        sketch = sketch + piece
+    assert sketch.weight == len(x) and sketch.zero_weight == 300
+    for q in (0.005, 0.01, 0.05, 0.25, 0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = np.quantile(x, q, method="inverted_cdf")
+        assert sketch.quantile(q) == pytest.approx(
+            exact, rel=relative_accuracy * (1 + 1e-9), abs=0
+        ), q
+
+
+def test_sketches_of_different_accuracy_do_not_merge():
+    with pytest.raises(ValueError, match="same accuracy"):
+        DDSketch(0.01) + DDSketch(0.02)
+    assert np.isnan(DDSketch().quantile(0.5))
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_merged_summaries_equal_one_summary(weighted):
+    batches = chunks(weighted)
+    merged = StreamingSummary.empty(EDGES)
+    for x, weights in batches:
+        part = StreamingSummary.empty(EDGES)
+        part.add(x, np.floor(x), weights)
+        merged = merged + part
+    one_pass = StreamingSummary.empty(EDGES)
+    x, weights = concatenated(batches)
+    one_pass.add(x, np.floor(x), weights)
+
+    assert merged.trials == one_pass.trials == len(x)
+    for field in ("cost", "lost_units"):
+        a, b = getattr(merged, field), getattr(one_pass, field)
+        assert a.mean == pytest.approx(b.mean, rel=1e-12)
+        assert a.variance == pytest.approx(b.variance, rel=1e-10)
+    np.testing.assert_allclose(
+        merged.cost_histogram.counts, one_pass.cost_histogram.counts
+    )
+    assert merged.cost_histogram.overflow == pytest.approx(
+        one_pass.cost_histogram.overflow
+    )
+    assert merged.cost_sketch.buckets == pytest.approx(one_pass.cost_sketch.buckets)
+    for q in (0.05, 0.5, 0.95):
+        assert merged.quantile(q) == one_pass.quantile(q)
+
+
+def test_streaming_run_is_identical_on_process_and_serial_executors():
+    params = COUNTRIES["China"]
+    runs = {
+        kind: run_monte_carlo_streaming(
+            "China", params, ORDER_SIZE, 25_000, chunk_size=4_000, seed=7, kind=kind
+        )
+        for kind in ("process", "serial")
+    }
+    process, serial = runs["process"], runs["serial"]
+    assert process.trials == serial.trials == 25_000
+    assert process.cost == serial.cost
+    assert process.lost_units == serial.lost_units
+    assert process.cost_sketch == serial.cost_sketch
+    np.testing.assert_array_equal(
+        process.cost_histogram.counts, serial.cost_histogram.counts
+    )
+    # a different seed is a different run
+    other = run_monte_carlo_streaming(
+        "China", params, ORDER_SIZE, 25_000, chunk_size=4_000, seed=8, kind="serial"
+    )
+    assert other.cost.mean != serial.cost.mean
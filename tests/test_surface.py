@@ -0,0 +1,33 @@
+import numpy as np
+
+from config import COUNTRIES
+from surface import load_surface, precompute_surface, save_surface, surface_key
+
+ORDER_SIZES = np.array([4_000, 8_000])
+COUNTRY = {"US": COUNTRIES["US"]}
+
+
+def test_missing_surface_is_not_cached(tmp_path):
+    path = tmp_path / "surface.npz"
+    assert load_surface(path) is None
+    save_surface(precompute_surface(COUNTRY, ORDER_SIZES, 500), path)
+    assert load_surface(path) is not None
+
+
+def test_surface_from_other_inputs_is_ignored(tmp_path):
+    path = tmp_path / "surface.npz"
+    save_surface(precompute_surface(COUNTRY, ORDER_SIZES, 500), path)
+    key = surface_key(COUNTRY, ORDER_SIZES, 500)
+    assert load_surface(path, key)["key"].item() == key
+    other_rate = surface_key(COUNTRY, ORDER_SIZES, 500, fed_funds_rate=99.0)
+    assert load_surface(path, other_rate) is None
+    assert load_surface(path, surface_key(COUNTRY, ORDER_SIZES, 1_000)) is None
+
+
+def test_rewritten_surface_is_reloaded(tmp_path):
+    path = tmp_path / "surface.npz"
+    save_surface(precompute_surface(COUNTRY, ORDER_SIZES, 500), path)
+    load_surface(path)
+    save_surface(precompute_surface(COUNTRY, ORDER_SIZES, 1_000), path)
+    key = surface_key(COUNTRY, ORDER_SIZES, 1_000)
+    assert load_surface(path, key) is not None